@@ -28,9 +28,9 @@ if exist history.db (
     del /f /q history.db
 )
 
-if exist vokey_20260202.log (
-    echo Deleting vokey_20260202.log...
-    del /f /q vokey_20260202.log
+if exist vokey.log (
+    echo Deleting vokey.log...
+    del /f /q vokey.log vokey.log.*
 )
 
 if exist 0.19.5 (
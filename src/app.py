@@ -8,140 +8,90 @@ Features:
 - SQLite database for history
 - Delete individual or all items
 - Copy to clipboard
+- Export and import history (JSONL/CSV)
+- History retention with compressed archives
+- Performance trends (p50/p95 per day and model)
 - System tray integration
 """
 
 import tkinter as tk
-from tkinter import ttk, messagebox, scrolledtext
+from tkinter import ttk, messagebox, scrolledtext, filedialog
 import threading
 import time
-import sqlite3
+import queue
 from datetime import datetime
 from pathlib import Path
 import keyboard
-from core import AudioRecorder, WhisperTranscriber, TextTyper
+from core import AudioRecorder, WhisperTranscriber, TextTyper, level_to_fraction
 from cursor_tracker import CursorTracker, CursorHighlighter, AudioFeedback
+from database import DatabaseManager, RetentionPolicy, RetentionWorker
+from sinks import TyperSink, FanOut, open_sink
+from diagnostics import DiagnosticsProfiler, DEFAULT_DICTATIONS
+from history_io import export_history, import_history
+from spill import find_spills, recover_spills
+from state import AssistantState, StateBus
+from log import get_logger, setup_logging
 
 
-class DatabaseManager:
-    """Manages SQLite database for transcription history."""
-    
-    def __init__(self, db_path: str = "history.db"):
-        """
-        Initialize database manager.
-        
-        Args:
-            db_path: Path to SQLite database file
-        """
-        self.db_path = db_path
-        self.init_database()
-    
-    def init_database(self):
-        """Create database and tables if they don't exist."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS transcriptions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp TEXT NOT NULL,
-                text TEXT NOT NULL,
-                duration REAL,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        conn.commit()
-        conn.close()
-    
-    def add_transcription(self, text: str, duration: float = None):
-        """
-        Add a new transcription to the database.
-        
-        Args:
-            text: Transcribed text
-            duration: Recording duration in seconds
-        
-        Returns:
-            ID of the inserted record
-        """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        cursor.execute(
-            "INSERT INTO transcriptions (timestamp, text, duration) VALUES (?, ?, ?)",
-            (timestamp, text, duration)
-        )
-        
-        row_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-        
-        return row_id
-    
-    def get_all_transcriptions(self):
-        """
-        Get all transcriptions ordered by newest first.
-        
-        Returns:
-            List of tuples (id, timestamp, text, duration)
-        """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            "SELECT id, timestamp, text, duration FROM transcriptions ORDER BY id DESC"
-        )
-        results = cursor.fetchall()
-        
-        conn.close()
-        return results
-    
-    def delete_transcription(self, transcription_id: int):
-        """
-        Delete a specific transcription.
-        
-        Args:
-            transcription_id: ID of the transcription to delete
-        """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("DELETE FROM transcriptions WHERE id = ?", (transcription_id,))
-        
-        conn.commit()
-        conn.close()
-    
-    def clear_all(self):
-        """Delete all transcriptions."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("DELETE FROM transcriptions")
-        
-        conn.commit()
-        conn.close()
-    
-    def get_statistics(self):
-        """
-        Get statistics about transcriptions.
-        
-        Returns:
-            Dictionary with count and total duration
-        """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT COUNT(*), SUM(duration) FROM transcriptions")
-        count, total_duration = cursor.fetchone()
-        
-        conn.close()
-        
-        return {
-            "count": count or 0,
-            "total_duration": total_duration or 0
-        }
+logger = get_logger(__name__)
+
+
+# History retention: older rows are archived to history_archive/ and
+# removed from history.db. Set a limit to None to disable it.
+HISTORY_RETENTION = RetentionPolicy(
+    max_age_days=365,
+    max_rows=10000,
+    max_size_mb=64
+)
+
+# Keep each clip's audio (compressed) with its history row so it can be
+# re-transcribed later with: python main.py retranscribe
+STORE_AUDIO = False
+
+# Input level meter: bars in the waveform view and maximum redraw rate.
+# The meter only redraws while recording.
+METER_BARS = 48
+METER_FPS = 20
+
+# Performance trends tab: label -> (dictation_metrics column, unit)
+TREND_METRICS = {
+    "Decode time": ("decode_seconds", "s"),
+    "Real-time factor": ("rtf", "x"),
+    "Typing time": ("typing_seconds", "s"),
+    "Capture length": ("capture_seconds", "s"),
+    "Time to first text": ("first_text_seconds", "s"),
+    "Time to final text": ("final_text_seconds", "s"),
+}
+TREND_DAYS = 30
+
+# Keep the microphone open between recordings with a short pre-roll, so
+# recording starts instantly and the first syllable is not clipped. Costs
+# a little CPU while idle (reported on exit).
+ARMED_INPUT = False
+PREROLL_SECONDS = 0.4
+
+# Smaller model for an instant draft that is typed right away and replaced
+# in place once the main model finishes ("tiny"). None: single pass.
+DRAFT_MODEL = None
+
+# Recordings longer than this are written to a memory-mapped file instead of
+# RAM; a file left behind by a crash is offered for recovery on startup.
+SPILL_THRESHOLD_SECONDS = 600
+
+# Release the model's memory after this many minutes without a dictation;
+# it is reloaded as soon as recording starts. None: keep it loaded.
+IDLE_UNLOAD_MINUTES = None
+
+# Transcription servers on the LAN to send dictations to, e.g.
+# ["gpu-box:8765"] (see workers.py), with their shared token in the
+# VOKEY_TOKEN environment variable. The local model is still loaded, as
+# the fallback when none of them answers. Empty: always transcribe locally.
+WORKERS = []
+
+# Also send each transcript to these outputs (see sinks.py): a file path
+# (".jsonl" for JSON lines), "pipe:PATH" or "tcp:PORT". They are written
+# in batches at most a second apart, off the typing path.
+OUTPUTS = []
 
 
 class VoiceAssistantGUI:
@@ -165,36 +115,88 @@ class VoiceAssistantGUI:
             try:
                 self.root.iconbitmap(icon_path)
             except Exception as e:
-                print(f"Could not load icon: {e}")
+                logger.warning(f"Could not load icon: {e}")
         
         # Initialize components
         self.db = DatabaseManager()
-        self.recorder = AudioRecorder()
-        self.transcriber = WhisperTranscriber(model_name="base")
+        self.retention_worker = RetentionWorker(self.db, HISTORY_RETENTION)
+        self.retention_worker.start()
+        self.recorder = AudioRecorder(
+            armed=ARMED_INPUT,
+            preroll_seconds=PREROLL_SECONDS,
+            spill_threshold_seconds=SPILL_THRESHOLD_SECONDS
+        )
+        self.transcriber = WhisperTranscriber(
+            model_name="base",
+            preload=False,
+            draft_model_name=DRAFT_MODEL,
+            idle_unload_seconds=IDLE_UNLOAD_MINUTES * 60 if IDLE_UNLOAD_MINUTES else None,
+            workers=WORKERS
+        )
         self.typer = TextTyper()
+        self.output = FanOut(
+            [TyperSink(self.typer)] +
+            [open_sink(spec, flush_every=16, flush_interval=1.0) for spec in OUTPUTS]
+        )
         self.cursor_tracker = CursorTracker()
-        self.cursor_highlighter = CursorHighlighter()
+        # The overlay is a Toplevel of this window, driven by its main loop
+        self.cursor_highlighter = CursorHighlighter(master=self.root)
+        self.cursor_highlighter.start()
         self.audio_feedback = AudioFeedback()
         
         # State
-        self.is_recording = False
+        self.state_bus = StateBus()
+        self.profiler = DiagnosticsProfiler(
+            self.state_bus,
+            self.transcriber,
+            on_finished=lambda bundle: self.run_on_ui(lambda: self._on_profile_finished(bundle))
+        )
+        self._draft_ids = set()  # History rows still showing a draft
+        self._clip_ids = {}  # History row -> transcriber clip id, for retries
         self.recording_start_time = None
         self.hotkey = "alt+r"
         
+        # Callbacks queued by other threads, run on the Tk main loop
+        self._ui_calls = queue.Queue()
+        self.root.bind("<<RunOnUI>>", self._run_ui_calls)
+        self.root.bind("<<ToggleRecording>>", lambda event: self.toggle_recording())
+        
         # Build UI
         self.create_ui()
         
         # Load history
         self.refresh_history()
         
-        # Register hotkey
-        keyboard.add_hotkey(self.hotkey, self.toggle_recording, suppress=False)
+        # State changes arrive on worker threads; render them on the main loop
+        self.state_bus.subscribe(lambda event: self.run_on_ui(lambda: self.on_state_changed(event)))
         
-        # Start status updater
-        self.update_status()
+        # Register hotkey. The keyboard hook thread only posts an event;
+        # the toggle itself runs on the Tk main loop.
+        keyboard.add_hotkey(self.hotkey, self._on_hotkey, suppress=False)
+        
+        # Load the model after the window is up. A dictation finished
+        # before loading completes waits for it in transcribe().
+        self.status_label.config(text="Status: Loading model...", fg="#ff9800")
+        threading.Thread(target=self._load_model, daemon=True).start()
     
     def create_ui(self):
         """Create all UI components."""
+        # Menu bar
+        menubar = tk.Menu(self.root)
+        file_menu = tk.Menu(menubar, tearoff=0)
+        file_menu.add_command(label="Export History...", command=self.export_history)
+        file_menu.add_command(label="Import History...", command=self.import_history)
+        file_menu.add_separator()
+        file_menu.add_command(label="Exit", command=self.on_closing)
+        menubar.add_cascade(label="File", menu=file_menu)
+        self.tools_menu = tk.Menu(menubar, tearoff=0)
+        self.tools_menu.add_command(
+            label=f"Profile Next {DEFAULT_DICTATIONS} Dictations",
+            command=self.toggle_profiling
+        )
+        menubar.add_cascade(label="Tools", menu=self.tools_menu)
+        self.root.config(menu=menubar)
+        
         # Status Frame
         status_frame = tk.Frame(self.root, bg="#f0f0f0", padx=10, pady=10)
         status_frame.pack(fill=tk.X)
@@ -232,6 +234,8 @@ class VoiceAssistantGUI:
         )
         self.record_btn.pack(side=tk.LEFT, padx=5)
         
+        self.create_level_meter(control_frame)
+        
         clear_btn = tk.Button(
             control_frame,
             text="🗑️ Clear All",
@@ -244,8 +248,38 @@ class VoiceAssistantGUI:
         )
         clear_btn.pack(side=tk.RIGHT, padx=5)
         
+        # History and performance trends share the rest of the window
+        self.notebook = ttk.Notebook(self.root)
+        self.notebook.pack(fill=tk.BOTH, expand=True)
+        history_tab = tk.Frame(self.notebook)
+        self.notebook.add(history_tab, text="History")
+        self.trends_tab = tk.Frame(self.notebook)
+        self.notebook.add(self.trends_tab, text="Trends")
+        self.create_trends_view(self.trends_tab)
+        self.notebook.bind("<<NotebookTabChanged>>", lambda e: self.refresh_trends())
+        
+        # Statistics summary
+        stats_frame = tk.Frame(history_tab, padx=10, pady=5)
+        stats_frame.pack(fill=tk.X)
+        
+        self.today_stats_label = tk.Label(
+            stats_frame,
+            text="📊 Today: 0 dictations",
+            font=("Arial", 9),
+            fg="#444"
+        )
+        self.today_stats_label.pack(anchor=tk.W)
+        
+        self.total_stats_label = tk.Label(
+            stats_frame,
+            text="📈 All time: 0 dictations",
+            font=("Arial", 9),
+            fg="#444"
+        )
+        self.total_stats_label.pack(anchor=tk.W)
+        
         # History Frame
-        history_label_frame = tk.Frame(self.root, padx=10)
+        history_label_frame = tk.Frame(history_tab, padx=10)
         history_label_frame.pack(fill=tk.X)
         
         self.history_count_label = tk.Label(
@@ -256,7 +290,7 @@ class VoiceAssistantGUI:
         self.history_count_label.pack(anchor=tk.W)
         
         # Scrollable history list
-        history_container = tk.Frame(self.root, padx=10, pady=5)
+        history_container = tk.Frame(history_tab, padx=10, pady=5)
         history_container.pack(fill=tk.BOTH, expand=True)
         
         # Canvas and scrollbar for custom scrolling
@@ -278,21 +312,266 @@ class VoiceAssistantGUI:
         
         self.canvas = canvas
     
+    def create_trends_view(self, parent):
+        """
+        Create the performance trends tab: p50/p95 of the selected metric
+        per model, and per day and model.
+        
+        Args:
+            parent: Frame to build the view in
+        """
+        options_frame = tk.Frame(parent, padx=10, pady=8)
+        options_frame.pack(fill=tk.X)
+        
+        tk.Label(options_frame, text="Metric:", font=("Arial", 9)).pack(side=tk.LEFT)
+        self.trend_metric = tk.StringVar(value=next(iter(TREND_METRICS)))
+        metric_box = ttk.Combobox(
+            options_frame,
+            textvariable=self.trend_metric,
+            values=list(TREND_METRICS),
+            state="readonly",
+            width=22
+        )
+        metric_box.pack(side=tk.LEFT, padx=5)
+        metric_box.bind("<<ComboboxSelected>>", lambda e: self.refresh_trends())
+        
+        tk.Label(options_frame, text=f"Last {TREND_DAYS} days", font=("Arial", 9), fg="#666").pack(side=tk.RIGHT)
+        
+        tk.Label(parent, text="Per model", font=("Arial", 10, "bold"), padx=10).pack(anchor=tk.W)
+        self.trend_model_table = self._create_trend_table(
+            parent, ("model", "engine", "count", "p50", "p95"), height=4
+        )
+        
+        tk.Label(parent, text="Per day", font=("Arial", 10, "bold"), padx=10).pack(anchor=tk.W)
+        self.trend_day_table = self._create_trend_table(
+            parent, ("day", "model", "count", "p50", "p95"), height=12
+        )
+    
+    @staticmethod
+    def _create_trend_table(parent, columns, height: int):
+        """Create a Treeview with one column per key."""
+        frame = tk.Frame(parent, padx=10, pady=5)
+        frame.pack(fill=tk.BOTH, expand=True)
+        
+        table = ttk.Treeview(frame, columns=columns, show="headings", height=height)
+        for column in columns:
+            table.heading(column, text=column.capitalize() if len(column) > 3 else column)
+            table.column(column, width=150 if column == "engine" else 90, anchor=tk.W)
+        scrollbar = tk.Scrollbar(frame, orient=tk.VERTICAL, command=table.yview)
+        table.configure(yscrollcommand=scrollbar.set)
+        
+        table.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        return table
+    
+    def refresh_trends(self):
+        """Reload the trends tab if it is showing."""
+        if self.notebook.select() != str(self.trends_tab):
+            return
+        
+        metric, unit = TREND_METRICS[self.trend_metric.get()]
+        
+        def fmt(value):
+            return f"{value:.2f}{unit}"
+        
+        self.trend_model_table.delete(*self.trend_model_table.get_children())
+        for row in self.db.get_metric_summary(metric, TREND_DAYS):
+            self.trend_model_table.insert("", tk.END, values=(
+                row["model"], row["engine"], row["count"], fmt(row["p50"]), fmt(row["p95"])
+            ))
+        
+        # Newest day first
+        self.trend_day_table.delete(*self.trend_day_table.get_children())
+        for row in reversed(self.db.get_metric_trends(metric, TREND_DAYS)):
+            self.trend_day_table.insert("", tk.END, values=(
+                row["day"], row["model"], row["count"], fmt(row["p50"]), fmt(row["p95"])
+            ))
+    
+    def run_on_ui(self, callback):
+        """
+        Run a callback on the Tk main loop.
+        
+        Safe to call from any thread: the callback is queued and the main
+        loop is woken with a virtual event, so no widget is touched off the
+        main thread.
+        
+        Args:
+            callback: Function taking no arguments
+        """
+        self._ui_calls.put(callback)
+        try:
+            self.root.event_generate("<<RunOnUI>>", when="tail")
+        except tk.TclError:
+            # Window already destroyed
+            pass
+    
+    def _run_ui_calls(self, event=None):
+        """Run all queued UI callbacks (main thread)."""
+        while True:
+            try:
+                callback = self._ui_calls.get_nowait()
+            except queue.Empty:
+                return
+            callback()
+    
+    def _load_model(self):
+        """Load the Whisper model (background thread)."""
+        if self.transcriber.load():
+            self.run_on_ui(self._restore_idle_status)
+            spills = find_spills()
+            if spills:
+                self.run_on_ui(lambda: self._offer_recovery(spills))
+        else:
+            self.run_on_ui(lambda: self.status_label.config(
+                text="Status: Could not load Whisper model",
+                fg="#f44336"
+            ))
+    
+    def _offer_recovery(self, spills):
+        """
+        Ask whether to transcribe recordings interrupted by a crash (main thread).
+        
+        Args:
+            spills: List of (path, sidecar) tuples from find_spills()
+        """
+        minutes = sum(path.stat().st_size // 2 / meta.get("sample_rate", 16000) for path, meta in spills) / 60
+        if not messagebox.askyesno(
+            "Recover Recordings",
+            f"{len(spills)} long recording(s) ({minutes:.0f} min) were interrupted before "
+            f"they were transcribed.\n\nTranscribe them into the history now?"
+        ):
+            return
+        
+        self.status_label.config(text="Status: Recovering recordings...", fg="#ff9800")
+        
+        def run():
+            try:
+                count = recover_spills(self.db, self.transcriber)
+                message = f"Status: Recovered {count} recordings"
+            except Exception as e:
+                logger.error(f"Error recovering recordings: {e}")
+                message = "Status: Recovery failed"
+            self.run_on_ui(self.refresh_history)
+            self.run_on_ui(lambda: self._show_temporary_status(message))
+        
+        threading.Thread(target=run, daemon=True).start()
+    
+    def _on_hotkey(self):
+        """Hotkey pressed (keyboard hook thread): hand off to the main loop."""
+        try:
+            self.root.event_generate("<<ToggleRecording>>", when="tail")
+        except tk.TclError:
+            pass
+    
+    def on_state_changed(self, event):
+        """
+        Reflect a state change in the UI (main thread).
+        
+        Args:
+            event: StateEvent from the state bus
+        """
+        state = event.state
+        
+        if state == AssistantState.RECORDING:
+            self.status_label.config(text="Status: Recording...", fg="#f44336")
+            self.record_btn.config(text="🛑 Stop Recording", bg="#ff5722")
+            self.start_level_meter()
+            return
+        
+        self.stop_level_meter()
+        self.record_btn.config(text="🎤 Start Recording", bg="#4caf50")
+        
+        if state == AssistantState.TRANSCRIBING:
+            self.status_label.config(text=f"Status: {event.message or 'Processing'}...", fg="#ff9800")
+        elif state == AssistantState.TYPING:
+            self.status_label.config(text="Status: Typing...", fg="#ff9800")
+        elif state == AssistantState.ERROR:
+            self.status_label.config(text=f"Status: {event.message}", fg="#f44336")
+            self.root.after(2000, self._restore_idle_status)
+        else:
+            self.status_label.config(text="Status: Idle", fg="#2e7d32")
+            if event.previous == AssistantState.TYPING:
+                self.refresh_history()
+                self.refresh_trends()
+    
+    def _restore_idle_status(self):
+        """Return a temporary status message to idle unless a dictation is in progress."""
+        if self.state_bus.state in (AssistantState.IDLE, AssistantState.ERROR):
+            self.status_label.config(text="Status: Idle", fg="#2e7d32")
+    
+    def create_level_meter(self, parent):
+        """
+        Create the input level meter: a scrolling RMS waveform with a peak
+        bar underneath. Canvas items are created once and only moved when
+        the meter redraws.
+        
+        Args:
+            parent: Frame to place the meter in
+        """
+        self.meter_width = METER_BARS * 4
+        self.meter_height = 40
+        self.meter_canvas = tk.Canvas(
+            parent,
+            width=self.meter_width,
+            height=self.meter_height + 8,
+            bg="#263238",
+            highlightthickness=0
+        )
+        self.meter_canvas.pack(side=tk.LEFT, padx=10)
+        
+        self.meter_bars = [
+            self.meter_canvas.create_rectangle(0, 0, 0, 0, fill="#4fc3f7", width=0)
+            for _ in range(METER_BARS)
+        ]
+        self.meter_peak = self.meter_canvas.create_rectangle(0, 0, 0, 0, fill="#66bb6a", width=0)
+        self._meter_job = None
+    
+    def start_level_meter(self):
+        """Start redrawing the level meter at METER_FPS."""
+        if self._meter_job is None:
+            self._update_level_meter()
+    
+    def stop_level_meter(self):
+        """Stop redrawing the level meter and clear it."""
+        if self._meter_job is not None:
+            self.root.after_cancel(self._meter_job)
+            self._meter_job = None
+        for bar in self.meter_bars:
+            self.meter_canvas.coords(bar, 0, 0, 0, 0)
+        self.meter_canvas.coords(self.meter_peak, 0, 0, 0, 0)
+    
+    def _update_level_meter(self):
+        """Redraw the level meter from the recorder's level history."""
+        history = self.recorder.get_level_history(METER_BARS)
+        mid = self.meter_height / 2
+        
+        for index, bar in enumerate(self.meter_bars):
+            half = level_to_fraction(float(history[index, 0])) * mid
+            x = index * 4
+            self.meter_canvas.coords(bar, x, mid - half, x + 3, mid + half + 1)
+        
+        peak = float(history[-1, 1])
+        color = "#ef5350" if peak >= 0.99 else "#66bb6a"
+        self.meter_canvas.coords(
+            self.meter_peak,
+            0, self.meter_height + 3,
+            level_to_fraction(peak) * self.meter_width, self.meter_height + 7
+        )
+        self.meter_canvas.itemconfig(self.meter_peak, fill=color)
+        
+        self._meter_job = self.root.after(1000 // METER_FPS, self._update_level_meter)
+    
     def toggle_recording(self):
-        """Toggle recording on/off."""
-        if self.is_recording:
-            # Stop recording
-            self.is_recording = False
-            self.status_label.config(text="Status: Processing...", fg="#ff9800")
-            self.record_btn.config(text="🎤 Start Recording", bg="#4caf50")
-            
+        """Toggle recording on/off (main thread)."""
+        if self.state_bus.transition(AssistantState.RECORDING, AssistantState.TRANSCRIBING):
             # Process in background thread
             threading.Thread(target=self.process_recording, daemon=True).start()
-        else:
-            # Start recording
-            self.is_recording = True
+        elif self.state_bus.transition((AssistantState.IDLE, AssistantState.ERROR), AssistantState.RECORDING):
             self.recording_start_time = time.time()
             
+            # Reload an unloaded model while the user speaks
+            self.transcriber.prefetch()
+            
             # Store cursor position
             self.cursor_tracker.store_position()
             pos = self.cursor_tracker.get_stored_position()
@@ -301,63 +580,129 @@ class VoiceAssistantGUI:
             if pos:
                 self.cursor_highlighter.highlight(pos[0], pos[1], duration=500)
             
-            # Play audio feedback
-            self.audio_feedback.play_beep(frequency=800, duration=100)
+            # Play audio feedback. An armed recording starts at once and is
+            # recorded without a gap, so a cue would end up in the audio.
+            cue_seconds = 0.0
+            if not self.recorder.is_armed:
+                cue_seconds = self.audio_feedback.play_cue("start")
             
-            # Start recording
-            self.recorder.start_recording()
-            self.status_label.config(text="Status: Recording...", fg="#f44336")
-            self.record_btn.config(text="🛑 Stop Recording", bg="#ff5722")
+            # Start recording, skipping the cue so it is not transcribed
+            self.recorder.start_recording(skip_seconds=cue_seconds)
+            if not self.recorder.is_recording:
+                self.transcriber.release()
+                self.audio_feedback.play_cue("error")
+                self.state_bus.set_state(AssistantState.ERROR, "Could not start recording")
     
     def process_recording(self):
         """Process recorded audio (runs in background thread)."""
         # Calculate duration
-        duration = time.time() - self.recording_start_time if self.recording_start_time else 0
-        
-        # Stop recording and get audio
-        audio_data = self.recorder.stop_recording()
-        
-        if len(audio_data) == 0:
-            self.root.after(0, lambda: self.status_label.config(
-                text="Status: No audio recorded",
-                fg="#f44336"
-            ))
-            self.root.after(2000, lambda: self.status_label.config(
-                text="Status: Idle",
-                fg="#2e7d32"
-            ))
-            return
-        
-        # Transcribe
-        text = self.transcriber.transcribe(audio_data)
-        
-        if not text:
-            self.root.after(0, lambda: self.status_label.config(
-                text="Status: No text transcribed",
-                fg="#f44336"
-            ))
-            self.root.after(2000, lambda: self.status_label.config(
-                text="Status: Idle",
-                fg="#2e7d32"
-            ))
-            return
+        stop_time = time.time()
+        duration = stop_time - self.recording_start_time if self.recording_start_time else 0
         
-        # Save to database
-        self.db.add_transcription(text, duration)
-        
-        # Get stored cursor position and type text
-        stored_pos = self.cursor_tracker.get_stored_position()
-        if stored_pos:
-            self.typer.type_text(text, click_position=stored_pos)
-        else:
-            self.typer.type_text(text)
-        
-        # Update UI
-        self.root.after(0, self.refresh_history)
-        self.root.after(0, lambda: self.status_label.config(
-            text="Status: Idle",
-            fg="#2e7d32"
-        ))
+        try:
+            # Stop recording and get audio
+            audio_data = self.recorder.stop_recording()
+            self.audio_feedback.play_cue("stop")
+            
+            if len(audio_data) == 0:
+                self.audio_feedback.play_cue("error")
+                self.state_bus.set_state(AssistantState.ERROR, "No audio recorded")
+                return
+            
+            # Transcribe. With a draft model, the draft is stored and typed
+            # while the final pass runs, then corrected in place.
+            stored_pos = self.cursor_tracker.get_stored_position()
+            drafted = {}
+            typing_seconds = 0.0
+            
+            def on_draft(draft):
+                nonlocal typing_seconds
+                drafted["text"] = draft
+                drafted["row_id"] = self.db.add_transcription(draft, duration, time.time() - stop_time)
+                self._draft_ids.add(drafted["row_id"])
+                self.run_on_ui(self.refresh_history)
+                
+                self.state_bus.set_state(AssistantState.TYPING)
+                typing_start = time.perf_counter()
+                self.output.draft(draft, click_position=stored_pos)
+                typing_seconds += time.perf_counter() - typing_start
+                self.state_bus.set_state(AssistantState.TRANSCRIBING, "Refining")
+            
+            transcribe_start = time.time()
+            text = self.transcriber.transcribe_with_draft(audio_data, on_draft)
+            decode_seconds = self.transcriber.last_decode_seconds
+            clip_id = self.transcriber.last_clip_id
+            draft = drafted.get("text")
+            
+            if not text and not draft:
+                if self.recorder.last_spill_path is not None:
+                    # Decoding may have failed; keep the recording for 'main.py recover'
+                    logger.warning(f"⚠️  Keeping {self.recorder.last_spill_path} for recovery")
+                self.audio_feedback.play_cue("error")
+                self.state_bus.set_state(AssistantState.ERROR, "No text transcribed")
+                return
+            
+            if draft is None:
+                latency = time.time() - stop_time
+                
+                # Save to database
+                row_id = self.db.add_transcription(text, duration, latency)
+            else:
+                row_id = drafted["row_id"]
+                self._draft_ids.discard(row_id)
+                if text and text != draft:
+                    self.db.update_transcription_text(row_id, text)
+                else:
+                    # Final pass failed or agreed: the draft stands
+                    self.run_on_ui(self.refresh_history)
+            
+            # Type text at the stored cursor position (or the current one),
+            # or correct the draft in place; other outputs get the final text
+            self.state_bus.set_state(AssistantState.TYPING)
+            typing_start = time.perf_counter()
+            self.output.write(
+                text or draft,
+                draft=draft,
+                click_position=stored_pos,
+                audio_seconds=len(audio_data) / self.recorder.sample_rate,
+                model=self.transcriber.model_name,
+                engine=self.transcriber.last_engine
+            )
+            typing_seconds += time.perf_counter() - typing_start
+            
+            if STORE_AUDIO:
+                self.db.add_audio(row_id, audio_data, self.recorder.sample_rate)
+            if text and clip_id is not None:
+                self._clip_ids[row_id] = clip_id
+            
+            # Timings are measured from the end of the recording
+            offset = transcribe_start - stop_time
+            timings = self.transcriber.last_timings
+            self.db.add_metrics(
+                row_id,
+                capture_seconds=len(audio_data) / self.recorder.sample_rate,
+                decode_seconds=decode_seconds,
+                typing_seconds=typing_seconds,
+                model=self.transcriber.model_name,
+                engine=self.transcriber.last_engine,
+                first_text_seconds=offset + timings["first_text_seconds"],
+                final_text_seconds=offset + timings["final_text_seconds"]
+            )
+            
+            # Stored in the history; a spilled recording is no longer needed
+            audio_data = None
+            self.recorder.discard_spill()
+            
+            self.state_bus.set_state(AssistantState.IDLE)
+        except Exception as e:
+            logger.error(f"Error processing recording: {e}")
+            self.audio_feedback.play_cue("error")
+            self.state_bus.set_state(AssistantState.ERROR, "Processing failed")
+        finally:
+            # Let the idle timer run again (see prefetch())
+            self.transcriber.release()
+            # A spilled recording not discarded above can now be recovered
+            self.recorder.release_spill()
     
     def refresh_history(self):
         """Refresh the history display."""
@@ -373,6 +718,8 @@ class VoiceAssistantGUI:
             text=f"📝 Transcription History ({len(transcriptions)} items)"
         )
         
+        self.refresh_statistics()
+        
         # Display each transcription
         for idx, (trans_id, timestamp, text, duration) in enumerate(transcriptions):
             # Container for each item
@@ -397,6 +744,16 @@ class VoiceAssistantGUI:
             )
             time_label.pack(side=tk.LEFT)
             
+            if trans_id in self._draft_ids:
+                draft_label = tk.Label(
+                    info_frame,
+                    text="✏️ draft, refining...",
+                    font=("Arial", 8, "italic"),
+                    fg="#ff9800",
+                    bg=item_frame["bg"]
+                )
+                draft_label.pack(side=tk.LEFT, padx=5)
+            
             if duration:
                 duration_label = tk.Label(
                     info_frame,
@@ -445,16 +802,49 @@ class VoiceAssistantGUI:
                 pady=3
             )
             delete_btn.pack(side=tk.LEFT, padx=2)
+            
+            retry_btn = tk.Button(
+                btn_frame,
+                text="🔁 Retry",
+                command=lambda tid=trans_id: self.retry_item(tid),
+                font=("Arial", 8),
+                bg="#9c27b0",
+                fg="white",
+                padx=10,
+                pady=3
+            )
+            retry_btn.pack(side=tk.LEFT, padx=2)
+    
+    def refresh_statistics(self):
+        """Refresh the statistics summary from the aggregate tables."""
+        today = datetime.now().strftime("%Y-%m-%d")
+        daily = self.db.get_daily_statistics(days=1)
+        today_stats = daily[0] if daily and daily[0]["day"] == today else None
+        total_stats = self.db.get_statistics()
+        
+        if today_stats:
+            self.today_stats_label.config(text="📊 Today: " + self._format_statistics(today_stats))
+        else:
+            self.today_stats_label.config(text="📊 Today: 0 dictations")
+        self.total_stats_label.config(text="📈 All time: " + self._format_statistics(total_stats))
+    
+    @staticmethod
+    def _format_statistics(stats: dict) -> str:
+        """Format a statistics dictionary for the summary panel."""
+        text = (
+            f"{stats['count']} dictations · {stats['total_duration']:.1f}s recorded · "
+            f"{stats['total_chars']} characters"
+        )
+        if stats["avg_latency"] is not None:
+            text += f" · avg latency {stats['avg_latency']:.2f}s"
+        return text
     
     def copy_to_clipboard(self, text: str):
         """Copy text to clipboard."""
         self.root.clipboard_clear()
         self.root.clipboard_append(text)
         self.status_label.config(text="Status: Copied to clipboard!", fg="#2196f3")
-        self.root.after(2000, lambda: self.status_label.config(
-            text="Status: Idle",
-            fg="#2e7d32"
-        ))
+        self.root.after(2000, self._restore_idle_status)
     
     def delete_item(self, transcription_id: int):
         """Delete a specific transcription."""
@@ -462,25 +852,179 @@ class VoiceAssistantGUI:
             self.db.delete_transcription(transcription_id)
             self.refresh_history()
     
+    def retry_item(self, transcription_id: int):
+        """
+        Ask for decoding options and transcribe a history item again.
+        
+        Recent clips are re-decoded from their cached encoder output;
+        older ones are transcribed from their stored audio.
+        """
+        clip_id = self._clip_ids.get(transcription_id)
+        if clip_id is None and not STORE_AUDIO:
+            messagebox.showinfo("Retry", "Only recent dictations can be retried while audio is not stored.")
+            return
+        
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Retry Transcription")
+        dialog.transient(self.root)
+        dialog.resizable(False, False)
+        form = tk.Frame(dialog, padx=12, pady=10)
+        form.pack(fill=tk.BOTH)
+        
+        language = tk.StringVar(value="auto")
+        prompt = tk.StringVar()
+        temperature = tk.DoubleVar(value=0.0)
+        beam_size = tk.IntVar(value=5)
+        
+        tk.Label(form, text="Language:").grid(row=0, column=0, sticky=tk.W, pady=2)
+        ttk.Combobox(
+            form,
+            textvariable=language,
+            values=["auto", "en", "de", "es", "fr", "hi", "it", "ja", "pt", "zh"],
+            width=10
+        ).grid(row=0, column=1, sticky=tk.W, pady=2)
+        tk.Label(form, text="Prompt (names, spelling):").grid(row=1, column=0, sticky=tk.W, pady=2)
+        tk.Entry(form, textvariable=prompt, width=32).grid(row=1, column=1, sticky=tk.W, pady=2)
+        tk.Label(form, text="Temperature:").grid(row=2, column=0, sticky=tk.W, pady=2)
+        tk.Spinbox(form, textvariable=temperature, from_=0.0, to=1.0, increment=0.2,
+                   width=6).grid(row=2, column=1, sticky=tk.W, pady=2)
+        tk.Label(form, text="Beam size (at temperature 0):").grid(row=3, column=0, sticky=tk.W, pady=2)
+        tk.Spinbox(form, textvariable=beam_size, from_=1, to=10, width=6).grid(row=3, column=1, sticky=tk.W, pady=2)
+        
+        def submit():
+            options = {
+                "language": None if language.get().strip() in ("", "auto") else language.get().strip(),
+                "prompt": prompt.get().strip() or None,
+                "temperature": float(temperature.get()),
+                "beam_size": beam_size.get() if beam_size.get() > 1 else None
+            }
+            dialog.destroy()
+            self.status_label.config(text="Status: Retrying...", fg="#ff9800")
+            threading.Thread(target=self._retry_item, args=(transcription_id, options), daemon=True).start()
+        
+        tk.Button(form, text="🔁 Retry", command=submit, bg="#9c27b0", fg="white",
+                  padx=10).grid(row=4, column=1, sticky=tk.E, pady=(8, 0))
+    
+    def _retry_item(self, transcription_id: int, options: dict):
+        """Re-decode a history item and store the new text (background thread)."""
+        try:
+            clip_id = self._clip_ids.get(transcription_id)
+            audio_data = None
+            try:
+                text = self.transcriber.redecode(clip_id, **options)
+            except KeyError:
+                # Fell out of the cache; transcribe the stored audio
+                stored = self.db.get_audio(transcription_id)
+                if stored is None:
+                    self.run_on_ui(lambda: self._show_temporary_status("Status: No audio stored for this item"))
+                    return
+                audio_data = stored[0]
+                text = self.transcriber.redecode(None, audio_data, **options)
+            if audio_data is not None and self.transcriber.last_clip_id is not None:
+                self._clip_ids[transcription_id] = self.transcriber.last_clip_id
+            
+            if not text:
+                self.run_on_ui(lambda: self._show_temporary_status("Status: Retry produced no text"))
+                return
+            self.db.update_transcription_text(transcription_id, text)
+            seconds = self.transcriber.last_decode_seconds
+            skipped = " (encoder skipped)" if self.transcriber.last_redecode_cached else ""
+            self.run_on_ui(self.refresh_history)
+            self.run_on_ui(lambda: self._show_temporary_status(f"Status: Retried in {seconds:.2f}s{skipped}"))
+        except Exception as e:
+            logger.error(f"Error retrying transcription: {e}")
+            self.run_on_ui(lambda: self._show_temporary_status("Status: Retry failed"))
+    
     def clear_all_history(self):
         """Clear all history."""
         if messagebox.askyesno("Confirm Clear All", "Delete ALL transcription history?"):
             self.db.clear_all()
             self.refresh_history()
     
-    def update_status(self):
-        """Update status periodically."""
-        # This can be extended to show more real-time info
-        self.root.after(100, self.update_status)
+    def export_history(self):
+        """Export history to a JSONL or CSV file chosen by the user."""
+        path = filedialog.asksaveasfilename(
+            title="Export History",
+            defaultextension=".jsonl",
+            filetypes=[("JSON Lines", "*.jsonl"), ("CSV", "*.csv")]
+        )
+        if not path:
+            return
+        
+        self.status_label.config(text="Status: Exporting history...", fg="#ff9800")
+        
+        def run():
+            try:
+                count = export_history(self.db, path)
+                message = f"Status: Exported {count} items"
+            except Exception as e:
+                logger.error(f"Error exporting history: {e}")
+                message = "Status: Export failed"
+            self.run_on_ui(lambda: self._show_temporary_status(message))
+        
+        threading.Thread(target=run, daemon=True).start()
+    
+    def import_history(self):
+        """Import history from a JSONL or CSV file chosen by the user."""
+        path = filedialog.askopenfilename(
+            title="Import History",
+            filetypes=[("History files", "*.jsonl *.csv"), ("All files", "*.*")]
+        )
+        if not path:
+            return
+        
+        self.status_label.config(text="Status: Importing history...", fg="#ff9800")
+        
+        def run():
+            try:
+                count = import_history(self.db, path)
+                message = f"Status: Imported {count} new items"
+            except Exception as e:
+                logger.error(f"Error importing history: {e}")
+                message = "Status: Import failed"
+            self.run_on_ui(self.refresh_history)
+            self.run_on_ui(lambda: self._show_temporary_status(message))
+        
+        threading.Thread(target=run, daemon=True).start()
+    
+    def toggle_profiling(self):
+        """Start profiling the next dictations, or stop an active capture."""
+        if self.profiler.active:
+            # Reported by _on_profile_finished
+            self.profiler.stop()
+            return
+        self.profiler.start(DEFAULT_DICTATIONS)
+        self.tools_menu.entryconfig(0, label="Stop Profiling")
+        self._show_temporary_status(f"Status: Profiling the next {DEFAULT_DICTATIONS} dictations")
+    
+    def _on_profile_finished(self, bundle):
+        """Reset the menu and tell the user where the profile was saved."""
+        self.tools_menu.entryconfig(0, label=f"Profile Next {DEFAULT_DICTATIONS} Dictations")
+        messagebox.showinfo("Diagnostics", f"Profile saved to:\n{bundle}")
+    
+    def _show_temporary_status(self, message: str):
+        """Show a status message for two seconds, then return to idle."""
+        self.status_label.config(text=message, fg="#2196f3")
+        self.root.after(2000, self._restore_idle_status)
     
     def on_closing(self):
         """Handle window close event."""
         keyboard.unhook_all()
+        # Write the bundle before exiting; nobody is left to be told about it,
+        # and reporting through the blocked main loop would hang
+        self.profiler.on_finished = None
+        self.profiler.stop(wait=True)
+        self.retention_worker.stop()
+        self.recorder.disarm()
+        self.cursor_highlighter.close()
+        self.audio_feedback.close()
+        self.output.close()
         self.root.destroy()
 
 
 def main():
     """Main entry point for GUI application."""
+    setup_logging()
     root = tk.Tk()
     app = VoiceAssistantGUI(root)
     root.protocol("WM_DELETE_WINDOW", app.on_closing)
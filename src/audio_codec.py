@@ -0,0 +1,66 @@
+"""
+Compact Audio Encoding
+=======================
+Lossless compression of recorded clips for storage next to their history rows.
+
+Clips are quantized to int16, delta-encoded and zlib-compressed. Speech
+changes slowly from sample to sample, so the deltas are small and compress
+far better than the raw samples.
+"""
+
+import zlib
+import numpy as np
+
+
+# Identifier stored with each clip so the format can evolve later
+CODEC_NAME = "int16-delta-zlib"
+
+
+def to_int16(audio_data: np.ndarray) -> np.ndarray:
+    """
+    Quantize float audio in [-1, 1] to int16.
+    
+    Args:
+        audio_data: numpy array of audio samples (float32 or int16)
+    
+    Returns:
+        int16 numpy array
+    """
+    if audio_data.dtype == np.int16:
+        return audio_data
+    clipped = np.clip(audio_data, -1.0, 1.0)
+    return np.round(clipped * 32767.0).astype(np.int16)
+
+
+def encode_audio(audio_data: np.ndarray) -> bytes:
+    """
+    Encode a mono clip into a compact byte string.
+    
+    Args:
+        audio_data: numpy array of audio samples (float32 or int16)
+    
+    Returns:
+        Compressed bytes
+    """
+    samples = to_int16(np.asarray(audio_data).reshape(-1))
+    # int16 arithmetic wraps around, so the deltas can always be undone exactly
+    deltas = np.empty_like(samples)
+    if len(samples):
+        deltas[0] = samples[0]
+        np.subtract(samples[1:], samples[:-1], out=deltas[1:])
+    return zlib.compress(deltas.astype("<i2").tobytes(), 6)
+
+
+def decode_audio(blob: bytes) -> np.ndarray:
+    """
+    Decode bytes produced by encode_audio.
+    
+    Args:
+        blob: Compressed bytes
+    
+    Returns:
+        float32 numpy array of audio samples in [-1, 1]
+    """
+    deltas = np.frombuffer(zlib.decompress(blob), dtype="<i2")
+    samples = np.cumsum(deltas, dtype=np.int16)
+    return samples.astype(np.float32) / 32767.0
@@ -0,0 +1,507 @@
+"""
+Audio Sources
+==============
+Where audio comes from, behind one interface.
+
+Every source produces the same thing: float32 mono blocks at 16 kHz,
+from AudioSource.blocks(). Each source only implements _read_raw(), which
+returns the next block of raw samples as a view of a buffer it reuses;
+the shared code converts that view to mono float32 in place in a
+reusable buffer and resamples it with StreamingResampler if the source is
+not at 16 kHz. Apart from that one conversion (and the resampler), no
+copies are made between the source and the consumer.
+
+Blocks are only valid until the next block is requested (like the
+buffer an audio callback receives): copy what you keep.
+
+Blocks can be pulled with blocks() or pushed to a callback with start(),
+which is how AudioRecorder records a dictation from any source.
+MicrophoneSource pushes straight from the audio callback; the other
+sources push from a reader thread.
+
+File, stdin and socket sources are read as fast as they deliver data,
+so they can be transcribed faster than real time.
+
+This module contains:
+- AudioSource: Base class
+- MicrophoneSource: Default input device (sounddevice)
+- FileSource: WAV file (stdlib), or FLAC/OGG/WAV via soundfile if installed
+- PcmStreamSource: Raw little-endian int16 PCM from a binary stream (stdin)
+- SocketSource: Raw int16 PCM sent to a local TCP port
+- open_source: Builds a source from a command-line spec
+"""
+
+import sys
+import queue
+import socket
+import threading
+import wave
+from pathlib import Path
+from typing import BinaryIO, Callable, Iterator, Optional
+import numpy as np
+from log import get_logger
+from resample import StreamingResampler
+
+
+logger = get_logger(__name__)
+
+
+TARGET_RATE = 16000
+BLOCK_SECONDS = 0.5  # Block size for file, stdin and socket reads
+
+
+class AudioSource:
+    """
+    A stream of audio, delivered as float32 mono blocks at 16 kHz.
+    
+    Subclasses set sample_rate and channels, and implement _read_raw().
+    A source is read once: blocks() closes it at the end of the stream.
+    """
+    
+    def __init__(self, sample_rate: int, channels: int = 1):
+        """
+        Initialize the source.
+        
+        Args:
+            sample_rate: Rate of the raw samples in Hz
+            channels: Interleaved channels in the raw samples
+        """
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.frames_read = 0  # Raw frames delivered so far
+        self._float = np.zeros(0, dtype=np.float32)
+        self._stop_requested = threading.Event()
+        self._pusher = None  # Thread feeding start()'s callback
+    
+    @property
+    def seconds_read(self) -> float:
+        """Audio delivered so far, in seconds."""
+        return self.frames_read / self.sample_rate
+    
+    def _read_raw(self) -> Optional[np.ndarray]:
+        """
+        Read the next block of raw samples.
+        
+        Returns:
+            int16 or float32 array of shape (frames, channels), usually a
+            view of a reused buffer; None at the end of the stream
+        """
+        raise NotImplementedError
+    
+    def close(self):
+        """Release the source's device, file or connection."""
+    
+    def blocks(self) -> Iterator[np.ndarray]:
+        """
+        Yield the stream as float32 mono blocks at 16 kHz.
+        
+        Yields:
+            1-D float32 arrays, valid until the next block is requested
+        """
+        resampler = None
+        try:
+            while True:
+                raw = self._read_raw()
+                if raw is None:
+                    break
+                if len(raw) == 0:
+                    continue
+                if resampler is None and self.sample_rate != TARGET_RATE:
+                    # Created after the first read: a microphone only knows
+                    # its rate once the device is open
+                    resampler = StreamingResampler(self.sample_rate, TARGET_RATE)
+                self.frames_read += len(raw)
+                mono = self._to_mono_float(raw)
+                yield resampler.process(mono) if resampler is not None else mono
+            if resampler is not None:
+                tail = resampler.flush()
+                if len(tail):
+                    yield tail
+        finally:
+            self.close()
+    
+    def start(self, on_block: Callable[[np.ndarray], None], on_end: Optional[Callable[[], None]] = None):
+        """
+        Push the stream to a callback from a reader thread.
+        
+        Args:
+            on_block: Called with each block (see blocks())
+            on_end: Called once the stream has ended or stop() was called
+        """
+        self._stop_requested.clear()
+        self._pusher = threading.Thread(target=self._push, args=(on_block, on_end), daemon=True)
+        self._pusher.start()
+    
+    def _push(self, on_block: Callable[[np.ndarray], None], on_end: Optional[Callable[[], None]]):
+        """Feed blocks() to on_block until the end or stop() (reader thread)."""
+        blocks = self.blocks()
+        try:
+            for block in blocks:
+                if self._stop_requested.is_set():
+                    break
+                on_block(block)
+        except Exception as e:
+            logger.error(f"❌ Error reading audio: {e}")
+        finally:
+            blocks.close()
+            if on_end is not None:
+                on_end()
+    
+    def stop(self):
+        """
+        Stop a stream started with start(). Blocks already handed to the
+        callback have been handled when this returns; a read that is
+        still waiting for data is given a second to finish.
+        """
+        self._stop_requested.set()
+        if self._pusher is not None and self._pusher is not threading.current_thread():
+            self._pusher.join(timeout=1.0)
+        self._pusher = None
+    
+    def _to_mono_float(self, raw: np.ndarray) -> np.ndarray:
+        """Convert raw samples to float32 mono in the reused buffer."""
+        frames = len(raw)
+        if len(self._float) < frames:
+            self._float = np.zeros(frames, dtype=np.float32)
+        out = self._float[:frames]
+        
+        if raw.ndim == 2 and raw.shape[1] > 1:
+            np.mean(raw, axis=1, dtype=np.float32, out=out)
+        else:
+            out[:] = raw.reshape(-1)
+        if raw.dtype == np.int16:
+            out *= 1.0 / 32767.0
+        return out
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+
+
+class MicrophoneSource(AudioSource):
+    """
+    The default input device, until stop() is called or seconds have passed.
+    
+    Unlike the other sources it can be started again after stop(). start()
+    delivers blocks from the audio callback itself, so the callback must
+    return quickly.
+    """
+    
+    def __init__(self, sample_rate: int = TARGET_RATE, seconds: Optional[float] = None,
+                 block_seconds: float = 0.1, native_rate: bool = False):
+        """
+        Initialize the source (the device is opened on the first read).
+        
+        Args:
+            sample_rate: Capture rate in Hz
+            seconds: Stop blocks() after this much audio (None: until stop())
+            block_seconds: Block size of the input stream (0 lets the host
+                           API choose)
+            native_rate: Capture at the device's own rate and resample here
+                         instead of making the host API resample (see
+                         resample.py); sample_rate is then the fallback
+        """
+        super().__init__(sample_rate, channels=1)
+        self.seconds = seconds
+        self.block_seconds = block_seconds
+        self.native_rate = native_rate
+        self._requested_rate = sample_rate
+        self._queue = queue.Queue()
+        self._stream = None
+        self._stopped = False
+        self._resampler = None  # StreamingResampler for start() when not at 16 kHz
+        self._on_block = None
+        self._on_end = None
+    
+    def _open_stream(self, callback):
+        """
+        Create and start a mono float32 input stream, and set sample_rate
+        to its rate.
+        
+        Opens the device at its native rate when native_rate is set, and
+        falls back to letting the host API resample if that fails.
+        
+        Args:
+            callback: sounddevice callback for the stream
+        """
+        import sounddevice as sd
+        
+        rates = [self._requested_rate]
+        if self.native_rate:
+            native = int(sd.query_devices(kind="input")["default_samplerate"])
+            if native != self._requested_rate:
+                rates.insert(0, native)
+        
+        for index, rate in enumerate(rates):
+            # Set before the stream starts: the callback can run at once
+            self._set_rate(rate)
+            try:
+                stream = sd.InputStream(
+                    samplerate=rate,
+                    channels=1,
+                    dtype=np.float32,
+                    blocksize=int(self.block_seconds * rate),
+                    callback=callback
+                )
+                stream.start()
+                return stream
+            except Exception as e:
+                if index == len(rates) - 1:
+                    raise
+                logger.warning(f"Could not open input at {rate} Hz ({e}), trying {self._requested_rate} Hz")
+    
+    def _set_rate(self, rate: int):
+        """Prepare the push resampler for a stream running at `rate` Hz."""
+        self.sample_rate = rate
+        if rate == TARGET_RATE:
+            self._resampler = None
+        elif self._resampler is not None and self._resampler.input_rate == rate:
+            self._resampler.reset()
+        else:
+            self._resampler = StreamingResampler(rate, TARGET_RATE)
+    
+    def _callback(self, indata, frames, time_info, status):
+        """Queue a copy of each block (indata is only valid during the call)."""
+        if status:
+            logger.warning("Audio status: %s", status)
+        self._queue.put(indata.copy())
+    
+    def _push_callback(self, indata, frames, time_info, status):
+        """Hand each block to the start() callback (audio callback)."""
+        if status:
+            # Only queues the record; formatting and I/O happen on the log thread
+            logger.warning("Audio status: %s", status)
+        block = indata[:, 0]
+        if self._resampler is not None:
+            block = self._resampler.process(block)
+        self.frames_read += frames
+        self._on_block(block)
+    
+    def start(self, on_block: Callable[[np.ndarray], None], on_end: Optional[Callable[[], None]] = None):
+        """
+        Push blocks to a callback from the audio callback.
+        
+        Args:
+            on_block: Called with each block (see blocks())
+            on_end: Called by stop()
+        """
+        self._on_block = on_block
+        self._on_end = on_end
+        try:
+            self._stream = self._open_stream(self._push_callback)
+        except Exception:
+            self._on_block = self._on_end = None
+            raise
+    
+    def stop(self):
+        """
+        End the stream after the blocks already captured. After start(),
+        the audio still held by the resampler is delivered before this
+        returns.
+        """
+        if self._on_block is None:
+            # Read with blocks(): end once the queue is drained
+            self._stopped = True
+            self._queue.put(None)
+            return
+        
+        self.close()
+        on_block, on_end = self._on_block, self._on_end
+        self._on_block = self._on_end = None
+        if self._resampler is not None:
+            tail = self._resampler.flush()
+            if len(tail):
+                on_block(tail)
+        if on_end is not None:
+            on_end()
+    
+    def _read_raw(self) -> Optional[np.ndarray]:
+        if self._stream is None and not self._stopped:
+            self._stream = self._open_stream(self._callback)
+            logger.info("🎤 Listening... (Ctrl+C to stop)")
+        if self.seconds is not None and self.seconds_read >= self.seconds:
+            return None
+        # Poll so Ctrl+C is handled promptly on Windows
+        while True:
+            try:
+                return self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+    
+    def close(self):
+        if self._stream is not None:
+            self._stream.stop()
+            self._stream.close()
+            self._stream = None
+
+
+class FileSource(AudioSource):
+    """An audio file, read block by block."""
+    
+    def __init__(self, path, block_seconds: float = BLOCK_SECONDS):
+        """
+        Open the file.
+        
+        WAV files are read with the standard library (16-bit PCM). Other
+        formats (FLAC, OGG) need the soundfile package.
+        
+        Args:
+            path: Audio file
+            block_seconds: Block size in seconds
+        """
+        self.path = Path(path)
+        self._wave = None
+        self._soundfile = None
+        
+        if self.path.suffix.lower() == ".wav":
+            self._wave = wave.open(str(self.path), "rb")
+            if self._wave.getsampwidth() != 2:
+                self._wave.close()
+                raise ValueError(f"{self.path.name}: only 16-bit WAV files are supported")
+            super().__init__(self._wave.getframerate(), self._wave.getnchannels())
+        else:
+            try:
+                import soundfile
+            except ImportError:
+                raise ValueError(f"{self.path.name}: reading {self.path.suffix} files needs "
+                                 f"'pip install soundfile'")
+            self._soundfile = soundfile.SoundFile(str(self.path))
+            super().__init__(self._soundfile.samplerate, self._soundfile.channels)
+        
+        self.block_frames = max(1, int(self.sample_rate * block_seconds))
+        self._buffer = np.zeros((self.block_frames, self.channels), dtype=np.int16)
+    
+    @property
+    def duration(self) -> float:
+        """Length of the file in seconds."""
+        frames = self._wave.getnframes() if self._wave else self._soundfile.frames
+        return frames / self.sample_rate
+    
+    def _read_raw(self) -> Optional[np.ndarray]:
+        if self._wave is not None:
+            data = self._wave.readframes(self.block_frames)
+            if not data:
+                return None
+            return np.frombuffer(data, dtype="<i2").reshape(-1, self.channels)
+        count = self._soundfile.read(out=self._buffer, dtype="int16")
+        if len(count) == 0:
+            return None
+        return count
+    
+    def close(self):
+        if self._wave is not None:
+            self._wave.close()
+        if self._soundfile is not None:
+            self._soundfile.close()
+
+
+class PcmStreamSource(AudioSource):
+    """Raw little-endian int16 PCM from a binary stream, such as stdin."""
+    
+    def __init__(self, stream: Optional[BinaryIO] = None, sample_rate: int = TARGET_RATE,
+                 channels: int = 1, block_seconds: float = BLOCK_SECONDS):
+        """
+        Initialize the source.
+        
+        Args:
+            stream: Binary stream to read (default: stdin)
+            sample_rate: Rate of the PCM data in Hz
+            channels: Interleaved channels in the PCM data
+            block_seconds: Block size in seconds
+        """
+        super().__init__(sample_rate, channels)
+        self.stream = stream if stream is not None else sys.stdin.buffer
+        self._buffer = bytearray(int(sample_rate * block_seconds) * channels * 2)
+        self._view = memoryview(self._buffer)
+        self._pending = 0  # Bytes of an incomplete frame kept from the last read
+    
+    def _receive_into(self, view: memoryview) -> int:
+        """Read bytes into view; returns 0 at the end of the stream."""
+        return self.stream.readinto(view) or 0
+    
+    def _read_raw(self) -> Optional[np.ndarray]:
+        filled = self._pending
+        # Fill the whole buffer unless the stream ends (pipes return short reads)
+        while filled < len(self._buffer):
+            count = self._receive_into(self._view[filled:])
+            if count == 0:
+                break
+            filled += count
+        
+        frame_bytes = 2 * self.channels
+        usable = filled - filled % frame_bytes
+        if usable == 0:
+            return None
+        samples = np.frombuffer(self._buffer, dtype="<i2", count=usable // 2).reshape(-1, self.channels)
+        
+        # An incomplete frame at the end waits for the next read. The
+        # samples above are converted before that read reuses the buffer.
+        self._pending = filled - usable
+        if self._pending:
+            samples = samples.copy()
+            self._buffer[:self._pending] = self._buffer[usable:filled]
+        return samples
+
+
+class SocketSource(PcmStreamSource):
+    """Raw int16 PCM sent by one client to a local TCP port."""
+    
+    def __init__(self, port: int, host: str = "127.0.0.1", sample_rate: int = TARGET_RATE,
+                 channels: int = 1, block_seconds: float = BLOCK_SECONDS, timeout: Optional[float] = None):
+        """
+        Listen on the port (the client is accepted on the first read).
+        
+        Args:
+            port: TCP port (0 picks a free one; see address)
+            host: Interface to bind (keep it on localhost)
+            sample_rate: Rate of the PCM data in Hz
+            channels: Interleaved channels in the PCM data
+            block_seconds: Block size in seconds
+            timeout: Seconds to wait for the client (None: forever)
+        """
+        self._server = socket.create_server((host, port))
+        self._server.settimeout(timeout)
+        self._connection = None
+        super().__init__(stream=None, sample_rate=sample_rate, channels=channels, block_seconds=block_seconds)
+    
+    @property
+    def address(self):
+        """(host, port) the source is listening on."""
+        return self._server.getsockname()[:2]
+    
+    def _receive_into(self, view: memoryview) -> int:
+        if self._connection is None:
+            host, port = self.address
+            logger.info(f"🔌 Waiting for PCM audio on {host}:{port}...")
+            self._connection, peer = self._server.accept()
+            logger.info(f"🔌 Receiving audio from {peer[0]}:{peer[1]}")
+        return self._connection.recv_into(view)
+    
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+        self._server.close()
+
+
+def open_source(spec: str, sample_rate: int = TARGET_RATE, channels: int = 1) -> AudioSource:
+    """
+    Build a source from a command-line spec.
+    
+    Args:
+        spec: 'mic', '-' (stdin), 'tcp:PORT' or a file path
+        sample_rate: Rate of raw PCM input (stdin, tcp) and of the microphone
+        channels: Channels of raw PCM input
+    
+    Returns:
+        AudioSource
+    """
+    if spec == "mic":
+        return MicrophoneSource(sample_rate=sample_rate)
+    if spec == "-":
+        return PcmStreamSource(sample_rate=sample_rate, channels=channels)
+    if spec.startswith("tcp:"):
+        return SocketSource(int(spec[4:]), sample_rate=sample_rate, channels=channels)
+    return FileSource(spec)
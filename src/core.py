@@ -4,97 +4,521 @@ Voice Assistant Core Components
 Shared classes used by both CLI and GUI versions.
 
 This module contains:
-- AudioRecorder: Records audio from microphone
-- WhisperTranscriber: Transcribes audio to text
+- AudioRecorder: Records audio from an AudioSource (the microphone by
+  default)
+- WhisperTranscriber: Transcribes audio to text, optionally as a fast
+  draft followed by a refined final result
 - TextTyper: Types text at cursor position
+
+Heavy dependencies (whisper/torch, sounddevice, pyautogui) are imported on
+first use rather than at module load, so entry points that never record,
+transcribe or type start quickly.
 """
 
 import sys
+import math
 import queue
+import threading
 import time
+from collections import OrderedDict
 import numpy as np
-import sounddevice as sd
-import whisper
-import pyautogui
-from typing import Optional, Tuple
+from typing import Callable, List, Optional, Tuple
+from audio_sources import AudioSource, MicrophoneSource
+from log import get_logger
+
+
+logger = get_logger(__name__)
+
+
+def level_to_fraction(level: float, floor_db: float = -60.0) -> float:
+    """
+    Map a linear audio level to a 0..1 meter position on a dB scale.
+    
+    Args:
+        level: Linear amplitude (RMS or peak), 1.0 = full scale
+        floor_db: Level shown as an empty meter
+    
+    Returns:
+        Meter position between 0.0 and 1.0
+    """
+    if level <= 0:
+        return 0.0
+    db = 20 * math.log10(level)
+    return min(1.0, max(0.0, 1.0 - db / floor_db))
 
 
 class AudioRecorder:
     """
-    Records audio from the microphone using sounddevice.
+    Records audio from an AudioSource, by default the microphone.
     Stores audio chunks in a thread-safe queue.
+    
+    Any other source (a file, stdin, a socket) records the same way, so the
+    whole dictation pipeline can run without an audio device; finished is
+    set when such a source runs out.
+    
+    In armed mode the input stream stays open between recordings and keeps
+    the last preroll_seconds of audio in a ring buffer. Starting a
+    recording is then instant, and the ring is prepended so speech that
+    began just before the hotkey press is not clipped.
     """
     
-    def __init__(self, sample_rate: int = 16000):
+    # Number of per-block (RMS, peak) values kept for the level meter
+    LEVEL_HISTORY = 128
+    
+    # Block length while armed; longer blocks mean fewer wakeups when idle
+    ARMED_BLOCK_SECONDS = 0.05
+    
+    def __init__(self, sample_rate: int = 16000, armed: bool = False,
+                 preroll_seconds: float = 0.4, spill_threshold_seconds: Optional[float] = None,
+                 spill_dir=None, native_rate: bool = True, source: Optional[AudioSource] = None):
         """
         Initialize the audio recorder.
         
         Args:
             sample_rate: Audio sample rate in Hz (Whisper expects 16kHz)
+            armed: Keep the input stream open between recordings (see arm())
+            preroll_seconds: Audio kept from before each recording in armed mode
+            spill_threshold_seconds: Write recordings longer than this to a
+                                     memory-mapped int16 file instead of
+                                     keeping them in RAM (None disables it)
+            spill_dir: Folder for spill files (default: spill.default_spill_dir())
+            native_rate: Capture at the input device's own rate and resample
+                         to sample_rate here, instead of making the host
+                         API resample (see resample.py)
+            source: AudioSource to record from instead of the microphone
+                    (started by start_recording() or arm())
         """
         self.sample_rate = sample_rate
+        self.native_rate = native_rate
+        self._given_source = source
         self.audio_queue = queue.Queue()
         self.is_recording = False
-        self.stream: Optional[sd.InputStream] = None
+        self.source = None  # Running AudioSource while recording or armed
+        self.finished = threading.Event()  # Set when the source has ended
+        self._skip_frames = 0
+        
+        # Level meter ring, written by the audio callback without allocating
+        self.levels = np.zeros((self.LEVEL_HISTORY, 2), dtype=np.float32)
+        self.level_count = 0
+        
+        # Pre-roll ring, written by the audio callback while armed and idle
+        self.armed = armed
+        self.preroll = np.zeros(max(1, int(preroll_seconds * sample_rate)), dtype=np.float32)
+        self._preroll_out = np.zeros_like(self.preroll)  # Ring in order, queued at start
+        self._preroll_pos = 0
+        self._preroll_filled = 0
+        self._preroll_pending = False
+        
+        # Spill-to-disk: a writer thread drains the queue while recording so
+        # the audio callback never touches the disk
+        self.spill_threshold_seconds = spill_threshold_seconds
+        self.spill_dir = spill_dir
+        self.last_spill_path = None  # Spill file behind the last recording
+        self._last_spill = None  # Its SpillFile, locked until released
+        self._spill_thread = None
+        self._spill_stop = threading.Event()
+        self._spill = None
+        self._chunks = []
+        
+        # Armed-mode cost accounting
+        self._armed_since = None
+        self._armed_cpu_start = 0.0
+        self._callback_count = 0
+        self._callback_cpu = 0.0
+        
+        if armed:
+            self.arm()
+    
+    def arm(self) -> bool:
+        """
+        Open the input stream and keep it running between recordings.
+        
+        Returns:
+            True if the stream is open
+        """
+        if self.source is not None:
+            return True
+        
+        try:
+            self.source = self._start_source(block_seconds=self.ARMED_BLOCK_SECONDS)
+            self.armed = True
+            self._armed_since = time.perf_counter()
+            self._armed_cpu_start = time.process_time()
+            self._callback_count = 0
+            self._callback_cpu = 0.0
+            logger.info(f"🎙️  Input armed ({len(self.preroll) * 1000 // self.sample_rate} ms pre-roll).")
+            return True
+        except Exception as e:
+            logger.error(f"Error arming input stream: {e}")
+            self.source = None
+            return False
+    
+    def disarm(self):
+        """Close the armed input stream and report what it cost."""
+        self.armed = False
+        if self.source is not None and not self.is_recording:
+            stats = self.get_armed_stats()
+            self.source.stop()
+            self.source = None
+            if stats:
+                logger.info(f"🎙️  Input disarmed: {stats['wakeups_per_second']:.0f} wakeups/s, "
+                            f"callback CPU {stats['callback_cpu_percent']:.2f}%, "
+                            f"process CPU {stats['process_cpu_percent']:.1f}% "
+                            f"over {stats['armed_seconds']:.0f} s")
+        self._armed_since = None
+    
+    def get_armed_stats(self) -> Optional[dict]:
+        """
+        Report the CPU cost of keeping the input stream armed.
+        
+        Power use is not measurable portably; wakeups per second and CPU
+        share are the figures that drive it.
+        
+        Returns:
+            Dictionary with armed_seconds, callbacks, wakeups_per_second,
+            callback_cpu_seconds, callback_cpu_percent and
+            process_cpu_percent, or None if not armed
+        """
+        if self._armed_since is None:
+            return None
+        
+        elapsed = max(time.perf_counter() - self._armed_since, 1e-9)
+        return {
+            "armed_seconds": elapsed,
+            "callbacks": self._callback_count,
+            "wakeups_per_second": self._callback_count / elapsed,
+            "callback_cpu_seconds": self._callback_cpu,
+            "callback_cpu_percent": 100.0 * self._callback_cpu / elapsed,
+            "process_cpu_percent": 100.0 * (time.process_time() - self._armed_cpu_start) / elapsed
+        }
+    
+    @property
+    def is_armed(self) -> bool:
+        """True if the input is armed, so a recording starts at once with the pre-roll."""
+        return self.armed and self.source is not None
+    
+    @property
+    def capture_rate(self) -> int:
+        """Rate the running source captures at, before resampling."""
+        return self.source.sample_rate if self.source is not None else self.sample_rate
+    
+    def _start_source(self, block_seconds: float = 0.0) -> AudioSource:
+        """
+        Start delivering blocks from the given source or a new microphone
+        source.
+        
+        Args:
+            block_seconds: Microphone block length (0 lets the host API choose)
+        """
+        source = self._given_source or MicrophoneSource(
+            sample_rate=self.sample_rate,
+            block_seconds=block_seconds,
+            native_rate=self.native_rate
+        )
+        self.finished.clear()
+        source.start(self._on_block, on_end=self.finished.set)
+        return source
+    
+    def _write_preroll(self, samples: np.ndarray):
+        """Append samples to the pre-roll ring (audio callback only)."""
+        size = len(self.preroll)
+        count = min(len(samples), size)
+        samples = samples[len(samples) - count:]
+        pos = self._preroll_pos
+        first = min(count, size - pos)
+        self.preroll[pos:pos + first] = samples[:first]
+        self.preroll[:count - first] = samples[first:]
+        self._preroll_pos = (pos + count) % size
+        self._preroll_filled = min(size, self._preroll_filled + count)
+    
+    def _take_preroll(self) -> np.ndarray:
+        """
+        Copy the pre-roll ring in order into its preallocated output
+        buffer (audio callback only).
+        
+        Returns:
+            View of the output buffer, valid until the next recording starts
+        """
+        pos = self._preroll_pos
+        size = len(self.preroll)
+        self._preroll_out[:size - pos] = self.preroll[pos:]
+        self._preroll_out[size - pos:] = self.preroll[:pos]
+        return self._preroll_out[size - self._preroll_filled:]
+    
+    def _on_block(self, block: np.ndarray):
+        """
+        Handle a float32 block at sample_rate (audio callback, or the
+        source's reader thread).
+        """
+        cpu_start = time.thread_time()
+        frames = len(block)
+        
+        # Per-block RMS and peak for the level meter. dot/max/min reduce to
+        # scalars, so no temporary arrays are allocated here.
+        if frames:
+            slot = self.level_count % self.LEVEL_HISTORY
+            self.levels[slot, 0] = math.sqrt(float(np.dot(block, block)) / frames)
+            self.levels[slot, 1] = max(float(block.max()), -float(block.min()))
+            self.level_count += 1
         
-    def _audio_callback(self, indata, frames, time_info, status):
-        """Callback function called by sounddevice for each audio block."""
-        if status:
-            print(f"Audio status: {status}", file=sys.stderr)
         if self.is_recording:
-            self.audio_queue.put(indata.copy())
+            if self._preroll_pending:
+                # Audio from just before the hotkey press goes first
+                self._preroll_pending = False
+                if self._preroll_filled:
+                    self.audio_queue.put(self._take_preroll())
+            if self._skip_frames > 0:
+                # Drop audio captured while the start cue was playing
+                if frames <= self._skip_frames:
+                    self._skip_frames -= frames
+                    block = block[:0]
+                else:
+                    block = block[self._skip_frames:]
+                    self._skip_frames = 0
+            if len(block):
+                # Blocks are only valid during the call
+                self.audio_queue.put(block.copy())
+        elif self.armed:
+            self._write_preroll(block)
+        
+        self._callback_count += 1
+        self._callback_cpu += time.thread_time() - cpu_start
     
-    def start_recording(self):
-        """Start recording audio from the microphone."""
+    def start_recording(self, skip_seconds: float = 0.0):
+        """
+        Start recording audio from the source.
+        
+        Args:
+            skip_seconds: Discard this much audio at the start, e.g. while
+                          a start cue is still audible. Ignored when armed:
+                          the pre-roll already holds speech from before the
+                          press, and dropping the audio after it would cut
+                          the first syllable out of the middle. Play no cue
+                          when is_armed is set.
+        """
         if self.is_recording:
             return
         
-        self.is_recording = True
+        armed = self.is_armed
+        self._skip_frames = 0 if armed else int(skip_seconds * self.sample_rate)
         self.audio_queue = queue.Queue()  # Clear previous data
+        self.reset_levels()
+        if self.spill_threshold_seconds is not None:
+            self._start_spill_writer()
+        
+        if armed:
+            # The stream is already running; the callback prepends the
+            # pre-roll on its next block
+            self._preroll_pending = True
+            self.is_recording = True
+            logger.info("🎤 Recording started (armed)...")
+            return
         
+        self.is_recording = True
         try:
-            self.stream = sd.InputStream(
-                samplerate=self.sample_rate,
-                channels=1,  # Mono audio
-                callback=self._audio_callback,
-                dtype=np.float32
-            )
-            self.stream.start()
-            print("🎤 Recording started...")
+            self.source = self._start_source()
+            logger.info("🎤 Recording started...")
         except Exception as e:
-            print(f"Error starting recording: {e}", file=sys.stderr)
+            logger.error(f"Error starting recording: {e}")
             self.is_recording = False
+            self._stop_spill_writer()
+    
+    def _start_spill_writer(self):
+        """Start the thread that moves queued audio to memory or disk."""
+        self._chunks = []
+        self._spill = None
+        self._spill_stop.clear()
+        self._spill_thread = threading.Thread(
+            target=self._spill_writer,
+            args=(self.audio_queue,),
+            daemon=True
+        )
+        self._spill_thread.start()
+    
+    def _spill_writer(self, audio_queue: queue.Queue):
+        """
+        Collect chunks in memory until the threshold, then spill to disk
+        (writer thread). If the file cannot be written, what it holds is
+        read back and the rest of the recording stays in memory.
+        
+        Args:
+            audio_queue: Queue filled by _on_block for this recording
+        """
+        threshold_frames = int(self.spill_threshold_seconds * self.sample_rate)
+        memory_frames = 0
+        spill_failed = False
+        
+        while True:
+            try:
+                chunk = audio_queue.get(timeout=0.1)
+            except queue.Empty:
+                if self._spill_stop.is_set():
+                    return
+                continue
+            
+            if self._spill is not None:
+                try:
+                    self._spill.write(chunk)
+                    continue
+                except OSError as e:
+                    # Disk full or gone: the rest of the recording stays in memory
+                    logger.error(f"❌ Could not write {self._spill.path} ({e}); "
+                                 f"keeping the recording in memory")
+                    spill, self._spill = self._spill, None
+                    spill_failed = True
+                    self._chunks = [self._abandon_spill(spill)]
+            
+            self._chunks.append(chunk)
+            memory_frames += len(chunk)
+            if memory_frames > threshold_frames and not spill_failed:
+                from spill import SpillFile, default_spill_dir
+                try:
+                    self._spill = SpillFile(
+                        self.spill_dir or default_spill_dir(),
+                        self.sample_rate,
+                        started=time.time() - memory_frames / self.sample_rate
+                    )
+                    for buffered in self._chunks:
+                        self._spill.write(buffered)
+                except OSError as e:
+                    logger.error(f"❌ Could not spill to disk ({e}); keeping the recording in memory")
+                    spill_failed = True
+                    if self._spill is not None:
+                        # The chunks are still in memory; only remove the file
+                        spill, self._spill = self._spill, None
+                        try:
+                            spill.abandon()
+                        except OSError:
+                            pass
+                    continue
+                self._chunks = []
+                logger.info(f"💾 Recording longer than {self.spill_threshold_seconds:.0f}s, "
+                            f"spilling to {self._spill.path}")
+    
+    @staticmethod
+    def _abandon_spill(spill) -> np.ndarray:
+        """
+        Read back and delete a spill file that failed (writer thread).
+        
+        Returns:
+            The audio it held, or an empty chunk if it cannot be read
+        """
+        try:
+            return spill.abandon()
+        except OSError as e:
+            logger.error(f"❌ Could not read back {spill.path} ({e}); that audio is lost")
+            return np.zeros(0, dtype=np.float32)
+    
+    def _stop_spill_writer(self):
+        """Let the writer thread drain the queue and exit."""
+        if self._spill_thread is not None:
+            self._spill_stop.set()
+            self._spill_thread.join()
+            self._spill_thread = None
+    
+    def discard_spill(self):
+        """
+        Delete the spill file of the last recording once its transcription
+        is safely stored. Drop every reference to the returned audio first.
+        """
+        if self.last_spill_path is not None:
+            from spill import delete_spill
+            self.release_spill()
+            delete_spill(self.last_spill_path)
+            self.last_spill_path = None
+    
+    def release_spill(self):
+        """
+        Unlock the spill file of the last recording without deleting it,
+        so 'main.py recover' or another instance can transcribe it. Call
+        once the recording has been delivered or given up on.
+        """
+        if self._last_spill is not None:
+            self._last_spill.release()
+            self._last_spill = None
+    
+    def get_level(self) -> Tuple[float, float]:
+        """
+        Get the level of the most recent audio block.
+        
+        Returns:
+            Tuple of (rms, peak), linear amplitude where 1.0 = full scale
+        """
+        if self.level_count == 0:
+            return (0.0, 0.0)
+        slot = (self.level_count - 1) % self.LEVEL_HISTORY
+        return (float(self.levels[slot, 0]), float(self.levels[slot, 1]))
+    
+    def get_level_history(self, count: int = LEVEL_HISTORY) -> np.ndarray:
+        """
+        Get recent block levels, oldest first.
+        
+        Args:
+            count: Number of blocks to return (at most LEVEL_HISTORY)
+        
+        Returns:
+            float32 array of shape (count, 2) with (rms, peak) rows; blocks
+            not yet recorded are zero
+        """
+        count = min(count, self.LEVEL_HISTORY)
+        end = self.level_count % self.LEVEL_HISTORY
+        ordered = np.roll(self.levels, -end, axis=0)
+        return ordered[-count:]
+    
+    def reset_levels(self):
+        """Clear the level history."""
+        self.levels.fill(0)
+        self.level_count = 0
     
     def stop_recording(self) -> np.ndarray:
         """
         Stop recording and return the recorded audio.
         
         Returns:
-            numpy array of audio data (float32, mono)
+            numpy array of audio data (float32, mono). A recording that was
+            spilled to disk is returned as a read-only int16 array mapped
+            from the spill file (see last_spill_path).
         """
         if not self.is_recording:
             return np.array([], dtype=np.float32)
         
-        self.is_recording = False
-        
-        if self.stream:
-            self.stream.stop()
-            self.stream.close()
-            self.stream = None
+        if self.armed:
+            # Keep the stream open; start the next pre-roll from scratch so
+            # it never repeats the end of this recording
+            self._preroll_filled = 0
+            self._preroll_pending = False
+            self.is_recording = False
+        else:
+            if self.source is not None:
+                # Still recording, so the audio the source holds back (the
+                # resampler's tail) is queued before it stops
+                self.source.stop()
+                self.source = None
+            self.is_recording = False
         
-        print("🛑 Recording stopped.")
+        logger.info("🛑 Recording stopped.")
         
-        # Collect all audio chunks
-        audio_chunks = []
-        while not self.audio_queue.empty():
-            audio_chunks.append(self.audio_queue.get())
+        self.release_spill()
+        self.last_spill_path = None
+        if self._spill_thread is not None:
+            self._stop_spill_writer()
+            if self._spill is not None:
+                spill, self._spill = self._spill, None
+                self.last_spill_path = spill.path
+                self._last_spill = spill
+                return spill.finalize()
+            audio_chunks, self._chunks = self._chunks, []
+        else:
+            # Collect all audio chunks
+            audio_chunks = []
+            while not self.audio_queue.empty():
+                audio_chunks.append(self.audio_queue.get())
         
         if not audio_chunks:
             return np.array([], dtype=np.float32)
         
         # Concatenate all chunks into a single array
-        audio_data = np.concatenate(audio_chunks, axis=0)
-        return audio_data.flatten()
+        return np.concatenate(audio_chunks)
 
 
 class WhisperTranscriber:
@@ -103,46 +527,591 @@ class WhisperTranscriber:
     Preloads the model for minimal latency.
     """
     
-    def __init__(self, model_name: str = "base"):
+    # int16 input is converted to float32 in pieces of this many seconds
+    INT16_SEGMENT_SECONDS = 300
+    
+    # Clips up to this long use the short-clip path (see whisper_ops.py)
+    SHORT_CLIP_MAX_SECONDS = 20
+    
+    def __init__(self, model_name: str = "base", preload: bool = True,
+                 use_weight_cache: bool = True, short_clip: bool = True,
+                 draft_model_name: Optional[str] = None,
+                 idle_unload_seconds: Optional[float] = None,
+                 workers: Optional[List[str]] = None, worker_timeout: float = 10.0,
+                 feature_cache_size: int = 8):
         """
         Initialize the Whisper transcriber.
         
         Args:
             model_name: Whisper model size (tiny, base, small, medium, large)
                        'base' provides good balance of speed and accuracy
+            preload: Load the model now. With False, call load() from a
+                     background thread (or let the first transcribe() load
+                     it) so the UI can appear first.
+            use_weight_cache: Load weights from the memory-mapped cache in
+                              model_cache.py (built on first use)
+            short_clip: Encode short clips with a context sized to the clip
+                        instead of a full 30 s window, falling back to the
+                        standard path when the result looks unreliable
+            draft_model_name: Smaller model for a quick draft before the
+                              final result (see transcribe_with_draft())
+            idle_unload_seconds: Release the model after this long without a
+                                 transcription (None: keep it loaded). Call
+                                 prefetch() when a recording starts so it is
+                                 reloaded while the user speaks, and
+                                 release() once it is transcribed.
+            workers: Transcription servers ('host:port') to send clips to
+                     (see workers.py); the local model is used when none
+                     answers. Pass preload=False to load it only then.
+            worker_timeout: Seconds to wait for a worker, beyond the time
+                            it is expected to take for the clip, before
+                            decoding locally
+            feature_cache_size: Clips of up to 30 s kept with their encoder
+                                output, so redecode() can retry them with
+                                other options running only the decoder
         """
         self.model_name = model_name
-        print(f"📦 Loading Whisper model '{model_name}'... (this may take a moment)")
-        try:
-            self.model = whisper.load_model(model_name)
-            print(f"✅ Whisper model '{model_name}' loaded successfully.")
-        except Exception as e:
-            print(f"Error loading Whisper model: {e}", file=sys.stderr)
+        self.use_weight_cache = use_weight_cache
+        self.model = None
+        self.short_clip = short_clip
+        self.engine = "openai-whisper"
+        self.last_decode_seconds = None  # Model time of the last transcribe()
+        self.last_path = None  # 'short', 'fallback', 'standard', 'remote' or 'redecode'
+        self.short_clip_count = 0
+        self.short_clip_fallbacks = 0
+        # Seconds from the start of transcribe_with_draft() to each result
+        self.last_timings = {}
+        self.last_batch_sizes = []  # Batch sizes of the last transcribe_batch()
+        self.last_load_seconds = None
+        self.idle_unload_seconds = idle_unload_seconds
+        self.unload_count = 0
+        # Recent clips for redecode(): clip id -> audio and encoder features
+        self.feature_cache_size = feature_cache_size
+        self.last_clip_id = None  # Id of the last clip kept for redecode()
+        self.last_redecode_cached = None  # Whether the last redecode() skipped the encoder
+        self._clips = OrderedDict()
+        self._clips_lock = threading.Lock()
+        self._next_clip_id = 0
+        self.workers = None
+        if workers:
+            from workers import WorkerPool
+            self.workers = WorkerPool(workers, timeout=worker_timeout)
+        self.draft = None
+        if draft_model_name:
+            self.draft = WhisperTranscriber(
+                model_name=draft_model_name,
+                preload=False,
+                use_weight_cache=use_weight_cache,
+                short_clip=short_clip,
+                idle_unload_seconds=idle_unload_seconds,
+                feature_cache_size=0
+            )
+        self._load_lock = threading.Lock()
+        # Idle unloading: transcriptions in progress and the last use
+        self._use_lock = threading.Lock()
+        self._in_use = 0
+        self._held = False  # Whether prefetch() holds off unloading
+        self._last_used = time.monotonic()
+        self._idle_timer = None
+        if preload and not self.load():
             sys.exit(1)
     
+    def load(self) -> bool:
+        """
+        Load the Whisper model if it is not loaded yet.
+        
+        Safe to call from several threads; later callers wait for the
+        first load to finish.
+        
+        Returns:
+            True if the model is loaded
+        """
+        # The draft model is small and needed first
+        if self.draft is not None and not self.draft.load():
+            logger.warning("Draft model unavailable; using single-pass transcription")
+            self.draft = None
+        
+        with self._load_lock:
+            if self.model is not None:
+                return True
+            
+            logger.info(f"📦 Loading Whisper model '{self.model_name}'... (this may take a moment)")
+            try:
+                start = time.perf_counter()
+                if self.use_weight_cache:
+                    from model_cache import load_model_cached
+                    self.model = load_model_cached(self.model_name)
+                else:
+                    import whisper
+                    self.model = whisper.load_model(self.model_name)
+                self.last_load_seconds = time.perf_counter() - start
+                device = next(self.model.parameters()).device.type
+                self.engine = f"openai-whisper/{device}"
+                from diagnostics import resident_memory, format_bytes
+                logger.info(f"✅ Whisper model '{self.model_name}' loaded in {self.last_load_seconds:.1f}s "
+                            f"(resident memory {format_bytes(resident_memory())}).")
+                return True
+            except Exception as e:
+                logger.error(f"Error loading Whisper model: {e}")
+                return False
+    
+    def prefetch(self, hold: bool = True):
+        """
+        Start loading the model in the background if it was unloaded.
+        
+        Call when a recording starts: the reload overlaps with the user
+        speaking, and transcribe() waits for it to finish if needed.
+        
+        Args:
+            hold: Hold off idle unloading (of the draft model too) until
+                  release(), so the model cannot be unloaded while the
+                  user is still speaking
+        """
+        if hold:
+            self._hold()
+        if self.model is not None and (self.draft is None or self.draft.model is not None):
+            return
+        if self.workers is not None and self.workers.available():
+            # The workers will transcribe it; load only if they fail
+            return
+        
+        def run():
+            if self.load():
+                self._mark_used()
+        
+        threading.Thread(target=run, daemon=True).start()
+    
+    def unload(self):
+        """
+        Release the model and return its memory. (A draft model has its
+        own idle timer.)
+        
+        The next load(), prefetch() or transcription loads it again; with
+        the weight cache that is mostly a memory-map of the cache file.
+        """
+        with self._load_lock:
+            if self.model is None:
+                return
+            from diagnostics import resident_memory, format_bytes
+            before = resident_memory()
+            self.model = None
+            with self._clips_lock:
+                # Features may hold GPU memory; the audio is enough to retry
+                for entry in self._clips.values():
+                    entry["features"] = None
+            self._release_memory()
+            self.unload_count += 1
+            logger.info(f"💤 Unloaded Whisper model '{self.model_name}' (resident memory "
+                        f"{format_bytes(before)} -> {format_bytes(resident_memory())}).")
+    
+    @staticmethod
+    def _release_memory():
+        """Collect the freed model and hand cached memory back to the system."""
+        import gc
+        gc.collect()
+        torch = sys.modules.get("torch")
+        if torch is not None and torch.cuda.is_available():
+            torch.cuda.empty_cache()
+        if sys.platform.startswith("linux"):
+            # glibc keeps freed heap memory for reuse unless asked to release it
+            try:
+                import ctypes
+                ctypes.CDLL("libc.so.6").malloc_trim(0)
+            except (OSError, AttributeError):
+                pass
+    
+    def _hold(self):
+        """Hold off idle unloading until release() (at most one hold)."""
+        with self._use_lock:
+            held, self._held = self._held, True
+        if not held:
+            self._begin_use()
+        if self.draft is not None:
+            self.draft._hold()
+    
+    def release(self):
+        """
+        End the hold taken by prefetch(). Call once the recording has been
+        transcribed, or abandoned.
+        """
+        with self._use_lock:
+            held, self._held = self._held, False
+        if held:
+            self._end_use()
+        if self.draft is not None:
+            self.draft.release()
+    
+    def _begin_use(self):
+        """Mark a transcription as in progress, holding off idle unloading."""
+        with self._use_lock:
+            self._in_use += 1
+            if self._idle_timer is not None:
+                self._idle_timer.cancel()
+                self._idle_timer = None
+    
+    def _end_use(self):
+        """Mark a transcription as finished."""
+        with self._use_lock:
+            self._in_use -= 1
+        self._mark_used()
+    
+    def _mark_used(self):
+        """Restart the idle countdown."""
+        if self.idle_unload_seconds is None:
+            return
+        with self._use_lock:
+            self._last_used = time.monotonic()
+            if self._in_use:
+                return
+            if self._idle_timer is not None:
+                self._idle_timer.cancel()
+            self._idle_timer = threading.Timer(self.idle_unload_seconds, self._on_idle)
+            self._idle_timer.daemon = True
+            self._idle_timer.start()
+    
+    def _on_idle(self):
+        """Unload the model if it has not been used since the timer started."""
+        with self._use_lock:
+            # Holding the lock keeps a new transcription from starting mid-unload
+            if self._in_use or time.monotonic() - self._last_used < self.idle_unload_seconds:
+                return
+            self._idle_timer = None
+            self.unload()
+    
     def transcribe(self, audio_data: np.ndarray) -> str:
         """
         Transcribe audio data to text.
         
+        int16 input (e.g. a memory-mapped spill file) is converted to
+        float32 one segment at a time, so a long recording is never held
+        in memory as a whole.
+        
         Args:
-            audio_data: numpy array of audio samples (float32, 16kHz)
+            audio_data: numpy array of audio samples (float32 or int16, 16kHz)
         
         Returns:
             Transcribed text string
         """
+        self.last_decode_seconds = None
+        self.last_path = None
+        self.last_clip_id = None
         if len(audio_data) == 0:
             return ""
         
+        if self.workers is not None:
+            start = time.perf_counter()
+            text = self.workers.transcribe(audio_data)
+            if text is not None:
+                self.last_decode_seconds = time.perf_counter() - start
+                self.last_path = "remote"
+                logger.info(f"✅ Transcription ({self.workers.last_worker}): '{text}'")
+                self._remember_clip(audio_data)
+                return text
+            logger.info("↩️  No worker available, transcribing locally")
+        
+        self._begin_use()
+        try:
+            if not self.load():
+                return ""
+            
+            logger.info("🔄 Transcribing...")
+            start = time.perf_counter()
+            features = []
+            if audio_data.dtype == np.int16:
+                text = self._transcribe_int16(audio_data)
+                self.last_path = "standard"
+            else:
+                text = self._transcribe_float(audio_data, keep_features=features)
+            self.last_decode_seconds = time.perf_counter() - start
+            logger.info(f"✅ Transcription: '{text}'")
+            self._remember_clip(audio_data, features[0] if features else None)
+            return text
+        except Exception as e:
+            logger.error(f"Error during transcription: {e}")
+            return ""
+        finally:
+            self._end_use()
+    
+    def _remember_clip(self, audio_data: np.ndarray, features=None):
+        """
+        Keep a clip for redecode(), evicting the least recently used.
+        
+        Args:
+            audio_data: The clip's audio (clips over 30 s are not kept)
+            features: Its encoder features, if already computed
+        """
+        if self.feature_cache_size <= 0 or len(audio_data) > 30 * 16000:
+            return
+        if audio_data.dtype == np.int16:
+            audio_data = audio_data.astype(np.float32) / 32767.0
+        with self._clips_lock:
+            self._next_clip_id += 1
+            self._clips[self._next_clip_id] = {"audio": audio_data, "features": features}
+            while len(self._clips) > self.feature_cache_size:
+                self._clips.popitem(last=False)
+            self.last_clip_id = self._next_clip_id
+    
+    def redecode(self, clip_id: Optional[int] = None, audio_data: Optional[np.ndarray] = None,
+                 language: Optional[str] = None, prompt: Optional[str] = None,
+                 temperature: float = 0.0, beam_size: Optional[int] = None) -> str:
+        """
+        Transcribe a recent clip again with other decoding options.
+        
+        Clips are identified by the last_clip_id set by transcribe(). The
+        encoder output of short-clip results is kept with the clip, so a
+        retry runs only the decoder. Other clips (standard path, workers)
+        are encoded on their first retry and kept encoded from then on.
+        
+        A clip that is no longer cached is transcribed from audio_data
+        and cached again under a new last_clip_id.
+        
+        Args:
+            clip_id: last_clip_id after the clip was transcribed
+            audio_data: The clip's audio, used if it is no longer cached
+            language: Language code (None: detect it)
+            prompt: Text to steer spelling and style (e.g. names, jargon)
+            temperature: Sampling temperature (0: greedy)
+            beam_size: Beams for beam search (None: greedy; temperature 0 only)
+        
+        Returns:
+            Transcribed text string ("" if transcription failed)
+        
+        Raises:
+            KeyError: If the clip is not cached and audio_data is None
+        """
+        with self._clips_lock:
+            entry = self._clips.get(clip_id)
+            if entry is not None:
+                self._clips.move_to_end(clip_id)
+        if entry is None and audio_data is None:
+            raise KeyError(f"Clip {clip_id} is no longer cached")
+        
+        self._begin_use()
         try:
-            print("🔄 Transcribing...")
-            # Whisper expects float32 audio normalized to [-1, 1]
-            result = self.model.transcribe(audio_data, fp16=False)
-            text = result["text"].strip()
-            print(f"✅ Transcription: '{text}'")
+            if not self.load():
+                return ""
+            
+            logger.info("🔁 Re-decoding...")
+            start = time.perf_counter()
+            audio = entry["audio"] if entry is not None else audio_data
+            if audio.dtype == np.int16:
+                audio = audio.astype(np.float32) / 32767.0
+            
+            if len(audio) > 30 * 16000:
+                # More than one window: the whole transcription runs again
+                self.last_redecode_cached = False
+                text = self.model.transcribe(
+                    audio, fp16=False, language=language, initial_prompt=prompt,
+                    temperature=temperature, beam_size=beam_size if temperature == 0 else None
+                )["text"].strip()
+                self.last_path = "standard"
+            else:
+                from whisper_ops import encode_features, decode_features
+                features = entry["features"] if entry is not None else None
+                self.last_redecode_cached = features is not None
+                if features is None:
+                    features = encode_features(self.model, audio, truncate=False)
+                    if entry is not None:
+                        entry["features"] = features
+                    else:
+                        self._remember_clip(audio, features)
+                result = decode_features(self.model, features, language=language, prompt=prompt,
+                                         temperature=temperature, beam_size=beam_size)
+                text = result.text.strip()
+                self.last_path = "redecode"
+            
+            self.last_decode_seconds = time.perf_counter() - start
+            logger.info(f"✅ Re-decoded in {self.last_decode_seconds:.2f}s"
+                        f"{' (encoder skipped)' if self.last_redecode_cached else ''}: '{text}'")
             return text
         except Exception as e:
-            print(f"Error during transcription: {e}", file=sys.stderr)
+            logger.error(f"Error during re-decoding: {e}")
             return ""
+        finally:
+            self._end_use()
+    
+    def transcribe_with_draft(self, audio_data: np.ndarray,
+                              on_draft: Callable[[str], None]) -> str:
+        """
+        Transcribe with the draft model first, then with the main model.
+        
+        The draft is handed to on_draft as soon as it is ready, while the
+        main model transcribes on a background thread, so the caller can
+        show or type the draft without delaying the final result. Without
+        a draft model this is transcribe() and on_draft is not called.
+        
+        Sets last_timings to first_text_seconds and final_text_seconds,
+        measured from the start of this call.
+        
+        Args:
+            audio_data: numpy array of audio samples (float32 or int16, 16kHz)
+            on_draft: Called with the draft text (on the calling thread)
+        
+        Returns:
+            Final transcribed text string ("" if the final pass failed)
+        """
+        start = time.perf_counter()
+        self.last_timings = {}
+        
+        draft = self.draft.transcribe(audio_data) if self.draft is not None else ""
+        if not draft:
+            text = self.transcribe(audio_data)
+            elapsed = time.perf_counter() - start
+            self.last_timings = {"first_text_seconds": elapsed, "final_text_seconds": elapsed}
+            return text
+        
+        self.last_timings["first_text_seconds"] = time.perf_counter() - start
+        result = {}
+        
+        def refine():
+            result["text"] = self.transcribe(audio_data)
+            result["seconds"] = time.perf_counter() - start
+        
+        worker = threading.Thread(target=refine, daemon=True)
+        worker.start()
+        try:
+            on_draft(draft)
+        finally:
+            worker.join()
+        
+        self.last_timings["final_text_seconds"] = result["seconds"]
+        logger.info(f"⏱️  Draft after {self.last_timings['first_text_seconds']:.2f}s, "
+                    f"final after {result['seconds']:.2f}s")
+        return result["text"]
+    
+    def transcribe_batch(self, clips: List[np.ndarray]) -> List[str]:
+        """
+        Transcribe several clips, sharing encoder passes between them.
+        
+        Clips of up to 30 s are grouped by length into batches sized to
+        the free memory (whisper_ops.plan_batches), and each batch is
+        encoded and decoded in one pass. Longer clips, results that fail
+        the accuracy guard, and the clips of a batch that fails (e.g. out
+        of memory) are transcribed one at a time instead.
+        
+        Args:
+            clips: numpy arrays of audio samples (float32 or int16, 16kHz)
+        
+        Returns:
+            Transcribed text strings, in input order
+        """
+        self._begin_use()
+        try:
+            return self._transcribe_batch(clips)
+        finally:
+            self._end_use()
+    
+    def _transcribe_batch(self, clips: List[np.ndarray]) -> List[str]:
+        """Body of transcribe_batch()."""
+        texts = [""] * len(clips)
+        if not clips or not self.load():
+            return texts
+        
+        from whisper_ops import plan_batches, decode_batch
+        window = 30 * 16000
+        pending = []  # Indices to transcribe one at a time
+        batchable = []
+        for index, clip in enumerate(clips):
+            if len(clip) == 0:
+                continue
+            if len(clip) <= window:
+                batchable.append(index)
+            else:
+                pending.append(index)
+        
+        start = time.perf_counter()
+        float_clips = {
+            index: clips[index].astype(np.float32) / 32767.0 if clips[index].dtype == np.int16
+            else clips[index]
+            for index in batchable
+        }
+        lengths = [len(float_clips[index]) for index in batchable]
+        batches = plan_batches(self.model, lengths, truncate=self.short_clip)
+        self.last_batch_sizes = [len(batch) for batch in batches]
+        
+        for batch in batches:
+            indices = [batchable[i] for i in batch]
+            try:
+                results = decode_batch(self.model, [float_clips[i] for i in indices],
+                                       truncate=self.short_clip)
+            except Exception as e:
+                logger.error(f"Error in batch of {len(indices)}, transcribing one at a time: {e}")
+                pending.extend(indices)
+                continue
+            for index, result in zip(indices, results):
+                if result is None:
+                    pending.append(index)
+                else:
+                    texts[index] = result.text.strip()
+        
+        for index in sorted(pending):
+            texts[index] = self.transcribe(clips[index])
+        
+        self.last_decode_seconds = time.perf_counter() - start
+        logger.info(f"✅ Transcribed {len(clips)} clips in {self.last_decode_seconds:.2f}s "
+                    f"(batches of {self.last_batch_sizes}, {len(pending)} one at a time)")
+        return texts
+    
+    @property
+    def last_engine(self) -> str:
+        """Engine and decoding path of the last transcription, for metrics."""
+        if self.last_path == "remote":
+            return f"remote/{self.workers.last_worker}"
+        if self.last_path in ("short", "fallback", "redecode"):
+            return f"{self.engine}+{self.last_path}"
+        return self.engine
+    
+    def _transcribe_float(self, audio_data: np.ndarray, keep_features: Optional[list] = None) -> str:
+        """
+        Transcribe float32 audio, using the short-clip path when it applies.
+        
+        Args:
+            audio_data: float32 numpy array
+            keep_features: Receives the encoder features if the short-clip
+                           path produced the result
+        
+        Returns:
+            Transcribed text string
+        """
+        if self.short_clip and len(audio_data) <= self.SHORT_CLIP_MAX_SECONDS * 16000:
+            from whisper_ops import transcribe_short
+            self.short_clip_count += 1
+            result = transcribe_short(self.model, audio_data, keep_features=keep_features)
+            if result is not None:
+                self.last_path = "short"
+                return result.text.strip()
+            self.short_clip_fallbacks += 1
+            self.last_path = "fallback"
+            logger.info("↩️  Short-clip result failed the accuracy check, using the full window")
+        else:
+            self.last_path = "standard"
+        
+        # Whisper expects float32 audio normalized to [-1, 1]
+        return self.model.transcribe(audio_data, fp16=False)["text"].strip()
+    
+    def _transcribe_int16(self, audio_data: np.ndarray) -> str:
+        """
+        Transcribe int16 audio in segments of INT16_SEGMENT_SECONDS.
+        
+        The end of each segment's text is passed as the prompt for the
+        next one to keep context across segment boundaries.
+        
+        Args:
+            audio_data: int16 numpy array (may be memory-mapped)
+        
+        Returns:
+            Transcribed text string
+        """
+        segment = self.INT16_SEGMENT_SECONDS * 16000
+        texts = []
+        for begin in range(0, len(audio_data), segment):
+            samples = audio_data[begin:begin + segment].astype(np.float32)
+            samples *= 1.0 / 32767.0
+            prompt = texts[-1][-200:] if texts else None
+            text = self.model.transcribe(samples, fp16=False, initial_prompt=prompt)["text"].strip()
+            if text:
+                texts.append(text)
+        return " ".join(texts)
 
 
 class TextTyper:
@@ -159,8 +1128,17 @@ class TextTyper:
             typing_interval: Delay between characters (0 for instant typing)
         """
         self.typing_interval = typing_interval
-        # Disable pyautogui fail-safe (moving mouse to corner won't stop it)
-        pyautogui.FAILSAFE = False
+        self._pyautogui = None
+    
+    @property
+    def pyautogui(self):
+        """The pyautogui module, imported on first use."""
+        if self._pyautogui is None:
+            import pyautogui
+            # Disable pyautogui fail-safe (moving mouse to corner won't stop it)
+            pyautogui.FAILSAFE = False
+            self._pyautogui = pyautogui
+        return self._pyautogui
     
     def click_at_position(self, x: int, y: int, focus_delay: float = 0.15):
         """
@@ -172,11 +1150,11 @@ class TextTyper:
             focus_delay: Delay after clicking to allow focus (seconds)
         """
         try:
-            pyautogui.click(x, y)
+            self.pyautogui.click(x, y)
             # Wait for the application to gain focus
             time.sleep(focus_delay)
         except Exception as e:
-            print(f"Error clicking at position ({x}, {y}): {e}", file=sys.stderr)
+            logger.error(f"Error clicking at position ({x}, {y}): {e}")
     
     def type_text(self, text: str, click_position: Optional[tuple] = None):
         """
@@ -193,13 +1171,40 @@ class TextTyper:
             # Click at position if specified
             if click_position:
                 x, y = click_position
-                print(f"🖱️  Clicking at position ({x}, {y})...")
+                logger.info(f"🖱️  Clicking at position ({x}, {y})...")
                 self.click_at_position(x, y)
             
-            print(f"⌨️  Typing text...")
+            logger.info(f"⌨️  Typing text...")
             # Small delay to ensure the application is ready to receive input
             time.sleep(0.1)
-            pyautogui.write(text, interval=self.typing_interval)
-            print("✅ Text typed successfully.")
+            self.pyautogui.write(text, interval=self.typing_interval)
+            logger.info("✅ Text typed successfully.")
+        except Exception as e:
+            logger.error(f"Error typing text: {e}")
+    
+    def replace_text(self, old_text: str, new_text: str):
+        """
+        Replace text that was just typed, in place.
+        
+        Only the part after the common prefix is erased with backspaces
+        and retyped. The cursor must still be right after old_text.
+        
+        Args:
+            old_text: Text typed earlier (e.g. a draft)
+            new_text: Text that should be there instead
+        """
+        prefix = 0
+        for old_char, new_char in zip(old_text, new_text):
+            if old_char != new_char:
+                break
+            prefix += 1
+        
+        erase = len(old_text) - prefix
+        try:
+            logger.info(f"✏️  Replacing {erase} characters...")
+            if erase:
+                self.pyautogui.press("backspace", presses=erase, interval=self.typing_interval)
+            if new_text[prefix:]:
+                self.pyautogui.write(new_text[prefix:], interval=self.typing_interval)
         except Exception as e:
-            print(f"Error typing text: {e}", file=sys.stderr)
+            logger.error(f"Error replacing text: {e}")
@@ -6,18 +6,24 @@ Provides cursor position tracking, visual highlights, and audio feedback.
 This module contains:
 - CursorTracker: Tracks and stores cursor position
 - CursorHighlighter: Shows visual highlight around cursor
-- AudioFeedback: Plays audio beep feedback
+- AudioFeedback: Plays pre-rendered start/stop/error cues
+- SoundDeviceSink, MemorySink, NullSink: Outputs for AudioFeedback
 """
 
+import queue
 import threading
-import tkinter as tk
-import winsound
+import time
+from collections import deque
 from typing import Optional, Tuple
-try:
-    import win32api
-except ImportError:
-    print("Warning: pywin32 not installed. Install with: pip install pywin32")
-    win32api = None
+import numpy as np
+from log import get_logger
+
+
+logger = get_logger(__name__)
+
+
+# tkinter, win32api and sounddevice are imported where they are first
+# needed, keeping this module cheap to import.
 
 
 class CursorTracker:
@@ -37,14 +43,16 @@ class CursorTracker:
         Returns:
             Tuple of (x, y) screen coordinates
         """
-        if win32api is None:
-            raise RuntimeError("pywin32 is not installed")
+        try:
+            import win32api
+        except ImportError:
+            raise RuntimeError("pywin32 is not installed. Install with: pip install pywin32")
         
         try:
             x, y = win32api.GetCursorPos()
             return (x, y)
         except Exception as e:
-            print(f"Error getting cursor position: {e}")
+            logger.error(f"Error getting cursor position: {e}")
             return (0, 0)
     
     def store_position(self):
@@ -65,9 +73,22 @@ class CursorHighlighter:
     """
     Shows a visual highlight around the cursor position.
     Uses a transparent tkinter window overlay.
+    
+    The overlay window is created once and every Tk call is made by the
+    event loop that owns it. Other threads only put commands on a queue and
+    wake that loop with a virtual event, so showing the highlight never
+    creates windows or blocks the hotkey path.
+    
+    Given a master (the GUI's root), the overlay is a Toplevel of it and is
+    driven by the GUI's own main loop. Without one, the overlay gets a
+    hidden root and mainloop() on a dedicated UI thread, which keeps
+    pumping window messages while idle.
     """
     
-    def __init__(self, radius: int = 30, color: str = "#00AAFF", thickness: int = 3):
+    # Safety net for a wake-up sent before the standalone loop was running
+    DRAIN_INTERVAL_MS = 250
+    
+    def __init__(self, radius: int = 30, color: str = "#00AAFF", thickness: int = 3, master=None):
         """
         Initialize the cursor highlighter.
         
@@ -75,10 +96,44 @@ class CursorHighlighter:
             radius: Radius of the highlight circle in pixels
             color: Color of the highlight (hex format)
             thickness: Thickness of the circle border
+            master: Tk root to create the overlay under; start() must then
+                    be called on its thread (None: own UI thread)
         """
         self.radius = radius
         self.color = color
         self.thickness = thickness
+        self.size = radius * 2 + thickness * 2 + 4
+        self.master = master
+        
+        self._commands = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._thread_lock = threading.Lock()
+        self._root = None  # Window whose event loop owns the overlay
+        self._overlay = None
+        self._hide_job = None
+        
+        # Milliseconds from highlight() being called to the overlay being drawn
+        self.last_show_latency_ms: Optional[float] = None
+        self.show_latencies_ms = deque(maxlen=100)
+    
+    def start(self):
+        """
+        Create the overlay ahead of time.
+        
+        Optional without a master: highlight() starts the UI thread on
+        first use, but warming it up at startup keeps window creation off
+        the first hotkey press. Required with a master.
+        """
+        if self.master is None:
+            self._ensure_thread()
+        elif self._overlay is None:
+            try:
+                self._overlay = self._create_overlay(self.master)
+            except Exception as e:
+                logger.error(f"Error creating cursor highlight overlay: {e}")
+                return
+            self.master.bind("<<CursorHighlight>>", self._drain, add="+")
+            self._root = self.master
     
     def highlight(self, x: int, y: int, duration: int = 500):
         """
@@ -89,97 +144,428 @@ class CursorHighlighter:
             y: Y coordinate
             duration: Duration in milliseconds (default 500ms)
         """
-        # Run in a separate thread to avoid blocking
-        thread = threading.Thread(target=self._show_highlight, args=(x, y, duration))
-        thread.daemon = True
-        thread.start()
+        if self.master is None:
+            self._ensure_thread()
+        self._send(("show", x, y, duration, time.perf_counter()))
+    
+    def hide(self):
+        """Hide the highlight immediately."""
+        self._send(("hide",))
+    
+    def close(self):
+        """Destroy the overlay (and stop its UI thread)."""
+        self._send(("quit",))
     
-    def _show_highlight(self, x: int, y: int, duration: int):
-        """Internal method to create and show the highlight window."""
+    def get_show_latency_stats(self) -> dict:
+        """
+        Get show latency statistics for recent highlights.
+        
+        Returns:
+            Dictionary with count, last, average and max latency in milliseconds
+        """
+        latencies = list(self.show_latencies_ms)
+        if not latencies:
+            return {"count": 0, "last_ms": None, "avg_ms": None, "max_ms": None}
+        return {
+            "count": len(latencies),
+            "last_ms": self.last_show_latency_ms,
+            "avg_ms": sum(latencies) / len(latencies),
+            "max_ms": max(latencies)
+        }
+    
+    def _send(self, command: tuple):
+        """Queue a command and wake the overlay's event loop (any thread)."""
+        root = self._root
+        if root is None and self._thread is None:
+            # Nothing was created, so there is nothing to show or close
+            if command[0] != "show":
+                return
+        self._commands.put(command)
+        if root is not None:
+            try:
+                root.event_generate("<<CursorHighlight>>", when="tail")
+            except Exception:
+                # Loop not running yet or already closed; the standalone
+                # loop still drains the queue every DRAIN_INTERVAL_MS
+                pass
+    
+    def _ensure_thread(self):
+        """Start the UI thread on first use."""
+        with self._thread_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+    
+    def _create_overlay(self, master):
+        """
+        Create the hidden overlay window (overlay's event loop only).
+        
+        Args:
+            master: Tk root to create the overlay under
+        """
+        import tkinter as tk
+        
+        # Create a topmost window
+        overlay = tk.Toplevel(master)
+        overlay.withdraw()
+        overlay.overrideredirect(True)  # Remove window decorations
+        overlay.attributes('-topmost', True)  # Always on top
+        overlay.attributes('-alpha', 0.7)  # Semi-transparent
+        
+        # Create canvas for drawing
+        canvas = tk.Canvas(
+            overlay,
+            width=self.size,
+            height=self.size,
+            bg='black',
+            highlightthickness=0
+        )
+        canvas.pack()
+        
+        # Make the background transparent (chroma key)
+        overlay.wm_attributes('-transparentcolor', 'black')
+        
+        # Draw the circle
+        padding = self.thickness // 2 + 2
+        canvas.create_oval(
+            padding,
+            padding,
+            self.size - padding,
+            self.size - padding,
+            outline=self.color,
+            width=self.thickness,
+            fill=''
+        )
+        
+        overlay.update_idletasks()
+        return overlay
+    
+    def _run(self):
+        """
+        UI thread (no master): run a hidden root's event loop for the
+        overlay. Commands arrive through the <<CursorHighlight>> event.
+        """
         try:
-            # Create a transparent overlay window
+            import tkinter as tk
             root = tk.Tk()
             root.withdraw()  # Hide the main window
-            
-            # Create a topmost window
-            overlay = tk.Toplevel(root)
-            overlay.overrideredirect(True)  # Remove window decorations
-            overlay.attributes('-topmost', True)  # Always on top
-            overlay.attributes('-alpha', 0.7)  # Semi-transparent
-            
-            # Set window size and position
-            size = self.radius * 2 + self.thickness * 2 + 4
-            overlay.geometry(f"{size}x{size}+{x - size // 2}+{y - size // 2}")
-            
-            # Create canvas for drawing
-            canvas = tk.Canvas(
-                overlay,
-                width=size,
-                height=size,
-                bg='black',
-                highlightthickness=0
-            )
-            canvas.pack()
-            
-            # Make the background transparent (chroma key)
-            overlay.wm_attributes('-transparentcolor', 'black')
-            
-            # Draw the circle
-            padding = self.thickness // 2 + 2
-            canvas.create_oval(
-                padding,
-                padding,
-                size - padding,
-                size - padding,
-                outline=self.color,
-                width=self.thickness,
-                fill=''
-            )
-            
-            # Auto-destroy after duration
-            overlay.after(duration, lambda: self._cleanup(root, overlay))
-            
-            # Start the event loop
-            root.mainloop()
-            
+            self._overlay = self._create_overlay(root)
         except Exception as e:
-            print(f"Error showing cursor highlight: {e}")
-    
-    def _cleanup(self, root, overlay):
-        """Clean up the overlay window."""
+            logger.error(f"Error creating cursor highlight overlay: {e}")
+            with self._thread_lock:
+                self._thread = None
+            return
+        
+        root.bind("<<CursorHighlight>>", self._drain)
+        self._root = root
+        
+        def drain_periodically():
+            self._drain()
+            if self._root is not None:
+                root.after(self.DRAIN_INTERVAL_MS, drain_periodically)
+        
+        # Commands queued before the loop could be woken are handled first
+        root.after_idle(drain_periodically)
         try:
+            root.mainloop()
+        finally:
+            self._root = None
+            with self._thread_lock:
+                self._thread = None
+    
+    def _drain(self, event=None):
+        """Apply queued commands to the overlay (overlay's event loop)."""
+        while True:
+            try:
+                command = self._commands.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                self._apply(command)
+            except Exception as e:
+                logger.error(f"Error showing cursor highlight: {e}")
+    
+    def _apply(self, command: tuple):
+        """Apply one command to the overlay (overlay's event loop)."""
+        root, overlay = self._root, self._overlay
+        if root is None or overlay is None:
+            return
+        
+        if self._hide_job is not None:
+            root.after_cancel(self._hide_job)
+            self._hide_job = None
+        
+        if command[0] == "show":
+            _, x, y, duration, requested_at = command
+            half = self.size // 2
+            overlay.geometry(f"{self.size}x{self.size}+{x - half}+{y - half}")
+            overlay.deiconify()
+            overlay.lift()
+            overlay.update_idletasks()
+            self.last_show_latency_ms = (time.perf_counter() - requested_at) * 1000
+            self.show_latencies_ms.append(self.last_show_latency_ms)
+            self._hide_job = root.after(duration, self._apply, ("hide",))
+        elif command[0] == "hide":
+            overlay.withdraw()
+        elif command[0] == "quit":
             overlay.destroy()
-            root.destroy()
-        except:
-            pass
+            self._overlay = None
+            if self.master is None:
+                # Ends mainloop() on the UI thread
+                self._root = None
+                root.destroy()
 
 
-class AudioFeedback:
+class NullSink:
     """
-    Provides audio feedback using system beeps.
-    Uses Windows winsound module (built-in).
+    Audio sink that discards everything.
+    Used when no output device is available.
     """
     
+    latency = 0.0
+    
+    def play(self, samples):
+        """Discard the samples."""
+        pass
+    
+    def close(self):
+        """Nothing to release."""
+        pass
+
+
+class MemorySink:
+    """
+    Audio sink that records what would have been played.
+    Lets tests and headless runs check cues without a sound device.
+    """
+    
+    latency = 0.0
+    
     def __init__(self):
-        """Initialize the audio feedback."""
+        """Initialize the memory sink."""
+        self.played = []
+    
+    def play(self, samples):
+        """
+        Record the samples instead of playing them.
+        
+        Args:
+            samples: float32 numpy array of mono samples
+        """
+        self.played.append(samples)
+    
+    def close(self):
+        """Nothing to release."""
         pass
+
+
+class SoundDeviceSink:
+    """
+    Plays buffers through one long-lived sounddevice output stream.
+    
+    The stream is opened once. Playing a cue hands the buffer to the stream
+    callback and (re)starts the stream, which takes a few milliseconds and
+    needs no extra thread. The callback stops the stream when the buffer
+    runs out, so nothing runs while no cue is playing.
+    
+    A stream stopped by its callback stays active until its last buffers
+    have played, so the callback records that it stopped rather than
+    play() relying on stream.active.
+    """
+    
+    def __init__(self, sample_rate: int):
+        """
+        Open the output stream.
+        
+        Args:
+            sample_rate: Sample rate of the buffers that will be played
+        """
+        import sounddevice as sd
+        
+        self._sd = sd
+        self._pending = None
+        self._buffer = None
+        self._position = 0
+        self._stopping = False  # Set by the callback when it stops the stream
+        self._lock = threading.Lock()
+        self._stream = sd.OutputStream(
+            samplerate=sample_rate,
+            channels=1,
+            dtype=np.float32,
+            latency="low",
+            callback=self._callback
+        )
+        # Seconds between handing a buffer to the stream and it being heard
+        self.latency = self._stream.latency
+    
+    def _callback(self, outdata, frames, time_info, status):
+        """Copy the current cue into the output buffer."""
+        if self._pending is not None:
+            self._buffer, self._pending = self._pending, None
+            self._position = 0
+        
+        buffer = self._buffer
+        if buffer is None:
+            outdata.fill(0)
+            self._stop_stream()
+            return
+        
+        count = min(frames, len(buffer) - self._position)
+        outdata[:count, 0] = buffer[self._position:self._position + count]
+        outdata[count:] = 0
+        self._position += count
+        
+        if self._position >= len(buffer):
+            self._buffer = None
+            self._stop_stream()
+    
+    def _stop_stream(self):
+        """Stop the stream from the callback unless a cue has just arrived."""
+        self._stopping = True
+        # play() sets _pending before it checks _stopping, so a cue queued
+        # now is either seen here or restarts the stream there
+        if self._pending is not None:
+            self._stopping = False
+            return
+        raise self._sd.CallbackStop
+    
+    def play(self, samples):
+        """
+        Start playing a buffer, replacing any cue that is still playing.
+        
+        Args:
+            samples: float32 numpy array of mono samples
+        """
+        with self._lock:
+            self._pending = samples
+            if self._stopping or not self._stream.active:
+                # A stream stopped by its callback must be stopped (which
+                # waits for its last buffers) before restarting
+                self._stream.stop()
+                self._stopping = False
+                self._stream.start()
+    
+    def close(self):
+        """Close the output stream."""
+        with self._lock:
+            self._stream.close()
+
+
+class AudioFeedback:
+    """
+    Provides audio feedback cues for recording start, stop and errors.
+    
+    The tones are synthesized once into NumPy buffers when the object is
+    created and played through a persistent output sink, so a cue starts
+    within a few milliseconds without spawning a thread.
+    """
     
-    def play_beep(self, frequency: int = 800, duration: int = 100):
+    SAMPLE_RATE = 44100
+    
+    # Cue name -> list of (frequency Hz, duration ms) tones; frequency 0 is silence
+    CUES = {
+        "start": [(800, 100)],
+        "stop": [(600, 100)],
+        "error": [(400, 120), (0, 60), (400, 120)],
+    }
+    
+    def __init__(self, sink=None, volume: float = 0.3):
+        """
+        Initialize the audio feedback.
+        
+        Args:
+            sink: Object with play(samples), close() and a latency attribute.
+                  Defaults to a sounddevice output stream, or a NullSink if
+                  no output device is available.
+            volume: Cue amplitude (0.0 to 1.0)
+        """
+        self.volume = volume
+        if sink is None:
+            sink = self._create_default_sink()
+        self.sink = sink
+        self.cues = {name: self._render(tones) for name, tones in self.CUES.items()}
+        self._beep_cache = {}
+    
+    def _create_default_sink(self):
+        """Open the default output device, falling back to a silent sink."""
+        try:
+            return SoundDeviceSink(self.SAMPLE_RATE)
+        except ImportError:
+            logger.warning("Warning: sounddevice not installed, audio feedback disabled")
+            return NullSink()
+        except Exception as e:
+            logger.error(f"Error opening audio output, audio feedback disabled: {e}")
+            return NullSink()
+    
+    def _render(self, tones) -> np.ndarray:
+        """
+        Synthesize a sequence of tones into one buffer.
+        
+        Args:
+            tones: List of (frequency Hz, duration ms) pairs
+        
+        Returns:
+            float32 numpy array of mono samples
         """
-        Play a system beep.
+        parts = []
+        for frequency, duration in tones:
+            count = int(self.SAMPLE_RATE * duration / 1000)
+            if frequency <= 0:
+                parts.append(np.zeros(count, dtype=np.float32))
+                continue
+            t = np.arange(count, dtype=np.float32) / self.SAMPLE_RATE
+            tone = np.sin(2 * np.pi * frequency * t) * self.volume
+            # 5 ms fade in and out to avoid clicks
+            fade = min(count // 2, int(self.SAMPLE_RATE * 0.005))
+            if fade:
+                ramp = np.linspace(0.0, 1.0, fade, dtype=np.float32)
+                tone[:fade] *= ramp
+                tone[-fade:] *= ramp[::-1]
+            parts.append(tone.astype(np.float32))
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=np.float32)
+    
+    def play_cue(self, name: str) -> float:
+        """
+        Play a pre-rendered cue.
+        
+        Args:
+            name: 'start', 'stop' or 'error'
+        
+        Returns:
+            Seconds until the cue has finished playing, including output
+            latency. Skip this much captured audio to keep the cue out of
+            a recording.
+        """
+        samples = self.cues[name]
+        try:
+            self.sink.play(samples)
+        except Exception as e:
+            logger.error(f"Error playing {name} cue: {e}")
+            return 0.0
+        return len(samples) / self.SAMPLE_RATE + self.sink.latency
+    
+    def play_beep(self, frequency: int = 800, duration: int = 100) -> float:
+        """
+        Play a tone (rendered on first use, then cached).
         
         Args:
             frequency: Frequency in Hz (37 to 32767)
             duration: Duration in milliseconds
+        
+        Returns:
+            Seconds until the tone has finished playing, including output latency
         """
-        # Run in a separate thread to avoid blocking
-        thread = threading.Thread(target=self._play_beep, args=(frequency, duration))
-        thread.daemon = True
-        thread.start()
-    
-    def _play_beep(self, frequency: int, duration: int):
-        """Internal method to play the beep."""
+        key = (frequency, duration)
+        if key not in self._beep_cache:
+            self._beep_cache[key] = self._render([key])
+        samples = self._beep_cache[key]
         try:
-            winsound.Beep(frequency, duration)
+            self.sink.play(samples)
         except Exception as e:
-            print(f"Error playing beep: {e}")
+            logger.error(f"Error playing beep: {e}")
+            return 0.0
+        return len(samples) / self.SAMPLE_RATE + self.sink.latency
+    
+    def close(self):
+        """Release the output sink."""
+        self.sink.close()
@@ -0,0 +1,1020 @@
+"""
+Transcription History Database
+===============================
+SQLite storage for transcription history, shared by the GUI and CLI tools.
+
+This module contains:
+- RetentionPolicy: Limits on how much history is kept in the live database
+- DatabaseManager: Stores, queries, prunes and archives transcriptions,
+  optionally with the source audio of each clip, and keeps usage statistics
+  up to date with triggers. Per-dictation performance records (capture
+  length, decode time, real-time factor, typing time, model, engine) live
+  in a side table and are summarized as percentiles.
+- RetentionWorker: Background thread that enforces a RetentionPolicy
+"""
+
+import os
+import gzip
+import math
+import json
+import sqlite3
+import threading
+from itertools import groupby
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Optional
+import numpy as np
+from audio_codec import CODEC_NAME, encode_audio, decode_audio
+from log import get_logger
+
+
+logger = get_logger(__name__)
+
+
+class RetentionPolicy:
+    """
+    Limits on how much history the live database keeps.
+    Any limit set to None is not enforced.
+    """
+    
+    def __init__(self, max_age_days: Optional[int] = None, max_rows: Optional[int] = None,
+                 max_size_mb: Optional[float] = None):
+        """
+        Initialize the retention policy.
+        
+        Args:
+            max_age_days: Prune transcriptions older than this many days
+            max_rows: Keep at most this many transcriptions (newest win)
+            max_size_mb: Prune oldest transcriptions while the file is larger than this
+        """
+        self.max_age_days = max_age_days
+        self.max_rows = max_rows
+        self.max_size_mb = max_size_mb
+    
+    def is_enabled(self) -> bool:
+        """Return True if at least one limit is set."""
+        return any(limit is not None for limit in (self.max_age_days, self.max_rows, self.max_size_mb))
+
+
+class DatabaseManager:
+    """Manages SQLite database for transcription history."""
+    
+    # Rows pruned per pass when shrinking the database to its size limit
+    PRUNE_BATCH_SIZE = 500
+    
+    # Aggregate tables maintained by triggers: (table, key column, key expression).
+    # The key expression is written against a row alias ({row} = NEW or OLD).
+    STATS_TABLES = (
+        ("stats_totals", "id", "1"),
+        ("stats_daily", "day", "substr({row}.timestamp, 1, 10)"),
+        ("stats_hourly", "hour", "substr({row}.timestamp, 1, 13)"),
+    )
+    
+    def __init__(self, db_path: str = "history.db", archive_dir: Optional[str] = None):
+        """
+        Initialize database manager.
+        
+        Args:
+            db_path: Path to SQLite database file
+            archive_dir: Folder for archived (pruned) history. Defaults to
+                         'history_archive' next to the database file.
+        """
+        self.db_path = db_path
+        if archive_dir is None:
+            archive_dir = Path(db_path).resolve().parent / "history_archive"
+        self.archive_dir = Path(archive_dir)
+        self.init_database()
+    
+    def init_database(self):
+        """Create database and tables if they don't exist."""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        # Incremental auto-vacuum lets freed pages be returned to the OS
+        # without rewriting the whole file. Existing databases need one full
+        # VACUUM for the new mode to take effect.
+        cursor.execute("PRAGMA auto_vacuum")
+        if cursor.fetchone()[0] != 2:
+            cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            cursor.execute("VACUUM")
+        
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS transcriptions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp TEXT NOT NULL,
+                text TEXT NOT NULL,
+                duration REAL,
+                latency REAL,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_transcriptions_timestamp ON transcriptions (timestamp)"
+        )
+        
+        # Databases created before latency was tracked
+        cursor.execute("PRAGMA table_info(transcriptions)")
+        if "latency" not in [column[1] for column in cursor.fetchall()]:
+            cursor.execute("ALTER TABLE transcriptions ADD COLUMN latency REAL")
+        
+        # Source audio lives in a side table so listing history never reads it
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS transcription_audio (
+                transcription_id INTEGER PRIMARY KEY,
+                sample_rate INTEGER NOT NULL,
+                num_samples INTEGER NOT NULL,
+                codec TEXT NOT NULL,
+                data BLOB NOT NULL
+            )
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_transcriptions_delete_audio
+            AFTER DELETE ON transcriptions
+            BEGIN
+                DELETE FROM transcription_audio WHERE transcription_id = OLD.id;
+            END
+        """)
+        
+        # Per-dictation performance records, one per transcription
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS dictation_metrics (
+                transcription_id INTEGER PRIMARY KEY,
+                capture_seconds REAL,
+                decode_seconds REAL,
+                rtf REAL,
+                typing_seconds REAL,
+                model TEXT,
+                engine TEXT,
+                first_text_seconds REAL,
+                final_text_seconds REAL
+            )
+        """)
+        
+        # Databases created before draft/final timings were tracked
+        cursor.execute("PRAGMA table_info(dictation_metrics)")
+        metric_columns = [column[1] for column in cursor.fetchall()]
+        for column in ("first_text_seconds", "final_text_seconds"):
+            if column not in metric_columns:
+                cursor.execute(f"ALTER TABLE dictation_metrics ADD COLUMN {column} REAL")
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_transcriptions_delete_metrics
+            AFTER DELETE ON transcriptions
+            BEGIN
+                DELETE FROM dictation_metrics WHERE transcription_id = OLD.id;
+            END
+        """)
+        
+        self._init_statistics(cursor)
+        
+        conn.commit()
+        conn.close()
+    
+    def _init_statistics(self, cursor):
+        """
+        Create the aggregate tables and the triggers that maintain them.
+        
+        Every insert, update and delete on transcriptions adjusts the
+        matching totals, day and hour rows, so reading statistics never
+        scans the history table.
+        
+        Args:
+            cursor: Cursor on an open connection
+        """
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'stats_totals'"
+        )
+        needs_backfill = cursor.fetchone() is None
+        
+        for table, key, _ in self.STATS_TABLES:
+            key_type = "INTEGER" if key == "id" else "TEXT"
+            cursor.execute(f"""
+                CREATE TABLE IF NOT EXISTS {table} (
+                    {key} {key_type} PRIMARY KEY,
+                    count INTEGER NOT NULL DEFAULT 0,
+                    total_duration REAL NOT NULL DEFAULT 0,
+                    total_chars INTEGER NOT NULL DEFAULT 0,
+                    latency_sum REAL NOT NULL DEFAULT 0,
+                    latency_count INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+        
+        add = [self._stats_upsert(table, key, expr, "NEW", 1) for table, key, expr in self.STATS_TABLES]
+        remove = [self._stats_upsert(table, key, expr, "OLD", -1) for table, key, expr in self.STATS_TABLES]
+        
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_transcriptions_stats_insert
+            AFTER INSERT ON transcriptions
+            BEGIN
+                {" ".join(add)}
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_transcriptions_stats_delete
+            AFTER DELETE ON transcriptions
+            BEGIN
+                {" ".join(remove)}
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_transcriptions_stats_update
+            AFTER UPDATE OF timestamp, text, duration, latency ON transcriptions
+            BEGIN
+                {" ".join(remove + add)}
+            END
+        """)
+        
+        if needs_backfill:
+            self._rebuild_statistics(cursor)
+    
+    @staticmethod
+    def _stats_upsert(table: str, key: str, expr: str, row: str, sign: int) -> str:
+        """
+        Build the trigger statement that adds (or removes) one row's contribution.
+        
+        Args:
+            table: Aggregate table name
+            key: Key column of the aggregate table
+            expr: Key expression template
+            row: Trigger row alias, NEW or OLD
+            sign: 1 to add the row, -1 to remove it
+        
+        Returns:
+            SQL statement terminated with a semicolon
+        """
+        key_value = expr.format(row=row)
+        statement = f"""
+            INSERT INTO {table} ({key}, count, total_duration, total_chars, latency_sum, latency_count)
+            VALUES (
+                {key_value},
+                {sign},
+                {sign} * COALESCE({row}.duration, 0),
+                {sign} * length({row}.text),
+                {sign} * COALESCE({row}.latency, 0),
+                {sign} * ({row}.latency IS NOT NULL)
+            )
+            ON CONFLICT({key}) DO UPDATE SET
+                count = count + excluded.count,
+                total_duration = total_duration + excluded.total_duration,
+                total_chars = total_chars + excluded.total_chars,
+                latency_sum = latency_sum + excluded.latency_sum,
+                latency_count = latency_count + excluded.latency_count;
+        """
+        if sign < 0 and key != "id":
+            # Drop buckets that no longer hold any transcriptions
+            statement += f"DELETE FROM {table} WHERE {key} = {key_value} AND count <= 0;"
+        return statement
+    
+    def _rebuild_statistics(self, cursor):
+        """
+        Recompute all aggregate tables from the transcriptions table.
+        
+        Args:
+            cursor: Cursor on an open connection
+        """
+        for table, key, expr in self.STATS_TABLES:
+            key_value = expr.format(row="transcriptions")
+            cursor.execute(f"DELETE FROM {table}")
+            cursor.execute(f"""
+                INSERT INTO {table} ({key}, count, total_duration, total_chars, latency_sum, latency_count)
+                SELECT
+                    {key_value},
+                    COUNT(*),
+                    COALESCE(SUM(duration), 0),
+                    COALESCE(SUM(length(text)), 0),
+                    COALESCE(SUM(latency), 0),
+                    COUNT(latency)
+                FROM transcriptions
+                GROUP BY 1
+            """)
+    
+    def add_transcription(self, text: str, duration: float = None, latency: float = None):
+        """
+        Add a new transcription to the database.
+        
+        Args:
+            text: Transcribed text
+            duration: Recording duration in seconds
+            latency: Seconds from the end of recording until the text was ready
+        
+        Returns:
+            ID of the inserted record
+        """
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        cursor.execute(
+            "INSERT INTO transcriptions (timestamp, text, duration, latency) VALUES (?, ?, ?, ?)",
+            (timestamp, text, duration, latency)
+        )
+        
+        row_id = cursor.lastrowid
+        conn.commit()
+        conn.close()
+        
+        return row_id
+    
+    def update_transcription_text(self, transcription_id: int, text: str):
+        """
+        Replace the text of an existing transcription.
+        
+        Args:
+            transcription_id: ID of the transcription to update
+            text: New transcribed text
+        """
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute(
+            "UPDATE transcriptions SET text = ? WHERE id = ?",
+            (text, transcription_id)
+        )
+        
+        conn.commit()
+        conn.close()
+    
+    def add_audio(self, transcription_id: int, audio_data: np.ndarray, sample_rate: int):
+        """
+        Store the source audio of a transcription.
+        
+        Args:
+            transcription_id: ID of the transcription the clip belongs to
+            audio_data: numpy array of audio samples (float32, mono)
+            sample_rate: Sample rate of the clip in Hz
+        """
+        blob = encode_audio(audio_data)
+        
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute(
+            "INSERT OR REPLACE INTO transcription_audio "
+            "(transcription_id, sample_rate, num_samples, codec, data) VALUES (?, ?, ?, ?, ?)",
+            (transcription_id, sample_rate, len(audio_data), CODEC_NAME, blob)
+        )
+        
+        conn.commit()
+        conn.close()
+    
+    def get_audio(self, transcription_id: int):
+        """
+        Load the source audio of a transcription.
+        
+        Args:
+            transcription_id: ID of the transcription
+        
+        Returns:
+            Tuple of (audio_data, sample_rate), or None if no audio is stored
+        """
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute(
+            "SELECT sample_rate, codec, data FROM transcription_audio WHERE transcription_id = ?",
+            (transcription_id,)
+        )
+        row = cursor.fetchone()
+        
+        conn.close()
+        
+        if row is None or row[1] != CODEC_NAME:
+            return None
+        return decode_audio(row[2]), row[0]
+    
+    def iter_audio(self, batch_size: int = 32):
+        """
+        Stream stored clips, oldest first.
+        
+        Only one batch of compressed clips is held in memory at a time, and
+        each clip is decoded just before it is yielded.
+        
+        Args:
+            batch_size: Number of clips fetched per query
+        
+        Yields:
+            Tuples of (transcription_id, audio_data, sample_rate)
+        """
+        last_id = 0
+        while True:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT transcription_id, sample_rate, codec, data FROM transcription_audio "
+                "WHERE transcription_id > ? ORDER BY transcription_id ASC LIMIT ?",
+                (last_id, batch_size)
+            )
+            rows = cursor.fetchall()
+            conn.close()
+            
+            if not rows:
+                return
+            
+            for transcription_id, sample_rate, codec, blob in rows:
+                last_id = transcription_id
+                if codec != CODEC_NAME:
+                    continue
+                yield transcription_id, decode_audio(blob), sample_rate
+    
+    def count_audio(self) -> int:
+        """
+        Count the transcriptions that have stored audio.
+        
+        Returns:
+            Number of stored clips
+        """
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute("SELECT COUNT(*) FROM transcription_audio")
+        count = cursor.fetchone()[0]
+        
+        conn.close()
+        return count
+    
+    # Performance values that get_metric_trends() can summarize
+    METRIC_COLUMNS = ("capture_seconds", "decode_seconds", "rtf", "typing_seconds",
+                      "first_text_seconds", "final_text_seconds")
+    
+    def add_metrics(self, transcription_id: int, capture_seconds: float = None,
+                    decode_seconds: float = None, typing_seconds: float = None,
+                    model: str = None, engine: str = None,
+                    first_text_seconds: float = None, final_text_seconds: float = None):
+        """
+        Store the performance record of a dictation.
+        
+        Args:
+            transcription_id: ID of the transcription the record belongs to
+            capture_seconds: Length of the recorded audio
+            decode_seconds: Time the model spent transcribing
+            typing_seconds: Time spent typing the text
+            model: Model name, e.g. 'base'
+            engine: Inference engine, e.g. 'openai-whisper/cpu'
+            first_text_seconds: From the end of recording to the first text
+                                (the draft, if there was one)
+            final_text_seconds: From the end of recording to the final text
+        """
+        rtf = None
+        if capture_seconds and decode_seconds is not None:
+            rtf = decode_seconds / capture_seconds
+        
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute(
+            "INSERT OR REPLACE INTO dictation_metrics "
+            "(transcription_id, capture_seconds, decode_seconds, rtf, typing_seconds, model, engine, "
+            "first_text_seconds, final_text_seconds) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (transcription_id, capture_seconds, decode_seconds, rtf, typing_seconds, model, engine,
+             first_text_seconds, final_text_seconds)
+        )
+        
+        conn.commit()
+        conn.close()
+    
+    def get_metric_trends(self, metric: str = "decode_seconds", days: int = 30):
+        """
+        Get p50/p95 of a performance value per day and model, oldest first.
+        
+        Args:
+            metric: One of METRIC_COLUMNS
+            days: Number of days to look back
+        
+        Returns:
+            List of dictionaries with day, model, count, p50 and p95
+        """
+        return [
+            {"day": day, "model": model, **summary}
+            for (day, model), summary in self._metric_percentiles(
+                metric, days, "substr(t.timestamp, 1, 10), m.model"
+            )
+        ]
+    
+    def get_metric_summary(self, metric: str = "decode_seconds", days: int = 30):
+        """
+        Get p50/p95 of a performance value per model and engine.
+        
+        Args:
+            metric: One of METRIC_COLUMNS
+            days: Number of days to look back
+        
+        Returns:
+            List of dictionaries with model, engine, count, p50 and p95
+        """
+        return [
+            {"model": model, "engine": engine, **summary}
+            for (model, engine), summary in self._metric_percentiles(metric, days, "m.model, m.engine")
+        ]
+    
+    def _metric_percentiles(self, metric: str, days: int, group: str):
+        """
+        Compute percentiles of a metric per group.
+        
+        Rows arrive sorted by group and value, so each group is summarized
+        as soon as it ends and only one group is held in memory.
+        
+        Args:
+            metric: One of METRIC_COLUMNS
+            days: Number of days to look back
+            group: Two SQL expressions to group by (trusted, not user input)
+        
+        Yields:
+            Tuples of ((group values), {count, p50, p95})
+        """
+        if metric not in self.METRIC_COLUMNS:
+            raise ValueError(f"Unknown metric: {metric}")
+        cutoff = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
+        
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute(
+            f"SELECT {group}, m.{metric} FROM dictation_metrics m "
+            f"JOIN transcriptions t ON t.id = m.transcription_id "
+            f"WHERE t.timestamp >= ? AND m.{metric} IS NOT NULL "
+            f"ORDER BY {group}, m.{metric}",
+            (cutoff,)
+        )
+        try:
+            for key, rows in groupby(cursor, key=lambda row: row[:2]):
+                values = [row[2] for row in rows]
+                yield key, {
+                    "count": len(values),
+                    "p50": _percentile(values, 0.50),
+                    "p95": _percentile(values, 0.95)
+                }
+        finally:
+            conn.close()
+    
+    # Columns written by iter_transcriptions and accepted by import_transcriptions
+    EXPORT_COLUMNS = ("id", "timestamp", "text", "duration", "latency", "created_at")
+    
+    def iter_transcriptions(self, batch_size: int = 500):
+        """
+        Stream all transcriptions, oldest first.
+        
+        Rows are paged by ID on a short-lived connection per batch, like
+        iter_audio, so memory use does not depend on the size of the
+        history and no read lock is held between batches: a dictation
+        can still be stored while a slow export is being written.
+        
+        Args:
+            batch_size: Number of rows fetched per query
+        
+        Yields:
+            Dictionaries keyed by EXPORT_COLUMNS
+        """
+        last_id = 0
+        while True:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            cursor.execute(
+                f"SELECT {', '.join(self.EXPORT_COLUMNS)} FROM transcriptions "
+                f"WHERE id > ? ORDER BY id ASC LIMIT ?",
+                (last_id, batch_size)
+            )
+            rows = cursor.fetchall()
+            conn.close()
+            
+            if not rows:
+                return
+            
+            for row in rows:
+                last_id = row[0]
+                yield dict(zip(self.EXPORT_COLUMNS, row))
+    
+    def import_transcriptions(self, records, batch_size: int = 500) -> int:
+        """
+        Insert transcriptions from an iterable of dictionaries.
+        
+        Records are committed in transactions of batch_size rows. A record
+        whose timestamp and text already exist in the database is skipped,
+        so importing the same file twice is harmless. Imported rows get new
+        IDs.
+        
+        Args:
+            records: Iterable of dictionaries with at least timestamp and text
+            batch_size: Number of rows per transaction
+        
+        Returns:
+            Number of transcriptions inserted
+        """
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        inserted = 0
+        pending = 0
+        
+        try:
+            for record in records:
+                timestamp = record["timestamp"]
+                text = record["text"]
+                cursor.execute(
+                    "INSERT INTO transcriptions (timestamp, text, duration, latency, created_at) "
+                    "SELECT ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP) "
+                    "WHERE NOT EXISTS (SELECT 1 FROM transcriptions WHERE timestamp = ? AND text = ?)",
+                    (timestamp, text, record.get("duration"), record.get("latency"),
+                     record.get("created_at"), timestamp, text)
+                )
+                inserted += cursor.rowcount
+                pending += 1
+                if pending >= batch_size:
+                    conn.commit()
+                    pending = 0
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        
+        return inserted
+    
+    def get_all_transcriptions(self):
+        """
+        Get all transcriptions ordered by newest first.
+        
+        Returns:
+            List of tuples (id, timestamp, text, duration)
+        """
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute(
+            "SELECT id, timestamp, text, duration FROM transcriptions ORDER BY id DESC"
+        )
+        results = cursor.fetchall()
+        
+        conn.close()
+        return results
+    
+    def delete_transcription(self, transcription_id: int):
+        """
+        Delete a specific transcription.
+        
+        Args:
+            transcription_id: ID of the transcription to delete
+        """
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute("DELETE FROM transcriptions WHERE id = ?", (transcription_id,))
+        
+        conn.commit()
+        conn.close()
+        
+        self.incremental_vacuum()
+    
+    def clear_all(self):
+        """Delete all transcriptions."""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute("DELETE FROM transcription_audio")
+        cursor.execute("DELETE FROM dictation_metrics")
+        cursor.execute("DELETE FROM transcriptions")
+        
+        conn.commit()
+        conn.close()
+        
+        self.incremental_vacuum()
+    
+    def get_statistics(self):
+        """
+        Get statistics about transcriptions.
+        
+        Reads the trigger-maintained totals, so the cost does not grow with
+        the size of the history.
+        
+        Returns:
+            Dictionary with count, total duration, characters typed and
+            average latency
+        """
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute(
+            "SELECT count, total_duration, total_chars, latency_sum, latency_count "
+            "FROM stats_totals WHERE id = 1"
+        )
+        row = cursor.fetchone()
+        
+        conn.close()
+        
+        return self._stats_dict(row or (0, 0, 0, 0, 0))
+    
+    def get_daily_statistics(self, days: int = 30):
+        """
+        Get per-day statistics, newest first.
+        
+        Args:
+            days: Number of most recent days with activity to return
+        
+        Returns:
+            List of dictionaries with day, count, total duration,
+            characters typed and average latency
+        """
+        return self._get_bucket_statistics("stats_daily", "day", days)
+    
+    def get_hourly_statistics(self, hours: int = 48):
+        """
+        Get per-hour statistics, newest first.
+        
+        Args:
+            hours: Number of most recent hours with activity to return
+        
+        Returns:
+            List of dictionaries with hour ('YYYY-MM-DD HH'), count, total
+            duration, characters typed and average latency
+        """
+        return self._get_bucket_statistics("stats_hourly", "hour", hours)
+    
+    def _get_bucket_statistics(self, table: str, key: str, limit: int):
+        """Read the newest rows of an aggregate table."""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute(
+            f"SELECT {key}, count, total_duration, total_chars, latency_sum, latency_count "
+            f"FROM {table} ORDER BY {key} DESC LIMIT ?",
+            (limit,)
+        )
+        rows = cursor.fetchall()
+        
+        conn.close()
+        
+        results = []
+        for row in rows:
+            stats = self._stats_dict(row[1:])
+            stats[key] = row[0]
+            results.append(stats)
+        return results
+    
+    @staticmethod
+    def _stats_dict(row) -> dict:
+        """Convert an aggregate row into a statistics dictionary."""
+        count, total_duration, total_chars, latency_sum, latency_count = row
+        return {
+            "count": count or 0,
+            "total_duration": total_duration or 0,
+            "total_chars": total_chars or 0,
+            "avg_latency": latency_sum / latency_count if latency_count else None
+        }
+    
+    def get_size_bytes(self) -> int:
+        """
+        Get the size of the live database file.
+        
+        Returns:
+            Size in bytes of the database and its write-ahead log, if any
+        """
+        size = 0
+        for path in (self.db_path, self.db_path + "-wal"):
+            if os.path.exists(path):
+                size += os.path.getsize(path)
+        return size
+    
+    def incremental_vacuum(self, pages: Optional[int] = None):
+        """
+        Return free pages to the operating system.
+        
+        Args:
+            pages: Maximum number of pages to release (None releases all)
+        """
+        conn = sqlite3.connect(self.db_path)
+        # executescript() steps the pragma to completion; execute() would
+        # only free a single page
+        if pages is None:
+            conn.executescript("PRAGMA incremental_vacuum;")
+        else:
+            conn.executescript(f"PRAGMA incremental_vacuum({int(pages)});")
+        conn.close()
+    
+    def enforce_retention(self, policy: RetentionPolicy) -> int:
+        """
+        Archive and delete transcriptions that fall outside the policy.
+        
+        Rows are written to the archive before they are deleted, so an
+        interrupted pass never loses history.
+        
+        Args:
+            policy: Retention limits to apply
+        
+        Returns:
+            Number of transcriptions pruned
+        """
+        if not policy.is_enabled():
+            return 0
+        
+        pruned = 0
+        
+        if policy.max_age_days is not None:
+            cutoff = datetime.now() - timedelta(days=policy.max_age_days)
+            pruned += self._prune(
+                "timestamp < ?",
+                (cutoff.strftime("%Y-%m-%d %H:%M:%S"),)
+            )
+        
+        if policy.max_rows is not None:
+            pruned += self._prune(
+                "id NOT IN (SELECT id FROM transcriptions ORDER BY id DESC LIMIT ?)",
+                (policy.max_rows,)
+            )
+        
+        if pruned:
+            self.incremental_vacuum()
+        
+        if policy.max_size_mb is not None:
+            max_bytes = policy.max_size_mb * 1024 * 1024
+            while self.get_size_bytes() > max_bytes:
+                # Oldest rows first, one batch at a time
+                removed = self._prune_batch("1", ())
+                if removed == 0:
+                    break
+                pruned += removed
+                self.incremental_vacuum()
+        
+        return pruned
+    
+    def _prune(self, where: str, params: tuple) -> int:
+        """
+        Archive and delete all transcriptions matching a WHERE clause.
+        
+        Args:
+            where: SQL condition selecting the rows to prune
+            params: Parameters for the condition
+        
+        Returns:
+            Number of transcriptions pruned
+        """
+        pruned = 0
+        while True:
+            removed = self._prune_batch(where, params)
+            pruned += removed
+            if removed < self.PRUNE_BATCH_SIZE:
+                return pruned
+    
+    def _prune_batch(self, where: str, params: tuple) -> int:
+        """
+        Archive and delete the oldest batch of transcriptions matching a WHERE clause.
+        
+        Args:
+            where: SQL condition selecting the rows to prune
+            params: Parameters for the condition
+        
+        Returns:
+            Number of transcriptions pruned
+        """
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute(
+                "SELECT id, timestamp, text, duration, latency, created_at FROM transcriptions "
+                f"WHERE {where} ORDER BY id ASC LIMIT ?",
+                params + (self.PRUNE_BATCH_SIZE,)
+            )
+            rows = cursor.fetchall()
+            if not rows:
+                return 0
+            
+            self._archive_rows(rows)
+            cursor.executemany(
+                "DELETE FROM transcriptions WHERE id = ?",
+                [(row[0],) for row in rows]
+            )
+            conn.commit()
+            return len(rows)
+        finally:
+            conn.close()
+    
+    def _archive_rows(self, rows):
+        """
+        Append rows to gzip-compressed JSONL files partitioned by date.
+        
+        Each day goes to archive_dir/YYYY/MM/history-YYYY-MM-DD.jsonl.gz.
+        Appending writes a new gzip member, which readers handle transparently.
+        
+        Args:
+            rows: Tuples of (id, timestamp, text, duration, latency, created_at)
+        """
+        partitions = {}
+        for row in rows:
+            day = row[1][:10]
+            partitions.setdefault(day, []).append(row)
+        
+        for day, day_rows in partitions.items():
+            path = self.archive_dir / day[:4] / day[5:7] / f"history-{day}.jsonl.gz"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with gzip.open(path, "at", encoding="utf-8") as f:
+                for trans_id, timestamp, text, duration, latency, created_at in day_rows:
+                    f.write(json.dumps({
+                        "id": trans_id,
+                        "timestamp": timestamp,
+                        "text": text,
+                        "duration": duration,
+                        "latency": latency,
+                        "created_at": created_at
+                    }, ensure_ascii=False) + "\n")
+    
+    def list_archives(self):
+        """
+        List archive files, oldest first.
+        
+        Returns:
+            List of Paths to archive files
+        """
+        if not self.archive_dir.exists():
+            return []
+        return sorted(self.archive_dir.glob("*/*/history-*.jsonl.gz"))
+    
+    def import_archive(self, archive_path) -> int:
+        """
+        Re-import an archive file into the live database.
+        
+        Rows keep their original IDs; rows that are already present are skipped.
+        
+        Args:
+            archive_path: Path to a history-YYYY-MM-DD.jsonl.gz file
+        
+        Returns:
+            Number of transcriptions restored
+        """
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        restored = 0
+        
+        try:
+            with gzip.open(archive_path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    cursor.execute(
+                        "INSERT OR IGNORE INTO transcriptions "
+                        "(id, timestamp, text, duration, latency, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                        (record["id"], record["timestamp"], record["text"],
+                         record.get("duration"), record.get("latency"), record.get("created_at"))
+                    )
+                    restored += cursor.rowcount
+            conn.commit()
+        finally:
+            conn.close()
+        
+        return restored
+
+
+def _percentile(sorted_values, fraction: float) -> float:
+    """
+    Nearest-rank percentile of an ascending list.
+    
+    Args:
+        sorted_values: Non-empty list of numbers, smallest first
+        fraction: Percentile as a fraction, e.g. 0.95
+    
+    Returns:
+        The smallest value with at least `fraction` of the values at or below it
+    """
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class RetentionWorker:
+    """
+    Enforces a RetentionPolicy periodically on a background thread.
+    """
+    
+    def __init__(self, db: DatabaseManager, policy: RetentionPolicy, interval: float = 3600.0):
+        """
+        Initialize the retention worker.
+        
+        Args:
+            db: Database to prune
+            policy: Retention limits to apply
+            interval: Seconds between retention passes
+        """
+        self.db = db
+        self.policy = policy
+        self.interval = interval
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def start(self):
+        """Start enforcing the policy in the background."""
+        if self._thread is not None or not self.policy.is_enabled():
+            return
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        """Stop the background thread."""
+        self._stop_event.set()
+    
+    def _run(self):
+        """Run a retention pass now and then once per interval."""
+        while not self._stop_event.is_set():
+            try:
+                pruned = self.db.enforce_retention(self.policy)
+                if pruned:
+                    logger.info(f"🗄️  Archived {pruned} old transcriptions.")
+            except Exception as e:
+                logger.error(f"Error enforcing history retention: {e}")
+            self._stop_event.wait(self.interval)
@@ -0,0 +1,421 @@
+"""
+On-Demand Diagnostics
+======================
+Profiles the next few dictations when a user reports that vokey is slow.
+
+Nothing runs until start() is called from the tray or GUI menu. While a
+capture is active, each dictation (from the start of recording until the
+pipeline is idle again) is profiled with:
+- A sampling profiler that records every thread's stack 100 times a
+  second, so transcription, typing and the audio callback all show up
+  without the overhead of tracing every call
+- tracemalloc snapshots at the start and end of the dictation (tracing
+  runs for the whole capture, so the growth covers only the dictation)
+- Stage timings from the state bus, plus the transcriber's own timings
+
+Each capture is written to its own folder under the diagnostics folder:
+    summary.json                Stage timings per dictation
+    dictation-N-functions.txt   Functions by sample count (self and total)
+    dictation-N-stacks.txt      Collapsed stacks (flamegraph.pl/speedscope)
+    dictation-N-allocations.txt Top allocations and growth during the dictation
+
+This module contains:
+- resident_memory, format_bytes: Resident memory of the process
+- SamplingProfiler: Periodic stack sampling of all threads
+- DiagnosticsProfiler: Captures a profile bundle for the next N dictations
+"""
+
+import os
+import sys
+import json
+import threading
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Optional
+from state import AssistantState
+from log import get_logger, get_log_stats
+from paths import app_cache_dir
+
+
+logger = get_logger(__name__)
+
+
+DEFAULT_DICTATIONS = 5
+TOP_ALLOCATIONS = 25
+TOP_FUNCTIONS = 40
+
+
+def default_diagnostics_dir() -> Path:
+    """Folder for profile bundles."""
+    return app_cache_dir("diagnostics")
+
+
+def resident_memory() -> Optional[int]:
+    """
+    Resident memory (working set) of this process in bytes.
+    
+    Returns:
+        Bytes, or None if it cannot be determined on this platform
+    """
+    try:
+        if sys.platform == "win32":
+            import ctypes
+            from ctypes import wintypes
+            
+            class MemoryCounters(ctypes.Structure):
+                _fields_ = [
+                    ("cb", wintypes.DWORD),
+                    ("PageFaultCount", wintypes.DWORD),
+                    ("PeakWorkingSetSize", ctypes.c_size_t),
+                    ("WorkingSetSize", ctypes.c_size_t),
+                    ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                    ("PagefileUsage", ctypes.c_size_t),
+                    ("PeakPagefileUsage", ctypes.c_size_t),
+                ]
+            
+            counters = MemoryCounters(cb=ctypes.sizeof(MemoryCounters))
+            process = ctypes.windll.kernel32.GetCurrentProcess()
+            if ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+                return counters.WorkingSetSize
+            return None
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def format_bytes(size: Optional[int]) -> str:
+    """Format a byte count as MB ('?' if unknown)."""
+    return "?" if size is None else f"{size / (1024 * 1024):.0f} MB"
+
+
+class SamplingProfiler:
+    """
+    Samples the stacks of all threads at a fixed interval.
+    
+    Costs one short walk over each thread's frames per sample, independent
+    of how many calls the profiled code makes.
+    """
+    
+    MAX_DEPTH = 64
+    
+    def __init__(self, interval: float = 0.01):
+        """
+        Initialize the profiler.
+        
+        Args:
+            interval: Seconds between samples
+        """
+        self.interval = interval
+        self.samples = Counter()  # (thread name, stack tuple) -> count
+        self.sample_count = 0
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def start(self, first: Optional[Callable[[], None]] = None):
+        """
+        Start sampling on a background thread.
+        
+        Args:
+            first: Called on that thread before the first sample, for
+                   setup that should not delay the caller
+        """
+        self.samples.clear()
+        self.sample_count = 0
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(first,), name="diagnostics-sampler",
+                                        daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        """Stop sampling."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+    
+    def _run(self, first: Optional[Callable[[], None]]):
+        """Take samples until stopped (sampler thread)."""
+        if first is not None:
+            first()
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < self.MAX_DEPTH:
+                    code = frame.f_code
+                    stack.append(f"{Path(code.co_filename).name}:{code.co_name}:{frame.f_lineno}")
+                    frame = frame.f_back
+                self.samples[(names.get(ident, str(ident)), tuple(reversed(stack)))] += 1
+            self.sample_count += 1
+    
+    def collapsed_stacks(self) -> str:
+        """Stacks in the collapsed format read by flamegraph tools."""
+        lines = [
+            ";".join((thread,) + stack) + f" {count}"
+            for (thread, stack), count in self.samples.most_common()
+        ]
+        return "\n".join(lines) + "\n"
+    
+    def top_functions(self, limit: int = TOP_FUNCTIONS) -> str:
+        """
+        Functions ranked by the samples they appear in.
+        
+        "self" counts samples where the function was running, "total"
+        samples where it was anywhere on the stack.
+        """
+        own = Counter()
+        total = Counter()
+        for (thread, stack), count in self.samples.items():
+            if not stack:
+                continue
+            own[stack[-1].rsplit(":", 1)[0]] += count
+            for function in {entry.rsplit(":", 1)[0] for entry in stack}:
+                total[function] += count
+        
+        seconds = self.sample_count * self.interval
+        lines = [f"{self.sample_count} samples over about {seconds:.1f}s, all threads", "",
+                 f"{'self':>7} {'total':>7}  function"]
+        for function, count in total.most_common(limit):
+            lines.append(f"{own[function]:>7} {count:>7}  {function}")
+        return "\n".join(lines) + "\n"
+
+
+class DiagnosticsProfiler:
+    """
+    Profiles the next N dictations and writes a bundle to disk.
+    
+    Follows the state bus: a dictation starts when the state changes to
+    recording and ends when it returns to idle or error. Off (and
+    subscribed to nothing) until start() is called.
+    """
+    
+    def __init__(self, state_bus, transcriber=None, directory: Optional[Path] = None,
+                 on_finished: Optional[Callable[[Path], None]] = None):
+        """
+        Initialize the profiler.
+        
+        Args:
+            state_bus: StateBus of the assistant
+            transcriber: WhisperTranscriber whose timings are included
+            directory: Folder for bundles (default: default_diagnostics_dir())
+            on_finished: Called with the bundle folder when a capture ends
+                         (on a background thread)
+        """
+        self.state_bus = state_bus
+        self.transcriber = transcriber
+        self.directory = Path(directory) if directory else default_diagnostics_dir()
+        self.on_finished = on_finished
+        self.bundle = None
+        self.remaining = 0
+        self._lock = threading.Lock()
+        self._unsubscribe = None
+        self._sampler = None
+        self._started_tracemalloc = False
+        self._current = None  # Dictation being profiled
+        self._summary = []
+        self._writers = []
+    
+    @property
+    def active(self) -> bool:
+        """Whether a capture is in progress."""
+        return self._unsubscribe is not None
+    
+    def start(self, dictations: int = DEFAULT_DICTATIONS) -> Path:
+        """
+        Profile the next dictations.
+        
+        Args:
+            dictations: Number of dictations to profile
+        
+        Returns:
+            Folder the bundle is written to
+        """
+        with self._lock:
+            if self.active:
+                return self.bundle
+            self.bundle = self.directory / datetime.now().strftime("profile-%Y%m%d-%H%M%S")
+            self.bundle.mkdir(parents=True, exist_ok=True)
+            self.remaining = dictations
+            self._summary = []
+            if not tracemalloc.is_tracing():
+                # Started here, not at the first dictation, so the first
+                # dictation's growth does not list everything traced so far
+                tracemalloc.start(10)
+                self._started_tracemalloc = True
+            self._unsubscribe = self.state_bus.subscribe(self._on_state_changed)
+        logger.info(f"🩺 Profiling the next {dictations} dictations into {self.bundle}")
+        return self.bundle
+    
+    def stop(self, wait: bool = False):
+        """
+        End the capture now, keeping the dictations profiled so far.
+        
+        Only detaches the capture here. The last snapshot, the writers and
+        the summary are finished on a background thread and reported
+        through on_finished, so stopping from a menu does not freeze the UI.
+        
+        Args:
+            wait: Block until the bundle is written (e.g. on exit)
+        """
+        with self._lock:
+            if not self.active:
+                return
+            self._unsubscribe()
+            self._unsubscribe = None
+            current, sampler = self._current, self._sampler
+            self._current = None
+            self._sampler = None
+            writers = self._writers
+            self._writers = []
+            stop_tracemalloc = self._started_tracemalloc
+            self._started_tracemalloc = False
+            bundle, summary = self.bundle, self._summary
+        
+        finisher = threading.Thread(
+            target=self._finish,
+            args=(bundle, summary, writers, current, sampler, stop_tracemalloc),
+            daemon=True
+        )
+        finisher.start()
+        if wait:
+            finisher.join()
+    
+    def _finish(self, bundle: Path, summary: list, writers: list, current, sampler, stop_tracemalloc: bool):
+        """Write what is left of a stopped capture (background thread)."""
+        if current is not None:
+            writers.append(self._close_dictation(bundle, summary, current, sampler, completed=False))
+        if stop_tracemalloc:
+            with self._lock:
+                if self.active:
+                    # A new capture started meanwhile and relies on it
+                    self._started_tracemalloc = True
+                else:
+                    tracemalloc.stop()
+        
+        for writer in writers:
+            writer.join()
+        with open(bundle / "summary.json", "w", encoding="utf-8") as f:
+            json.dump({"dictations": summary, "log": get_log_stats()}, f, indent=2)
+        logger.info(f"🩺 Profile saved to {bundle}")
+        if self.on_finished:
+            self.on_finished(bundle)
+    
+    def _on_state_changed(self, event):
+        """Start and end dictations from state bus events."""
+        finished = False
+        with self._lock:
+            if not self.active:
+                return
+            if event.state == AssistantState.RECORDING and self._current is None:
+                self._begin_dictation(event)
+            elif self._current is not None:
+                self._current["events"].append(event)
+                if event.state in (AssistantState.IDLE, AssistantState.ERROR):
+                    self._end_dictation(completed=True)
+                    self.remaining -= 1
+                    finished = self.remaining <= 0
+        if finished:
+            # stop() finishes the bundle on its own thread
+            self.stop()
+    
+    def _begin_dictation(self, event):
+        """
+        Start sampling; the first allocation snapshot is taken on the
+        sampler thread so recording is not delayed by it.
+        """
+        current = {
+            "number": len(self._summary) + 1,
+            "events": [event],
+            "snapshot": None
+        }
+        
+        def take_snapshot():
+            current["snapshot"] = tracemalloc.take_snapshot()
+        
+        self._current = current
+        self._sampler = SamplingProfiler()
+        self._sampler.start(first=take_snapshot)
+    
+    def _end_dictation(self, completed: bool):
+        """Stop sampling the current dictation and write its files in the background."""
+        current, sampler = self._current, self._sampler
+        if current is None:
+            return
+        self._current = None
+        self._sampler = None
+        self._writers.append(self._close_dictation(self.bundle, self._summary, current, sampler, completed))
+    
+    def _close_dictation(self, bundle: Path, summary: list, current: dict, sampler: SamplingProfiler,
+                         completed: bool) -> threading.Thread:
+        """
+        Stop a dictation's sampler, add it to the summary and start
+        writing its files.
+        
+        Returns:
+            The writer thread
+        """
+        sampler.stop()
+        snapshot = tracemalloc.take_snapshot()
+        
+        entry = {
+            "dictation": current["number"],
+            "completed": completed,
+            "started": datetime.fromtimestamp(current["events"][0].timestamp).isoformat(timespec="seconds"),
+            "stages": self._stage_timings(current["events"]),
+            "samples": sampler.sample_count
+        }
+        if self.transcriber is not None and completed:
+            entry["transcriber"] = {
+                "model": self.transcriber.model_name,
+                "engine": self.transcriber.last_engine,
+                "decode_seconds": self.transcriber.last_decode_seconds,
+                **self.transcriber.last_timings
+            }
+        summary.append(entry)
+        
+        writer = threading.Thread(
+            target=self._write_dictation,
+            args=(bundle, current["number"], sampler, current["snapshot"], snapshot),
+            daemon=True
+        )
+        writer.start()
+        return writer
+    
+    @staticmethod
+    def _stage_timings(events) -> list:
+        """Seconds spent in each state between consecutive events."""
+        stages = []
+        for event, following in zip(events, events[1:]):
+            stage = {"stage": event.state.value, "seconds": round(following.timestamp - event.timestamp, 4)}
+            if event.message:
+                stage["message"] = event.message
+            stages.append(stage)
+        if events:
+            stages.append({"stage": "total", "seconds": round(events[-1].timestamp - events[0].timestamp, 4)})
+        return stages
+    
+    @staticmethod
+    def _write_dictation(bundle: Path, number: int, sampler: SamplingProfiler, before, after):
+        """Write one dictation's profile files."""
+        try:
+            prefix = bundle / f"dictation-{number}"
+            Path(f"{prefix}-stacks.txt").write_text(sampler.collapsed_stacks(), encoding="utf-8")
+            Path(f"{prefix}-functions.txt").write_text(sampler.top_functions(), encoding="utf-8")
+            
+            lines = ["Largest allocations at the end of the dictation:"]
+            lines += [str(stat) for stat in after.statistics("lineno")[:TOP_ALLOCATIONS]]
+            if before is not None:
+                lines += ["", "Growth during the dictation:"]
+                lines += [str(stat) for stat in after.compare_to(before, "lineno")[:TOP_ALLOCATIONS]]
+            Path(f"{prefix}-allocations.txt").write_text("\n".join(lines) + "\n", encoding="utf-8")
+        except Exception as e:
+            logger.error(f"Error writing profile for dictation {number}: {e}")
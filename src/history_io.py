@@ -0,0 +1,122 @@
+"""
+History Export and Import
+==========================
+Streams transcription history to and from JSONL or CSV files.
+
+Rows are written as they are read from the database and inserted as they
+are read from the file, so memory use stays flat however large the
+history is.
+"""
+
+import csv
+import json
+from pathlib import Path
+from typing import Optional
+from database import DatabaseManager
+
+
+FORMATS = ("jsonl", "csv")
+
+
+def detect_format(path, fmt: Optional[str] = None) -> str:
+    """
+    Work out the file format from an explicit value or the file extension.
+    
+    Args:
+        path: File path
+        fmt: 'jsonl', 'csv' or None to use the extension
+    
+    Returns:
+        'jsonl' or 'csv'
+    """
+    if fmt is None:
+        fmt = "csv" if Path(path).suffix.lower() == ".csv" else "jsonl"
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported history format: {fmt}")
+    return fmt
+
+
+def export_history(db: DatabaseManager, path, fmt: Optional[str] = None,
+                   batch_size: int = 500) -> int:
+    """
+    Write all transcriptions to a file, oldest first.
+    
+    Args:
+        db: History database
+        path: Output file path
+        fmt: 'jsonl', 'csv' or None to use the extension
+        batch_size: Number of rows read from the database per step
+    
+    Returns:
+        Number of transcriptions written
+    """
+    fmt = detect_format(path, fmt)
+    written = 0
+    
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        if fmt == "csv":
+            writer = csv.DictWriter(f, fieldnames=DatabaseManager.EXPORT_COLUMNS)
+            writer.writeheader()
+            for record in db.iter_transcriptions(batch_size):
+                writer.writerow(record)
+                written += 1
+        else:
+            for record in db.iter_transcriptions(batch_size):
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                written += 1
+    
+    return written
+
+
+def read_history(path, fmt: Optional[str] = None):
+    """
+    Stream records from an exported history file.
+    
+    Args:
+        path: Input file path
+        fmt: 'jsonl', 'csv' or None to use the extension
+    
+    Yields:
+        Dictionaries with timestamp, text and optional duration, latency
+        and created_at
+    """
+    fmt = detect_format(path, fmt)
+    
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if fmt == "csv":
+            for row in csv.DictReader(f):
+                yield {
+                    "timestamp": row["timestamp"],
+                    "text": row["text"],
+                    "duration": _optional_float(row.get("duration")),
+                    "latency": _optional_float(row.get("latency")),
+                    "created_at": row.get("created_at") or None
+                }
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def import_history(db: DatabaseManager, path, fmt: Optional[str] = None,
+                   batch_size: int = 500) -> int:
+    """
+    Import an exported history file, skipping transcriptions already present.
+    
+    Args:
+        db: History database
+        path: Input file path
+        fmt: 'jsonl', 'csv' or None to use the extension
+        batch_size: Number of rows per transaction
+    
+    Returns:
+        Number of transcriptions inserted
+    """
+    return db.import_transcriptions(read_history(path, fmt), batch_size)
+
+
+def _optional_float(value: Optional[str]) -> Optional[float]:
+    """Parse a CSV cell that may be empty."""
+    if value is None or value == "":
+        return None
+    return float(value)
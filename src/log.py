@@ -0,0 +1,219 @@
+"""
+Asynchronous Logging
+=====================
+Logging pipeline that never blocks the thread that logs.
+
+Log calls only put the record on a bounded queue; a background listener
+thread formats it and writes it to the console and a rotating log file.
+This keeps file and console I/O off the audio callback and the hotkey
+thread, and works under pythonw, where there is no console to print to.
+When the queue is full (the disk stalls, or a callback floods it) records
+are dropped and counted instead of blocking, and the listener reports how
+many were lost.
+
+The console shows messages as the old print() diagnostics did; the file
+adds time, level and thread.
+
+This module contains:
+- setup_logging: Starts the pipeline (call once from each entry point)
+- get_logger: Logger for a module
+- get_log_stats: Queue depth and dropped-record counts
+- shutdown_logging: Flushes and stops the listener
+"""
+
+import os
+import sys
+import atexit
+import logging
+import logging.handlers
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Optional, TextIO
+
+
+LOG_FILE = "vokey.log"
+MAX_LOG_BYTES = 2 * 1024 * 1024
+LOG_BACKUPS = 3
+QUEUE_SIZE = 10000
+
+CONSOLE_FORMAT = "%(message)s"
+FILE_FORMAT = "%(asctime)s %(levelname)-7s [%(threadName)s] %(name)s: %(message)s"
+
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that drops records when the queue is full.
+    
+    Records are queued unformatted, so the logging thread does no string
+    formatting; the listener formats them.
+    """
+    
+    def __init__(self, log_queue: queue.Queue):
+        """
+        Initialize the handler.
+        
+        Args:
+            log_queue: Bounded queue read by the listener
+        """
+        super().__init__(log_queue)
+        self.dropped = {}  # level name -> records dropped
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Queue the record as is, unless it carries a traceback."""
+        if record.exc_info:
+            # Tracebacks cannot cross threads safely; format them now
+            return super().prepare(record)
+        return record
+    
+    def enqueue(self, record: logging.LogRecord):
+        """Queue the record without blocking."""
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped[record.levelname] = self.dropped.get(record.levelname, 0) + 1
+
+
+class _DropReportingListener(logging.handlers.QueueListener):
+    """QueueListener that reports dropped records, at most once a second."""
+    
+    REPORT_INTERVAL = 1.0
+    
+    def __init__(self, log_queue: queue.Queue, queue_handler: DroppingQueueHandler, *handlers):
+        super().__init__(log_queue, *handlers, respect_handler_level=True)
+        self.queue_handler = queue_handler
+        self.reported = 0
+        self.last_report = 0.0
+    
+    def enqueue_sentinel(self):
+        """Wait for room for the stop marker; put_nowait could fail on a full queue."""
+        self.queue.put(self._sentinel)
+    
+    def handle(self, record: logging.LogRecord):
+        """Write the record, preceded by a warning if records were dropped."""
+        if time.monotonic() - self.last_report >= self.REPORT_INTERVAL:
+            self.report_dropped()
+        super().handle(record)
+    
+    def report_dropped(self):
+        """Write a warning with the records dropped since the last one."""
+        dropped = sum(self.queue_handler.dropped.values())
+        if dropped <= self.reported:
+            return
+        warning = logging.makeLogRecord({
+            "name": "vokey.log",
+            "levelno": logging.WARNING,
+            "levelname": "WARNING",
+            "msg": f"⚠️  {dropped - self.reported} log messages dropped (log queue full)"
+        })
+        self.reported = dropped
+        self.last_report = time.monotonic()
+        super().handle(warning)
+
+
+def default_log_path() -> Path:
+    """Log file in the current folder (next to history.db)."""
+    return Path(LOG_FILE)
+
+
+def setup_logging(log_file: Optional[Path] = None, level: str = "INFO",
+                  console: bool = True, to_file: bool = True,
+                  console_stream: Optional[TextIO] = None) -> Optional[Path]:
+    """
+    Start the logging pipeline. Later calls return the same log file.
+    
+    Args:
+        log_file: Log file path (default: vokey.log in the current folder)
+        level: Minimum level for vokey's own messages; overridden by the
+               VOKEY_LOG_LEVEL environment variable
+        console: Write messages to stdout (skipped under pythonw)
+        to_file: Write messages to the log file
+        console_stream: Console stream (default: stdout; stderr keeps
+                        stdout free for a command's own output)
+    
+    Returns:
+        Path of the log file, or None if logging only to the console
+    """
+    global _pipeline
+    with _pipeline_lock:
+        if _pipeline is not None:
+            return _pipeline["log_file"]
+        
+        handlers = []
+        console_stream = console_stream or sys.stdout
+        if console and console_stream is not None:
+            stream = logging.StreamHandler(console_stream)
+            stream.setFormatter(logging.Formatter(CONSOLE_FORMAT))
+            handlers.append(stream)
+        
+        path = None
+        if to_file:
+            path = Path(log_file) if log_file else default_log_path()
+            try:
+                file_handler = logging.handlers.RotatingFileHandler(
+                    path, maxBytes=MAX_LOG_BYTES, backupCount=LOG_BACKUPS, encoding="utf-8"
+                )
+                file_handler.setFormatter(logging.Formatter(FILE_FORMAT))
+                handlers.append(file_handler)
+            except OSError as e:
+                print(f"Could not open log file {path}: {e}", file=sys.stderr)
+                path = None
+        
+        log_queue = queue.Queue(maxsize=QUEUE_SIZE)
+        queue_handler = DroppingQueueHandler(log_queue)
+        listener = _DropReportingListener(log_queue, queue_handler, *handlers)
+        listener.start()
+        atexit.register(shutdown_logging)
+        
+        # Other libraries' warnings go to the same place
+        root = logging.getLogger()
+        root.addHandler(queue_handler)
+        if root.level == logging.NOTSET or root.level > logging.WARNING:
+            root.setLevel(logging.WARNING)
+        logging.getLogger("vokey").setLevel(os.getenv("VOKEY_LOG_LEVEL", level).upper())
+        
+        _pipeline = {"queue": log_queue, "handler": queue_handler, "listener": listener, "log_file": path}
+        return path
+
+
+def get_logger(name: str) -> logging.Logger:
+    """
+    Get the logger for a vokey module.
+    
+    Args:
+        name: Module name (e.g. __name__)
+    
+    Returns:
+        Logger named vokey.<name>
+    """
+    return logging.getLogger(f"vokey.{name}")
+
+
+def get_log_stats() -> dict:
+    """
+    Get the pipeline's counters.
+    
+    Returns:
+        Dictionary with queued (records waiting) and dropped (by level)
+    """
+    if _pipeline is None:
+        return {"queued": 0, "dropped": {}}
+    return {"queued": _pipeline["queue"].qsize(), "dropped": dict(_pipeline["handler"].dropped)}
+
+
+def shutdown_logging():
+    """Write out the queued records and stop the listener."""
+    global _pipeline
+    with _pipeline_lock:
+        if _pipeline is None:
+            return
+        logging.getLogger().removeHandler(_pipeline["handler"])
+        _pipeline["listener"].stop()
+        _pipeline["listener"].report_dropped()
+        for handler in _pipeline["listener"].handlers:
+            handler.close()
+        _pipeline = None
@@ -7,16 +7,51 @@ Hotkey: Alt + R
 - Press once: Start recording
 - Press again: Stop recording, transcribe, and type text
 
+Commands:
+    python main.py                 Run the voice assistant
+    python main.py --armed         Run with the microphone kept open (instant start)
+    python main.py --draft-model tiny
+                                   Type a quick draft, then correct it in place
+    python main.py --unload-after 30
+                                   Free the model's memory after 30 idle minutes
+    python main.py --profile 5     Profile the first 5 dictations (see diagnostics.py)
+    python main.py --workers gpu-box:8765
+                                   Offload dictations to a server on the LAN (see workers.py)
+    python main.py --output notes.jsonl --output tcp:9100
+                                   Also send transcripts to a file and a local socket
+    python main.py retranscribe    Re-transcribe stored history audio
+    python main.py recover         Transcribe recordings interrupted by a crash
+    python main.py transcribe SOURCE
+                                   Transcribe a WAV/FLAC file, 'mic', raw PCM on
+                                   stdin ('-') or on a local port ('tcp:PORT')
+    python main.py export FILE     Export history to JSONL or CSV
+    python main.py import FILE     Import history from JSONL or CSV
+
 Author: Voice Assistant
 Version: 2.0.0
 """
 
 import sys
+import argparse
+import queue
 import threading
 import time
+from typing import List, Optional
+import numpy as np
 import keyboard
+from audio_sources import open_source
 from core import AudioRecorder, WhisperTranscriber, TextTyper
 from cursor_tracker import CursorTracker, CursorHighlighter, AudioFeedback
+from database import DatabaseManager
+from diagnostics import DiagnosticsProfiler
+from history_io import FORMATS, export_history, import_history
+from spill import find_spills, recover_spills
+from sinks import OutputSink, TyperSink, FileSink, FanOut, open_sink
+from state import AssistantState, StateBus
+from log import get_logger, setup_logging
+
+
+logger = get_logger(__name__)
 
 
 class VoiceAssistant:
@@ -25,105 +60,429 @@ class VoiceAssistant:
     Manages hotkey detection, recording, transcription, and typing.
     """
     
-    def __init__(self, hotkey: str = "ctrl+shift+v", whisper_model: str = "base"):
+    def __init__(self, hotkey: str = "ctrl+shift+v", whisper_model: str = "base",
+                 preload_model: bool = True, armed_input: bool = False,
+                 spill_threshold_seconds: float = 600, draft_model: Optional[str] = None,
+                 idle_unload_seconds: Optional[float] = None, workers: Optional[List[str]] = None,
+                 outputs: Optional[List[OutputSink]] = None, type_text: bool = True):
         """
         Initialize the voice assistant.
         
         Args:
             hotkey: Keyboard hotkey to trigger recording (e.g., 'ctrl+shift+v')
             whisper_model: Whisper model name to use
+            preload_model: Load the Whisper model now. With False, the caller
+                           loads it later via transcriber.load().
+            armed_input: Keep the microphone open with a pre-roll buffer so
+                         recording starts instantly (uses a little CPU
+                         while idle)
+            spill_threshold_seconds: Recordings longer than this are written
+                                     to disk instead of kept in RAM
+            draft_model: Smaller Whisper model whose draft is typed right away
+                         and corrected in place once whisper_model finishes
+            idle_unload_seconds: Release the model after this long without a
+                                 dictation; it is reloaded when the hotkey
+                                 is pressed (None: keep it loaded)
+            workers: Transcription servers ('host:port') to offload
+                     dictations to; the local model is the fallback
+            outputs: Sinks that receive each transcript besides typing
+                     (files, pipes, sockets; see sinks.py)
+            type_text: Type transcripts at the cursor
         """
         self.hotkey = hotkey
-        self.recorder = AudioRecorder()
-        self.transcriber = WhisperTranscriber(model_name=whisper_model)
+        self.recorder = AudioRecorder(armed=armed_input, spill_threshold_seconds=spill_threshold_seconds)
+        self.transcriber = WhisperTranscriber(
+            model_name=whisper_model,
+            preload=preload_model,
+            draft_model_name=draft_model,
+            idle_unload_seconds=idle_unload_seconds,
+            workers=workers
+        )
         self.typer = TextTyper()
+        self.output = FanOut(([TyperSink(self.typer)] if type_text else []) + list(outputs or []))
         self.cursor_tracker = CursorTracker()
         self.cursor_highlighter = CursorHighlighter()
+        self.cursor_highlighter.start()
         self.audio_feedback = AudioFeedback()
+        self.state_bus = StateBus()
+        self.state_bus.subscribe(self._on_state_changed)
+        self.profiler = DiagnosticsProfiler(self.state_bus, self.transcriber)
+        # Last dictation (or its retried text), for retry_last()
+        self.last_text = None
+        self.last_clip_id = None
         self.is_running = False
-        self.processing_lock = threading.Lock()
+        self._stop_event = threading.Event()
+    
+    def _on_state_changed(self, event):
+        """Report pipeline errors on the console."""
+        if event.state == AssistantState.ERROR:
+            logger.warning(f"⚠️  {event.message}.")
     
     def _on_hotkey_toggle(self):
         """Called when hotkey is pressed - toggles recording on/off."""
-        if self.recorder.is_recording:
-            # Stop recording and process
-            if not self.processing_lock.acquire(blocking=False):
+        if self.state_bus.transition(AssistantState.RECORDING, AssistantState.TRANSCRIBING):
+            self._process_recording()
+        elif self.state_bus.transition((AssistantState.IDLE, AssistantState.ERROR), AssistantState.RECORDING):
+            self._start_recording()
+    
+    def _start_recording(self):
+        """Store the cursor position, give feedback and start recording."""
+        # Reload an unloaded model while the user speaks
+        self.transcriber.prefetch()
+        
+        # Store cursor position
+        self.cursor_tracker.store_position()
+        pos = self.cursor_tracker.get_stored_position()
+        
+        if pos:
+            # Show visual feedback at cursor position
+            self.cursor_highlighter.highlight(pos[0], pos[1], duration=500)
+            logger.info(f"📍 Cursor position stored: {pos}")
+        
+        # Play audio feedback. An armed recording starts at once and is
+        # recorded without a gap, so a cue would end up in the audio.
+        cue_seconds = 0.0
+        if not self.recorder.is_armed:
+            cue_seconds = self.audio_feedback.play_cue("start")
+        
+        # Start recording, skipping the cue so it is not transcribed
+        self.recorder.start_recording(skip_seconds=cue_seconds)
+        if not self.recorder.is_recording:
+            self.transcriber.release()
+            self.audio_feedback.play_cue("error")
+            self.state_bus.set_state(AssistantState.ERROR, "Could not start recording")
+    
+    def _process_recording(self):
+        """Stop recording, transcribe and type the text."""
+        try:
+            # Stop recording and get audio
+            audio_data = self.recorder.stop_recording()
+            self.audio_feedback.play_cue("stop")
+            
+            if len(audio_data) == 0:
+                self.audio_feedback.play_cue("error")
+                self.state_bus.set_state(AssistantState.ERROR, "No audio recorded")
                 return
             
-            try:
-                # Stop recording and get audio
-                audio_data = self.recorder.stop_recording()
-                
-                if len(audio_data) == 0:
-                    print("⚠️  No audio recorded.")
-                    return
-                
-                # Transcribe audio to text
-                text = self.transcriber.transcribe(audio_data)
-                
-                if not text:
-                    print("⚠️  No text transcribed.")
-                    return
-                
-                # Get the stored cursor position
-                stored_pos = self.cursor_tracker.get_stored_position()
-                
-                # Type the text at the stored cursor position
-                if stored_pos:
-                    self.typer.type_text(text, click_position=stored_pos)
-                else:
-                    # Fallback: type at current position
-                    self.typer.type_text(text)
-                
-            finally:
-                self.processing_lock.release()
-        else:
-            # Start recording
-            if not self.processing_lock.locked():
-                # Store cursor position
-                self.cursor_tracker.store_position()
-                pos = self.cursor_tracker.get_stored_position()
-                
-                if pos:
-                    # Show visual feedback at cursor position
-                    self.cursor_highlighter.highlight(pos[0], pos[1], duration=500)
-                    print(f"📍 Cursor position stored: {pos}")
-                
-                # Play audio feedback
-                self.audio_feedback.play_beep(frequency=800, duration=100)
-                
-                # Start recording
-                self.recorder.start_recording()
+            # Get the stored cursor position
+            stored_pos = self.cursor_tracker.get_stored_position()
+            drafted = {}
+            
+            def on_draft(draft):
+                # Type the draft right away; it is corrected below
+                drafted["text"] = draft
+                self.state_bus.set_state(AssistantState.TYPING)
+                self.output.draft(draft, click_position=stored_pos)
+                self.state_bus.set_state(AssistantState.TRANSCRIBING, "Refining")
+            
+            # Transcribe audio to text
+            text = self.transcriber.transcribe_with_draft(audio_data, on_draft)
+            clip_id = self.transcriber.last_clip_id
+            draft = drafted.get("text")
+            
+            if not text and not draft:
+                if self.recorder.last_spill_path is not None:
+                    # Decoding may have failed; keep the recording for 'main.py recover'
+                    logger.warning(f"⚠️  Keeping {self.recorder.last_spill_path} for recovery")
+                self.audio_feedback.play_cue("error")
+                self.state_bus.set_state(AssistantState.ERROR, "No text transcribed")
+                return
+            
+            # Type the text at the stored cursor position (or the current
+            # one), or correct the draft in place; other outputs get the
+            # final text
+            self.state_bus.set_state(AssistantState.TYPING)
+            self.output.write(
+                text or draft,
+                draft=draft,
+                click_position=stored_pos,
+                audio_seconds=len(audio_data) / self.recorder.sample_rate,
+                model=self.transcriber.model_name,
+                engine=self.transcriber.last_engine
+            )
+            
+            self.last_text = text or draft
+            self.last_clip_id = clip_id if text else None
+            
+            # The text is out; a spilled recording is no longer needed
+            audio_data = None
+            self.recorder.discard_spill()
+            
+            self.state_bus.set_state(AssistantState.IDLE)
+        except Exception as e:
+            logger.error(f"Error processing recording: {e}")
+            self.audio_feedback.play_cue("error")
+            self.state_bus.set_state(AssistantState.ERROR, "Processing failed")
+        finally:
+            # Let the idle timer run again (see prefetch())
+            self.transcriber.release()
+            # A spilled recording not discarded above can now be recovered
+            self.recorder.release_spill()
+    
+    def retry_last(self, **options) -> bool:
+        """
+        Transcribe the last dictation again with other decoding options
+        (see WhisperTranscriber.redecode()) and copy the new text to the
+        clipboard.
+        
+        The new text is not typed: a retry is started from the tray menu,
+        so the window that received the dictation no longer has focus.
+        
+        Args:
+            **options: language, prompt, temperature and/or beam_size
+        
+        Returns:
+            True if new text was copied to the clipboard
+        """
+        if self.last_clip_id is None:
+            logger.info("Nothing to retry.")
+            return False
+        if not self.state_bus.transition((AssistantState.IDLE, AssistantState.ERROR),
+                                         AssistantState.TRANSCRIBING, "Retrying"):
+            return False
+        try:
+            text = self.transcriber.redecode(self.last_clip_id, **options)
+        except KeyError:
+            self.last_clip_id = None
+            self.state_bus.set_state(AssistantState.ERROR, "Last dictation is no longer cached")
+            return False
+        except Exception as e:
+            logger.error(f"Error retrying: {e}")
+            self.state_bus.set_state(AssistantState.ERROR, "Retry failed")
+            return False
+        
+        if not text or text == self.last_text:
+            logger.info("🔁 Retry gave the same text.")
+            self.state_bus.set_state(AssistantState.IDLE)
+            return False
+        try:
+            copy_to_clipboard(text)
+        except Exception as e:
+            logger.error(f"Error copying the retried text: {e}")
+            self.state_bus.set_state(AssistantState.ERROR, "Could not copy the retried text")
+            return False
+        self.last_text = text
+        logger.info(f"📋 Retried text copied to the clipboard: {text}")
+        self.state_bus.set_state(AssistantState.IDLE)
+        return True
     
     def start(self):
         """Start the voice assistant (blocks until stopped)."""
         self.is_running = True
+        self._stop_event.clear()
         
-        print("\n" + "="*60)
-        print("🎙️  VOICE ASSISTANT STARTED")
-        print("="*60)
-        print(f"Hotkey: {self.hotkey.upper()}")
-        print("Press once to start recording.")
-        print("Press again to stop recording and type text.")
-        print("Press Ctrl+C to exit.")
-        print("="*60 + "\n")
+        logger.info("\n" + "="*60)
+        logger.info("🎙️  VOICE ASSISTANT STARTED")
+        logger.info("="*60)
+        logger.info(f"Hotkey: {self.hotkey.upper()}")
+        logger.info("Press once to start recording.")
+        logger.info("Press again to stop recording and type text.")
+        logger.info("Press Ctrl+C to exit.")
+        logger.info("="*60 + "\n")
         
         # Register hotkey as a toggle
         keyboard.add_hotkey(self.hotkey, self._on_hotkey_toggle, suppress=False)
         
         try:
-            # Keep the program running
-            while self.is_running:
-                time.sleep(0.1)
+            # Keep the program running. The timeout only keeps Ctrl+C
+            # responsive on Windows, where a bare wait() cannot be interrupted.
+            while not self._stop_event.wait(1.0):
+                pass
         except KeyboardInterrupt:
-            print("\n\n🛑 Shutting down...")
+            logger.info("\n\n🛑 Shutting down...")
             self.stop()
     
     def stop(self):
         """Stop the voice assistant."""
         self.is_running = False
+        self._stop_event.set()
         keyboard.unhook_all()
-        print("✅ Voice assistant stopped.")
+        # Write the bundle before exiting
+        self.profiler.stop(wait=True)
+        self.recorder.disarm()
+        self.cursor_highlighter.close()
+        self.audio_feedback.close()
+        self.output.close()
+        for stats in self.output.stats():
+            if stats["records"] or stats["dropped"]:
+                logger.info(f"📤 {stats}")
+        logger.info("✅ Voice assistant stopped.")
+
+
+def retranscribe_history(db: DatabaseManager, transcriber: WhisperTranscriber) -> int:
+    """
+    Run every stored history clip through the transcriber again.
+    
+    Clips are streamed from the database one at a time and each row's text
+    is updated in place.
+    
+    Args:
+        db: History database with stored audio
+        transcriber: Transcriber holding the model to use
+    
+    Returns:
+        Number of transcriptions updated
+    """
+    total = db.count_audio()
+    updated = 0
+    
+    logger.info(f"🔁 Re-transcribing {total} stored clips with model '{transcriber.model_name}'...")
+    for index, (trans_id, audio_data, sample_rate) in enumerate(db.iter_audio(), start=1):
+        if sample_rate != 16000:
+            logger.warning(f"⚠️  Skipping #{trans_id}: unsupported sample rate {sample_rate} Hz")
+            continue
+        
+        text = transcriber.transcribe(audio_data)
+        if text:
+            db.update_transcription_text(trans_id, text)
+            updated += 1
+        logger.info(f"   [{index}/{total}] #{trans_id} done")
+    
+    logger.info(f"✅ Updated {updated} transcriptions.")
+    return updated
+
+
+def quietest_split(audio: np.ndarray, start: int, frame: int = 320) -> int:
+    """
+    Find a place to cut a stream between words.
+    
+    Args:
+        audio: Samples to cut
+        start: Earliest sample to cut at
+        frame: Frame length for the energy measurement (20 ms)
+    
+    Returns:
+        Index of the start of the quietest frame after start
+    """
+    usable = (len(audio) - start) // frame
+    if usable < 1:
+        return len(audio)
+    frames = audio[start:start + usable * frame].reshape(usable, frame)
+    energy = np.einsum("ij,ij->i", frames, frames)
+    return start + int(np.argmin(energy)) * frame
+
+
+def copy_to_clipboard(text: str):
+    """
+    Put text on the Windows clipboard.
+    
+    Args:
+        text: Text to copy
+    """
+    try:
+        import win32clipboard
+    except ImportError:
+        raise RuntimeError("pywin32 is not installed. Install with: pip install pywin32")
+    
+    win32clipboard.OpenClipboard()
+    try:
+        win32clipboard.EmptyClipboard()
+        win32clipboard.SetClipboardText(text, win32clipboard.CF_UNICODETEXT)
+    finally:
+        win32clipboard.CloseClipboard()
+
+
+def format_offset(samples: int) -> str:
+    """Format a 16 kHz stream position as m:ss."""
+    minutes, seconds = divmod(samples // 16000, 60)
+    return f"{minutes}:{seconds:02d}"
+
+
+def transcribe_source(source, transcriber: WhisperTranscriber, segment_seconds: float = 30.0,
+                      batch_size: int = 4, output: Optional[OutputSink] = None) -> dict:
+    """
+    Transcribe a stream from any AudioSource.
+    
+    The stream is cut into segments of up to segment_seconds at the
+    quietest moment of each segment's last few seconds, so words are not
+    split. Segments are transcribed on a worker thread in batches of up
+    to batch_size while reading continues, and their text is delivered to
+    output in order. Segments of a batch that fails are replaced by a
+    "[not transcribed: m:ss-m:ss]" marker.
+    
+    Args:
+        source: AudioSource to read
+        transcriber: Transcriber holding the model to use
+        segment_seconds: Longest segment (Whisper's window is 30 s)
+        batch_size: Most segments transcribed in one batch
+        output: Sink for the transcript (default: stdout)
+    
+    Returns:
+        Dictionary with audio_seconds, wall_seconds and realtime_factor
+    """
+    output = output or FileSink("-")
+    segment_samples = int(segment_seconds * 16000)
+    search_samples = min(5 * 16000, segment_samples // 2)
+    # Bounded so a fast source cannot run far ahead of transcription
+    segments = queue.Queue(maxsize=2 * batch_size)
+    
+    def transcribe_segments():
+        finished = False
+        while not finished:
+            batch = [segments.get()]
+            while len(batch) < batch_size:
+                try:
+                    batch.append(segments.get_nowait())
+                except queue.Empty:
+                    break
+            if batch[-1] is None:
+                batch.pop()
+                finished = True
+            if not batch:
+                continue
+            try:
+                texts = transcriber.transcribe_batch([clip for offset, clip in batch])
+            except Exception as e:
+                # Keep draining the queue so the reader is never blocked
+                logger.error(f"❌ Error transcribing {len(batch)} segments: {e}")
+                # Mark the gap so the transcript does not silently skip it
+                first, last = batch[0][0], batch[-1][0] + len(batch[-1][1])
+                output.write(f"[not transcribed: {format_offset(first)}-{format_offset(last)}]")
+                continue
+            for text in texts:
+                output.write(text)
+    
+    start = time.perf_counter()
+    worker = threading.Thread(target=transcribe_segments, daemon=True)
+    worker.start()
+    
+    buffer = np.zeros(segment_samples * 2, dtype=np.float32)
+    filled = 0
+    audio_samples = 0
+    offset = 0  # Stream position of buffer[0], in samples
+    try:
+        for block in source.blocks():
+            audio_samples += len(block)
+            if filled + len(block) > len(buffer):
+                buffer = np.concatenate((buffer[:filled], np.zeros(len(block), dtype=np.float32)))
+            buffer[filled:filled + len(block)] = block
+            filled += len(block)
+            
+            while filled >= segment_samples:
+                cut = quietest_split(buffer[:segment_samples], segment_samples - search_samples)
+                segments.put((offset, buffer[:cut].copy()))
+                buffer[:filled - cut] = buffer[cut:filled]
+                filled -= cut
+                offset += cut
+    except KeyboardInterrupt:
+        logger.info("🛑 Stopped; transcribing what was received...")
+    
+    if filled > 16000 // 4:
+        segments.put((offset, buffer[:filled].copy()))
+    segments.put(None)
+    worker.join()
+    output.close()
+    
+    wall_seconds = time.perf_counter() - start
+    audio_seconds = audio_samples / 16000
+    stats = {
+        "audio_seconds": audio_seconds,
+        "wall_seconds": wall_seconds,
+        "realtime_factor": audio_seconds / max(wall_seconds, 1e-6)
+    }
+    logger.info(f"✅ Transcribed {audio_seconds:.1f}s of audio in {wall_seconds:.1f}s "
+                f"({stats['realtime_factor']:.1f}x real time)")
+    return stats
 
 
 def main():
@@ -132,13 +491,126 @@ def main():
     HOTKEY = "alt+r"  # Change this to customize the hotkey
     WHISPER_MODEL = "base"   # Options: tiny, base, small, medium, large
     
+    parser = argparse.ArgumentParser(description="Vokey voice assistant (CLI)")
+    parser.add_argument("--armed", action="store_true",
+                        help="Keep the microphone open with a pre-roll buffer for instant starts")
+    parser.add_argument("--draft-model", metavar="MODEL",
+                        help="Type a quick draft from this smaller model (e.g. tiny), then correct it")
+    parser.add_argument("--unload-after", type=float, metavar="MINUTES",
+                        help="Release the model after this many idle minutes; reloaded on the hotkey")
+    parser.add_argument("--workers", metavar="HOST:PORT,...",
+                        help="Send dictations to these transcription servers, decoding locally "
+                             "only when none answers")
+    parser.add_argument("--output", action="append", metavar="SPEC",
+                        help="Also send transcripts to '-' (stdout), a file (.jsonl for JSON lines), "
+                             "'pipe:PATH' or 'tcp:PORT'; repeatable")
+    parser.add_argument("--no-typing", action="store_true",
+                        help="Do not type transcripts (use with --output)")
+    parser.add_argument("--profile", type=int, metavar="N",
+                        help="Profile the first N dictations into the diagnostics folder")
+    subparsers = parser.add_subparsers(dest="command")
+    
+    retranscribe_parser = subparsers.add_parser(
+        "retranscribe",
+        help="Re-transcribe stored history audio with the current model"
+    )
+    retranscribe_parser.add_argument("--model", default=WHISPER_MODEL, help="Whisper model name")
+    retranscribe_parser.add_argument("--db", default="history.db", help="Path to history database")
+    
+    recover_parser = subparsers.add_parser(
+        "recover",
+        help="Transcribe long recordings interrupted by a crash into the history"
+    )
+    recover_parser.add_argument("--model", default=WHISPER_MODEL, help="Whisper model name")
+    recover_parser.add_argument("--db", default="history.db", help="Path to history database")
+    
+    export_parser = subparsers.add_parser("export", help="Export history to a JSONL or CSV file")
+    export_parser.add_argument("file", help="Output file (.jsonl or .csv)")
+    export_parser.add_argument("--format", choices=FORMATS, help="File format (default: from extension)")
+    export_parser.add_argument("--db", default="history.db", help="Path to history database")
+    
+    import_parser = subparsers.add_parser("import", help="Import history from a JSONL or CSV file")
+    import_parser.add_argument("file", help="Input file (.jsonl or .csv)")
+    import_parser.add_argument("--format", choices=FORMATS, help="File format (default: from extension)")
+    import_parser.add_argument("--db", default="history.db", help="Path to history database")
+    
+    transcribe_parser = subparsers.add_parser(
+        "transcribe",
+        help="Transcribe a stream from the microphone, a file, stdin or a local socket"
+    )
+    transcribe_parser.add_argument("source", help="'mic', a WAV/FLAC file, '-' for raw PCM on stdin, "
+                                                  "or 'tcp:PORT' for raw PCM on a local port")
+    transcribe_parser.add_argument("--model", default=WHISPER_MODEL, help="Whisper model name")
+    transcribe_parser.add_argument("--rate", type=int, default=16000,
+                                   help="Sample rate of raw PCM input (stdin, tcp)")
+    transcribe_parser.add_argument("--channels", type=int, default=1, help="Channels of raw PCM input")
+    transcribe_parser.add_argument("--batch", type=int, default=4, help="Segments transcribed per batch")
+    transcribe_parser.add_argument("--output", action="append", metavar="SPEC",
+                                   help="Where the transcript goes (default: stdout); repeatable")
+    transcribe_parser.add_argument("--flush-every", type=int, default=1,
+                                   help="Write outputs in batches of this many segments")
+    
+    args = parser.parse_args()
+    # The transcript goes to stdout; keep the diagnostics out of it
+    setup_logging(console_stream=sys.stderr if args.command == "transcribe" else None)
+    
+    if args.command == "export":
+        count = export_history(DatabaseManager(args.db), args.file, args.format)
+        logger.info(f"✅ Exported {count} transcriptions to {args.file}")
+        return
+    
+    if args.command == "import":
+        count = import_history(DatabaseManager(args.db), args.file, args.format)
+        logger.info(f"✅ Imported {count} new transcriptions from {args.file}")
+        return
+    
+    if args.command == "retranscribe":
+        db = DatabaseManager(args.db)
+        transcriber = WhisperTranscriber(model_name=args.model)
+        retranscribe_history(db, transcriber)
+        return
+    
+    if args.command == "transcribe":
+        source = open_source(args.source, sample_rate=args.rate, channels=args.channels)
+        transcriber = WhisperTranscriber(model_name=args.model)
+        output = FanOut([open_sink(spec, flush_every=args.flush_every) for spec in args.output or ["-"]])
+        transcribe_source(source, transcriber, batch_size=args.batch, output=output)
+        for stats in output.stats():
+            logger.info(f"📤 {stats}")
+        return
+    
+    if args.command == "recover":
+        db = DatabaseManager(args.db)
+        transcriber = WhisperTranscriber(model_name=args.model)
+        count = recover_spills(db, transcriber)
+        logger.info(f"✅ Recovered {count} recordings into {args.db}")
+        return
+    
+    spills = find_spills()
+    if spills:
+        logger.info(f"🩹 {len(spills)} interrupted recording(s) found; run 'python main.py recover' to transcribe them.")
+    
     # Create and start the assistant
-    assistant = VoiceAssistant(hotkey=HOTKEY, whisper_model=WHISPER_MODEL)
+    assistant = VoiceAssistant(
+        hotkey=HOTKEY,
+        whisper_model=WHISPER_MODEL,
+        armed_input=args.armed,
+        draft_model=args.draft_model,
+        idle_unload_seconds=args.unload_after * 60 if args.unload_after else None,
+        # With workers, the local model is loaded only if they cannot be reached
+        preload_model=not args.workers,
+        workers=args.workers.split(",") if args.workers else None,
+        # Batched by time so a busy reader costs the dictation nothing
+        outputs=[open_sink(spec, flush_every=16, flush_interval=1.0) for spec in args.output or []],
+        type_text=not args.no_typing
+    )
+    if args.profile:
+        assistant.profiler.start(args.profile)
     
     try:
         assistant.start()
     except Exception as e:
-        print(f"Fatal error: {e}", file=sys.stderr)
+        logger.error(f"Fatal error: {e}")
         sys.exit(1)
 
 
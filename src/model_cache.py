@@ -0,0 +1,321 @@
+"""
+Memory-Mapped Whisper Weight Cache
+===================================
+Loads Whisper models from a local cache of memory-mapped weights.
+
+whisper.load_model() unpickles the checkpoint into freshly allocated
+tensors on every launch. The first time a model is loaded, this module
+saves the model's state dict in a safetensors-compatible file:
+
+    [8-byte header length][JSON header][tensor data]
+
+Later launches map that file and build the model around tensors that point
+straight into the mapping. Nothing is copied, startup is close to
+instant, and the OS shares the pages between every process that uses the
+same model.
+
+The cache records where it came from (checkpoint hash, size and mtime plus
+the whisper and torch versions) and is rebuilt when any of them change.
+"""
+
+import os
+import json
+import struct
+from pathlib import Path
+from typing import Optional
+import numpy as np
+from log import get_logger
+from paths import app_cache_dir
+
+
+logger = get_logger(__name__)
+
+
+# Bump when the file layout or metadata changes
+CACHE_FORMAT_VERSION = 1
+
+# Data section start alignment; tensors are packed without gaps as the
+# safetensors format requires
+ALIGNMENT = 64
+
+# safetensors dtype names <-> numpy dtypes
+DTYPES = {
+    "F16": np.float16,
+    "F32": np.float32,
+    "F64": np.float64,
+    "I64": np.int64,
+    "I32": np.int32,
+    "BOOL": np.bool_,
+}
+
+
+def default_cache_dir() -> Path:
+    """Folder for cached weights."""
+    return app_cache_dir("models")
+
+
+def _whisper_root() -> str:
+    """Folder where whisper downloads its checkpoints."""
+    # Mirrors whisper.load_model's default, which uses ~/.cache on Windows too
+    base = os.getenv("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache"))
+    return os.path.join(base, "whisper")
+
+
+def _source_fingerprint(model_name: str) -> Optional[dict]:
+    """
+    Identify the checkpoint a cache is built from.
+    
+    Args:
+        model_name: Whisper model name
+    
+    Returns:
+        Dictionary describing the checkpoint and library versions, or None
+        if the model name is not one of whisper's downloadable models
+    """
+    import torch
+    import whisper
+    
+    url = whisper._MODELS.get(model_name)
+    if url is None:
+        return None
+    
+    checkpoint = os.path.join(_whisper_root(), os.path.basename(url))
+    fingerprint = {
+        "format": CACHE_FORMAT_VERSION,
+        "model": model_name,
+        # Whisper's download URLs embed the checkpoint's SHA256
+        "sha256": url.split("/")[-2],
+        "whisper": getattr(whisper, "__version__", "unknown"),
+        "torch": torch.__version__.split("+")[0],
+    }
+    if os.path.exists(checkpoint):
+        stat = os.stat(checkpoint)
+        fingerprint["checkpoint_size"] = stat.st_size
+        fingerprint["checkpoint_mtime"] = int(stat.st_mtime)
+    return fingerprint
+
+
+def save_weights(path: Path, state_dict, metadata: dict):
+    """
+    Write a state dict to a safetensors-compatible file.
+    
+    The file is written next to its final location and renamed into place,
+    so a crash never leaves a truncated cache behind.
+    
+    Args:
+        path: Destination file
+        state_dict: Mapping of names to CPU tensors
+        metadata: JSON-serializable metadata stored in the header
+    """
+    names = {np.dtype(v): k for k, v in DTYPES.items()}
+    header = {"__metadata__": {"vokey": json.dumps(metadata, sort_keys=True)}}
+    arrays = []
+    offset = 0
+    
+    for name, tensor in state_dict.items():
+        array = tensor.detach().cpu().contiguous().numpy()
+        if array.dtype not in names:
+            raise ValueError(f"Unsupported tensor dtype for {name}: {array.dtype}")
+        arrays.append((name, array))
+    
+    # Widest dtypes first: every offset stays a multiple of its item size,
+    # so the mapped tensors are aligned without padding between them
+    arrays.sort(key=lambda item: item[1].itemsize, reverse=True)
+    
+    for name, array in arrays:
+        header[name] = {
+            "dtype": names[array.dtype],
+            "shape": list(array.shape),
+            "data_offsets": [offset, offset + array.nbytes],
+        }
+        offset += array.nbytes
+    
+    header_bytes = json.dumps(header).encode("utf-8")
+    # Pad with spaces so the data section starts on an aligned boundary
+    header_bytes += b" " * (-(8 + len(header_bytes)) % ALIGNMENT)
+    
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(struct.pack("<Q", len(header_bytes)))
+        f.write(header_bytes)
+        for _, array in arrays:
+            f.write(array.tobytes())
+    os.replace(tmp_path, path)
+
+
+def read_header(path: Path):
+    """
+    Read the header of a cache file.
+    
+    Args:
+        path: Cache file
+    
+    Returns:
+        Tuple of (tensor entries, metadata dict, data start offset)
+    """
+    with open(path, "rb") as f:
+        (header_len,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(header_len))
+    metadata = json.loads(header.pop("__metadata__", {}).get("vokey", "{}"))
+    return header, metadata, 8 + header_len
+
+
+def map_weights(path: Path):
+    """
+    Map a cache file and wrap each tensor around the mapping without copying.
+    
+    The mapping is copy-on-write: the file is never modified, and pages
+    stay shared with other processes unless a tensor is written to.
+    
+    Args:
+        path: Cache file
+    
+    Returns:
+        Tuple of (state dict of torch tensors, metadata dict)
+    """
+    import torch
+    
+    entries, metadata, data_start = read_header(path)
+    mapping = np.memmap(path, dtype=np.uint8, mode="c")
+    state_dict = {}
+    for name, entry in entries.items():
+        begin, end = entry["data_offsets"]
+        array = mapping[data_start + begin:data_start + end].view(DTYPES[entry["dtype"]])
+        state_dict[name] = torch.from_numpy(array.reshape(entry["shape"]))
+    return state_dict, metadata
+
+
+def _build_model(state_dict, metadata: dict):
+    """
+    Create a Whisper model whose parameters are the mapped tensors.
+    
+    The model skeleton is created on the meta device, so no memory is
+    allocated for weights that are about to be replaced.
+    
+    Args:
+        state_dict: Mapped tensors
+        metadata: Cache metadata with model dims
+    
+    Returns:
+        whisper.model.Whisper instance
+    """
+    import torch
+    import whisper
+    from whisper.model import ModelDimensions, Whisper
+    
+    dims = ModelDimensions(**metadata["dims"])
+    try:
+        with torch.device("meta"):
+            model = Whisper(dims)
+    except Exception:
+        # Some whisper/torch combinations cannot build every buffer on the
+        # meta device; allocate a throwaway model instead
+        model = Whisper(dims)
+    model.load_state_dict(state_dict, strict=True, assign=True)
+    
+    # Non-persistent buffers are not in the state dict; recreate them on CPU
+    mask = torch.empty(dims.n_text_ctx, dims.n_text_ctx).fill_(-np.inf).triu_(1)
+    model.decoder.register_buffer("mask", mask, persistent=False)
+    alignment_heads = whisper._ALIGNMENT_HEADS.get(metadata["fingerprint"]["model"])
+    if alignment_heads is not None:
+        model.set_alignment_heads(alignment_heads)
+    else:
+        all_heads = torch.zeros(dims.n_text_layer, dims.n_text_head, dtype=torch.bool)
+        all_heads[dims.n_text_layer // 2:] = True
+        model.register_buffer("alignment_heads", all_heads.to_sparse(), persistent=False)
+    
+    for name, tensor in list(model.named_parameters()) + list(model.named_buffers()):
+        if tensor.is_meta:
+            raise RuntimeError(f"Weight cache did not provide {name}")
+    
+    return model.eval()
+
+
+def build_cache(model_name: str, path: Path, fingerprint: dict):
+    """
+    Load a model the standard way, write its weights to the cache and check
+    that the mapped copy matches the checkpoint exactly.
+    
+    Args:
+        model_name: Whisper model name
+        path: Cache file to write
+        fingerprint: Source fingerprint to store with the cache
+    
+    Returns:
+        The model loaded from the checkpoint (usable right away)
+    """
+    import torch
+    import whisper
+    
+    model = whisper.load_model(model_name, device="cpu")
+    # Loading may have downloaded the checkpoint; record its final size/mtime
+    fingerprint = _source_fingerprint(model_name) or fingerprint
+    state_dict = model.state_dict()
+    metadata = {"dims": vars(model.dims), "fingerprint": fingerprint}
+    save_weights(path, state_dict, metadata)
+    
+    mapped, _ = map_weights(path)
+    matches = mapped.keys() == state_dict.keys() and all(
+        torch.equal(mapped[name], tensor) for name, tensor in state_dict.items()
+    )
+    # Release the mapping before the file can be removed (required on Windows)
+    del mapped
+    if not matches:
+        path.unlink()
+        raise RuntimeError("Weight cache does not match the source checkpoint")
+    
+    return model
+
+
+def _supports_assign() -> bool:
+    """Return True if torch can adopt tensors in load_state_dict (torch >= 2.1)."""
+    import inspect
+    import torch
+    
+    return "assign" in inspect.signature(torch.nn.Module.load_state_dict).parameters
+
+
+def load_model_cached(model_name: str, cache_dir: Optional[Path] = None):
+    """
+    Load a Whisper model through the memory-mapped weight cache.
+    
+    Falls back to whisper.load_model() for custom checkpoints, when a GPU is
+    available (weights have to be copied to the device anyway) or if the
+    cache cannot be used.
+    
+    Args:
+        model_name: Whisper model name
+        cache_dir: Cache folder (default: default_cache_dir())
+    
+    Returns:
+        whisper.model.Whisper instance
+    """
+    import torch
+    import whisper
+    
+    fingerprint = _source_fingerprint(model_name)
+    if fingerprint is None or torch.cuda.is_available() or not _supports_assign():
+        return whisper.load_model(model_name)
+    
+    path = Path(cache_dir or default_cache_dir()) / f"{model_name}.safetensors"
+    
+    if path.exists():
+        state_dict = None
+        try:
+            state_dict, metadata = map_weights(path)
+            cached = metadata.get("fingerprint", {})
+            # Size and mtime are only compared while the checkpoint exists
+            if all(cached.get(key) == value for key, value in fingerprint.items()):
+                return _build_model(state_dict, metadata)
+            logger.info(f"♻️  Weight cache for '{model_name}' is stale, rebuilding...")
+        except Exception as e:
+            logger.warning(f"Weight cache for '{model_name}' unusable ({e}), rebuilding...")
+        # Drop the old mapping so the file can be replaced
+        state_dict = None
+    
+    try:
+        return build_cache(model_name, path, fingerprint)
+    except Exception as e:
+        logger.warning(f"Could not build weight cache: {e}")
+        return whisper.load_model(model_name)
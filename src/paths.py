@@ -0,0 +1,39 @@
+"""
+Application Folders
+====================
+Where vokey keeps files that outlive a run.
+
+Caches (memory-mapped model weights, spilled recordings, profile bundles)
+go under %LOCALAPPDATA%\\vokey on Windows, so they stay local to the
+machine and out of the roaming profile, and under $XDG_CACHE_HOME/vokey
+(default ~/.cache/vokey) elsewhere.
+
+This module contains:
+- app_cache_dir: Folder for the app's cached files
+"""
+
+import os
+import sys
+from pathlib import Path
+
+
+APP_NAME = "vokey"
+
+
+def app_cache_dir(*parts: str) -> Path:
+    """
+    Folder for the app's cached files.
+    
+    Args:
+        *parts: Subfolders to append (e.g. "spill")
+    
+    Returns:
+        Path to the folder (not created)
+    """
+    if sys.platform == "win32":
+        base = os.getenv("LOCALAPPDATA",
+                         os.path.join(os.path.expanduser("~"), "AppData", "Local"))
+    else:
+        base = os.getenv("XDG_CACHE_HOME",
+                         os.path.join(os.path.expanduser("~"), ".cache"))
+    return Path(base, APP_NAME, *parts)
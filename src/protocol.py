@@ -0,0 +1,148 @@
+"""
+Transcription Wire Protocol
+============================
+Message framing shared by the transcription server and its clients.
+
+Every message is:
+
+    [4-byte big-endian header length][UTF-8 JSON header][payload]
+
+The header's "payload_bytes" field gives the payload length (0 if absent).
+Audio travels as raw little-endian int16 samples, half the size of
+float32 and with no text encoding overhead.
+
+Requests:
+    {"op": "transcribe", "id": ..., "sample_rate": 16000}  + int16 payload
+    {"op": "metrics"}
+    {"op": "ping"}
+
+A server started with a shared token (see TOKEN_ENV) only answers
+requests whose header carries it as "token". The token keeps other
+machines on the network out; it is not encryption.
+
+Responses carry the request's "id" and "ok". Failed requests have an
+"error" code: "busy" (queue full, retry later), "too_long", "bad_request",
+"unauthorized" or "failed".
+"""
+
+import json
+import socket
+import struct
+from typing import Optional, Tuple
+import numpy as np
+from audio_codec import to_int16
+
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+TOKEN_ENV = "VOKEY_TOKEN"  # Environment variable holding the shared token
+
+# Refuse headers larger than this (a header is a small JSON object)
+MAX_HEADER_BYTES = 64 * 1024
+
+
+class ProtocolError(Exception):
+    """Raised when a peer sends a malformed message."""
+
+
+def send_message(sock: socket.socket, header: dict, payload: bytes = b""):
+    """
+    Send one framed message.
+    
+    Args:
+        sock: Connected socket
+        header: JSON-serializable header
+        payload: Raw payload bytes
+    """
+    header = dict(header, payload_bytes=len(payload))
+    header_bytes = json.dumps(header).encode("utf-8")
+    sock.sendall(struct.pack(">I", len(header_bytes)) + header_bytes + payload)
+
+
+def recv_exactly(sock: socket.socket, size: int) -> Optional[bytes]:
+    """
+    Read exactly size bytes.
+    
+    Returns:
+        The bytes, or None if the peer closed the connection before the
+        first byte
+    """
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:], size - received)
+        if count == 0:
+            if received == 0:
+                return None
+            raise ProtocolError("Connection closed in the middle of a message")
+        received += count
+    return bytes(buffer)
+
+
+def recv_message(sock: socket.socket, max_payload: int) -> Optional[Tuple[dict, bytes]]:
+    """
+    Receive one framed message.
+    
+    Args:
+        sock: Connected socket
+        max_payload: Largest payload accepted, in bytes
+    
+    Returns:
+        Tuple of (header, payload), or None if the peer closed the connection
+    
+    Raises:
+        ProtocolError: If the message is malformed or too large
+    """
+    prefix = recv_exactly(sock, 4)
+    if prefix is None:
+        return None
+    (header_len,) = struct.unpack(">I", prefix)
+    if header_len > MAX_HEADER_BYTES:
+        raise ProtocolError(f"Header too large: {header_len} bytes")
+    
+    try:
+        header = json.loads(recv_exactly(sock, header_len) or b"")
+    except ValueError as e:
+        raise ProtocolError(f"Invalid header: {e}")
+    if not isinstance(header, dict):
+        raise ProtocolError("Header must be a JSON object")
+    
+    try:
+        payload_bytes = int(header.get("payload_bytes", 0))
+    except (ValueError, TypeError):
+        raise ProtocolError(f"Invalid payload_bytes: {header.get('payload_bytes')!r}")
+    if payload_bytes < 0:
+        raise ProtocolError(f"Invalid payload_bytes: {payload_bytes}")
+    if payload_bytes > max_payload:
+        raise ProtocolError(f"Payload too large: {payload_bytes} bytes")
+    payload = recv_exactly(sock, payload_bytes) if payload_bytes else b""
+    return header, payload or b""
+
+
+def encode_clip(audio_data: np.ndarray) -> bytes:
+    """
+    Encode a clip as little-endian int16 bytes.
+    
+    Args:
+        audio_data: numpy array of audio samples (float32 or int16)
+    
+    Returns:
+        Payload bytes
+    """
+    return to_int16(np.asarray(audio_data).reshape(-1)).astype("<i2", copy=False).tobytes()
+
+
+def decode_clip(payload: bytes) -> np.ndarray:
+    """
+    Decode a payload produced by encode_clip.
+    
+    Args:
+        payload: int16 bytes
+    
+    Returns:
+        float32 numpy array of audio samples in [-1, 1]
+    """
+    if len(payload) % 2:
+        raise ProtocolError("Audio payload has an odd number of bytes")
+    return np.frombuffer(payload, dtype="<i2").astype(np.float32) / 32767.0
@@ -0,0 +1,222 @@
+"""
+Streaming Resampler
+====================
+Converts audio captured at the device's native rate to Whisper's 16 kHz.
+
+Asking the audio device for 16 kHz makes many host APIs insert their own
+resampler, which adds latency, is often low quality, and on some
+interfaces makes the stream fail to open. MicrophoneSource (and so
+AudioRecorder) instead captures at the native rate and resamples each
+block here.
+
+StreamingResampler is a rational polyphase FIR resampler (the same design
+as scipy.signal.resample_poly, Kaiser-windowed sinc). Each block is
+filtered with one vectorized gather and multiply-sum, and the input tail
+needed by the next block is carried over, so feeding a recording in
+blocks gives the same result as resampling it in one piece.
+
+process() runs inside the audio callback, so its work buffers (input
+history, indices, gathered windows and output) are allocated once, for
+the largest block seen, and every step writes into them with out=.
+After the first block of a stream no memory is allocated.
+"""
+
+import math
+import numpy as np
+
+
+def design_filter(up: int, down: int, half_taps: int = 10, beta: float = 5.0) -> np.ndarray:
+    """
+    Design the anti-aliasing low-pass filter for up/down resampling.
+    
+    Args:
+        up: Interpolation factor
+        down: Decimation factor
+        half_taps: Filter half-length in units of the slower rate's samples
+        beta: Kaiser window shape (higher: more stopband attenuation,
+              wider transition band)
+    
+    Returns:
+        float64 filter taps, gain-compensated for the zero stuffing
+    """
+    max_rate = max(up, down)
+    # Round the half-length up to a multiple of `down` so the filter delay
+    # is a whole number of output samples
+    half_len = math.ceil(half_taps * max_rate / down) * down
+    n = np.arange(-half_len, half_len + 1, dtype=np.float64)
+    cutoff = 1.0 / max_rate  # Fraction of the upsampled Nyquist rate
+    taps = cutoff * np.sinc(cutoff * n) * np.kaiser(len(n), beta)
+    return taps * up
+
+
+class StreamingResampler:
+    """
+    Resamples a mono stream block by block with carried-over filter state.
+    """
+    
+    def __init__(self, input_rate: int, output_rate: int = 16000,
+                 half_taps: int = 10, beta: float = 5.0):
+        """
+        Initialize the resampler.
+        
+        Args:
+            input_rate: Sample rate of the incoming audio in Hz
+            output_rate: Sample rate to produce in Hz
+            half_taps: Filter half-length (see design_filter)
+            beta: Kaiser window shape (see design_filter)
+        """
+        self.input_rate = int(input_rate)
+        self.output_rate = int(output_rate)
+        g = math.gcd(self.input_rate, self.output_rate)
+        self.up = self.output_rate // g
+        self.down = self.input_rate // g
+        
+        taps = design_filter(self.up, self.down, half_taps, beta)
+        self.delay = (len(taps) // 2) // self.down  # Output samples of filter delay
+        
+        # Phase p uses taps p, p + up, p + 2*up, ... (zero-padded to equal length)
+        self.taps_per_phase = math.ceil(len(taps) / self.up)
+        padded = np.zeros(self.taps_per_phase * self.up)
+        padded[:len(taps)] = taps
+        # Contiguous, so gathering rows from it does not copy it first
+        self.phases = np.ascontiguousarray(padded.reshape(self.taps_per_phase, self.up).T, dtype=np.float32)
+        self._offsets = np.arange(self.taps_per_phase)
+        
+        # History (taps_per_phase - 1 samples) followed by the current block
+        self._history_len = self.taps_per_phase - 1
+        self._buffer = np.zeros(self._history_len, dtype=np.float32)
+        self._capacity = 0  # Largest block the work buffers fit
+        self.reset()
+    
+    def _reserve(self, frames: int):
+        """Grow the work buffers to fit a block of `frames` input samples."""
+        if frames <= self._capacity:
+            return
+        buffer = np.zeros(self._history_len + frames, dtype=np.float32)
+        buffer[:self._history_len] = self._buffer[:self._history_len]
+        self._buffer = buffer
+        
+        max_out = frames * self.up // self.down + 2
+        self._counter = np.arange(max_out)
+        self._position = np.zeros(max_out, dtype=np.int64)
+        self._newest = np.zeros(max_out, dtype=np.int64)
+        self._phase = np.zeros(max_out, dtype=np.int64)
+        self._index = np.zeros((max_out, self.taps_per_phase), dtype=np.int64)
+        # Tap offsets repeated per row: a broadcasting ufunc with out= would
+        # still allocate its own iteration buffer, a same-shape one does not
+        self._offset_rows = np.tile(self._offsets, (max_out, 1))
+        self._window = np.zeros((max_out, self.taps_per_phase), dtype=np.float32)
+        self._weights = np.zeros((max_out, self.taps_per_phase), dtype=np.float32)
+        self._output = np.zeros(max_out, dtype=np.float32)
+        self._capacity = frames
+    
+    def reset(self):
+        """Forget all previous input (start a new stream)."""
+        # Input before the stream started counts as silence
+        self._buffer[:self._history_len] = 0
+        self._input_count = 0   # Input samples consumed so far
+        self._output_index = 0  # Next (undelayed) output sample to produce
+        self._emitted = 0       # Output samples returned so far
+    
+    @property
+    def passthrough(self) -> bool:
+        """True if input and output rates are equal."""
+        return self.up == self.down == 1
+    
+    def process(self, block: np.ndarray) -> np.ndarray:
+        """
+        Resample the next block of the stream.
+        
+        Args:
+            block: 1-D float32 input samples
+        
+        Returns:
+            1-D float32 output samples (the length varies from block to
+            block), a view of a buffer reused by the next call: copy what
+            you keep
+        """
+        block = np.asarray(block, dtype=np.float32).reshape(-1)
+        if self.passthrough:
+            return block.copy()
+        
+        frames = len(block)
+        history = self._history_len
+        self._reserve(frames)
+        buffer = self._buffer[:history + frames]
+        buffer[history:] = block
+        # Global input index of buffer[0]
+        buffer_start = self._input_count - history
+        self._input_count += frames
+        
+        # Output k needs input up to (k * down) // up
+        first = self._output_index
+        last_output = (self._input_count * self.up - 1) // self.down
+        count = max(0, last_output - first + 1)
+        self._output_index = max(first, last_output + 1)
+        output = self._output[:count]
+        
+        if count:
+            position = self._position[:count]
+            np.add(self._counter[:count], first, out=position)
+            np.multiply(position, self.down, out=position)
+            newest = self._newest[:count]
+            np.floor_divide(position, self.up, out=newest)
+            np.subtract(newest, buffer_start, out=newest)
+            phase = self._phase[:count]
+            np.remainder(position, self.up, out=phase)
+            
+            index = self._index[:count]
+            np.copyto(index, newest[:, None])
+            np.subtract(index, self._offset_rows[:count], out=index)
+            # mode="clip" lets take() write straight into out (the indices
+            # are always in range)
+            window = self._window[:count]
+            np.take(buffer, index, out=window, mode="clip")
+            weights = self._weights[:count]
+            np.take(self.phases, phase, axis=0, out=weights, mode="clip")
+            np.einsum("ij,ij->i", window, weights, out=output)
+        
+        # Keep the input the next block's first outputs need (a block
+        # shorter than the history overlaps it; numpy copies that safely)
+        buffer[:history] = buffer[frames:]
+        
+        # Drop the filter delay at the start of the stream
+        skip = min(max(0, self.delay - first), count)
+        self._emitted += count - skip
+        return output[skip:]
+    
+    def flush(self) -> np.ndarray:
+        """
+        Return the output still held back by the filter delay.
+        
+        Returns:
+            Remaining float32 output samples; after this the total output
+            length is ceil(input length * output_rate / input_rate)
+        """
+        if self.passthrough:
+            return np.zeros(0, dtype=np.float32)
+        
+        expected = -(-self._input_count * self.up // self.down)
+        emitted = self._emitted
+        # Enough silence to compute the last delayed output sample
+        needed = ((expected + self.delay) * self.down) // self.up + 1 - self._input_count
+        tail = self.process(np.zeros(max(needed, 1), dtype=np.float32))
+        keep = max(0, expected - emitted)
+        self._emitted = emitted + min(keep, len(tail))
+        return tail[:keep]
+    
+    def resample(self, audio: np.ndarray) -> np.ndarray:
+        """
+        Resample a complete clip (resets the stream state).
+        
+        Args:
+            audio: 1-D float32 samples
+        
+        Returns:
+            Resampled float32 samples
+        """
+        self.reset()
+        # process() reuses its output buffer, which flush() writes again
+        output = np.concatenate((self.process(audio).copy(), self.flush()))
+        self.reset()
+        return output
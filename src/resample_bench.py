@@ -0,0 +1,177 @@
+"""
+Resampler Check and Benchmark
+==============================
+Validates the streaming resampler and measures what it costs.
+
+Offline checks (no audio device needed), for common device rates:
+- Accuracy: SNR of a resampled 1 kHz tone against the exact 16 kHz tone
+- Anti-aliasing: how far a tone above 8 kHz is suppressed
+- Streaming: feeding odd-sized blocks gives the same output as one piece
+- Allocation: after the first block, process() allocates no memory (it
+  runs inside the audio callback)
+- Speed: how many times faster than real time one stream is resampled
+
+With --live SECONDS, also records from the default input device twice,
+once letting the host API resample to 16 kHz (the driver path) and once
+at the native rate with StreamingResampler, and compares the CPU used.
+
+Usage:
+    python resample_bench.py              Offline checks
+    python resample_bench.py --live 10    Also compare against the driver path
+"""
+
+import sys
+import argparse
+import time
+import tracemalloc
+import numpy as np
+from resample import StreamingResampler
+from log import setup_logging
+
+
+RATES = (22050, 32000, 44100, 48000, 96000)
+OUTPUT_RATE = 16000
+
+# Pass thresholds for the offline checks
+MIN_SNR_DB = 60.0
+MIN_ALIAS_REJECTION_DB = 40.0
+# Peak bytes allocated over ten blocks after the first; only small
+# temporary Python objects (array views, scalars) are expected
+MAX_BLOCK_ALLOCATION = 4096
+
+
+def tone(rate: int, frequency: float, seconds: float) -> np.ndarray:
+    """Generate a half-scale sine tone."""
+    t = np.arange(int(rate * seconds)) / rate
+    return (0.5 * np.sin(2 * np.pi * frequency * t)).astype(np.float32)
+
+
+def check_rate(rate: int) -> dict:
+    """
+    Run the offline checks for one input rate.
+    
+    Args:
+        rate: Input sample rate in Hz
+    
+    Returns:
+        Dictionary with snr_db, alias_rejection_db, streaming_error,
+        allocated_bytes and realtime_factor
+    """
+    resampler = StreamingResampler(rate, OUTPUT_RATE)
+    # Ignore the edges, where the filter sees the silence around the clip
+    edge = OUTPUT_RATE // 10
+    
+    # Accuracy: compare against the ideal tone at the output rate
+    output = resampler.resample(tone(rate, 1000, 2.0))
+    reference = tone(OUTPUT_RATE, 1000, len(output) / OUTPUT_RATE)[:len(output)]
+    error = output[edge:-edge] - reference[edge:-edge]
+    snr_db = 10 * np.log10(np.mean(reference[edge:-edge] ** 2) / max(np.mean(error ** 2), 1e-20))
+    
+    # Anti-aliasing: a 10 kHz tone cannot be represented at 16 kHz
+    if rate > 2 * 10000:
+        aliased = resampler.resample(tone(rate, 10000, 2.0))[edge:-edge]
+        alias_rejection_db = 10 * np.log10(0.125 / max(np.mean(aliased ** 2), 1e-20))
+    else:
+        alias_rejection_db = None
+    
+    # Streaming: odd block sizes must not change the result
+    clip = np.random.default_rng(0).standard_normal(rate).astype(np.float32) * 0.1
+    whole = resampler.resample(clip)
+    resampler.reset()
+    parts = []
+    position = 0
+    sizes = (1, 7, 160, 511, 1024, 4096)
+    while position < len(clip):
+        size = sizes[len(parts) % len(sizes)]
+        # process() reuses its output buffer
+        parts.append(resampler.process(clip[position:position + size]).copy())
+        position += size
+    parts.append(resampler.flush())
+    streamed = np.concatenate(parts)
+    streaming_error = float(np.max(np.abs(streamed - whole))) if len(streamed) == len(whole) else float("inf")
+    
+    # Allocation: 100 ms callback blocks after the first one
+    audio = tone(rate, 440, 10.0)
+    block = rate // 10
+    resampler.reset()
+    resampler.process(audio[:block])
+    tracemalloc.start()
+    for begin in range(block, 11 * block, block):
+        resampler.process(audio[begin:begin + block])
+    allocated_bytes = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    
+    # Speed: 10 ms blocks, as an audio callback would see them
+    block = rate // 100
+    resampler.reset()
+    start = time.process_time()
+    for begin in range(0, len(audio), block):
+        resampler.process(audio[begin:begin + block])
+    cpu = max(time.process_time() - start, 1e-9)
+    
+    return {
+        "snr_db": snr_db,
+        "alias_rejection_db": alias_rejection_db,
+        "streaming_error": streaming_error,
+        "allocated_bytes": allocated_bytes,
+        "realtime_factor": 10.0 / cpu
+    }
+
+
+def live_compare(seconds: float):
+    """
+    Record from the default input device through both paths and compare CPU.
+    
+    Args:
+        seconds: Length of each recording
+    """
+    from core import AudioRecorder
+    
+    for label, native in (("driver resampling", False), ("native + StreamingResampler", True)):
+        recorder = AudioRecorder(native_rate=native)
+        if not recorder.arm():
+            print(f"❌ Could not open the input device for {label}")
+            return
+        time.sleep(seconds)
+        stats = recorder.get_armed_stats()
+        rate = recorder.capture_rate
+        recorder.disarm()
+        print(f"{label:>30}: {rate} Hz capture, callback CPU {stats['callback_cpu_percent']:.2f}%, "
+              f"process CPU {stats['process_cpu_percent']:.2f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate and benchmark the streaming resampler")
+    parser.add_argument("--live", type=float, metavar="SECONDS",
+                        help="Also compare CPU use against the driver path on the default input device")
+    args = parser.parse_args()
+    setup_logging(to_file=False)
+    
+    failed = False
+    print(f"{'rate':>7} {'SNR dB':>8} {'alias dB':>9} {'stream err':>11} {'alloc B':>8} {'x realtime':>11}")
+    for rate in RATES:
+        result = check_rate(rate)
+        alias = result["alias_rejection_db"]
+        print(f"{rate:>7} {result['snr_db']:8.1f} {'-' if alias is None else f'{alias:.1f}':>9} "
+              f"{result['streaming_error']:11.1e} {result['allocated_bytes']:8d} "
+              f"{result['realtime_factor']:11.0f}")
+        if (result["snr_db"] < MIN_SNR_DB or result["streaming_error"] > 1e-6
+                or result["allocated_bytes"] > MAX_BLOCK_ALLOCATION
+                or (alias is not None and alias < MIN_ALIAS_REJECTION_DB)):
+            failed = True
+    
+    if failed:
+        print(f"❌ Resampler below thresholds (SNR {MIN_SNR_DB} dB, alias rejection "
+              f"{MIN_ALIAS_REJECTION_DB} dB, exact streaming, no per-block buffers)")
+    else:
+        print("✅ Resampler accurate and allocation-free at all rates")
+    
+    if args.live:
+        print()
+        live_compare(args.live)
+    
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,524 @@
+"""
+Local Transcription Server
+===========================
+Shares one loaded Whisper model with other tools on the same machine.
+
+Editor plugins and scripts connect over a localhost TCP socket (see
+protocol.py for the message format) instead of loading a model of their
+own. Clips that arrive within a short batching window are transcribed
+together in one batched encoder pass.
+
+Backpressure: at most max_queue clips wait at a time. A clip that does
+not fit is answered at once with error "busy" rather than queued without
+bound, and clips longer than max_clip_seconds are refused.
+
+The server binds to 127.0.0.1. To use it as a worker for other machines
+(see workers.py), bind it to the machine's LAN address with --host and
+set a shared token in the VOKEY_TOKEN environment variable on both
+sides; the server refuses to listen beyond localhost without one.
+
+This module contains:
+- ServerMetrics: Request, queue and batch-size counters
+- TranscriptionServer: Socket server plus the batching thread
+- TranscriptionClient: Client for the server
+- ServerBusy: Raised by the client when the server's queue is full
+
+Usage:
+    python server.py                          Serve the 'base' model on port 8765
+    python server.py --model small --window-ms 50 --max-batch 4
+    VOKEY_TOKEN=... python server.py --host 192.168.1.20
+                                              Serve as a worker for the LAN
+"""
+
+import os
+import sys
+import argparse
+import hmac
+import queue
+import socket
+import socketserver
+import threading
+import time
+from typing import Callable, List, Optional
+import numpy as np
+from protocol import (
+    DEFAULT_HOST, DEFAULT_PORT, TOKEN_ENV, ProtocolError,
+    send_message, recv_message, encode_clip, decode_clip
+)
+from log import get_logger, setup_logging
+
+
+logger = get_logger(__name__)
+
+
+class ServerBusy(Exception):
+    """The server's queue is full; retry later."""
+
+
+class ServerMetrics:
+    """Thread-safe counters describing server load."""
+    
+    def __init__(self):
+        """Initialize all counters to zero."""
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected_busy = 0
+        self.rejected_invalid = 0
+        self.rejected_unauthorized = 0
+        self.batches = 0
+        self.batch_sizes = {}  # batch size -> number of batches
+        self.max_queue_depth = 0
+        self.queue_wait_total = 0.0
+        self.decode_total = 0.0
+    
+    def count(self, name: str):
+        """Increment a counter by one."""
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+    
+    def record_queue_depth(self, depth: int):
+        """Track the deepest the queue has been."""
+        with self._lock:
+            self.max_queue_depth = max(self.max_queue_depth, depth)
+    
+    def record_batch(self, size: int, queue_wait: float, decode: float, ok: bool):
+        """
+        Record a finished batch.
+        
+        Args:
+            size: Clips in the batch
+            queue_wait: Summed seconds the clips waited before the batch started
+            decode: Seconds the batch took to transcribe
+            ok: False if the batch failed
+        """
+        with self._lock:
+            self.batches += 1
+            self.batch_sizes[size] = self.batch_sizes.get(size, 0) + 1
+            self.queue_wait_total += queue_wait
+            self.decode_total += decode
+            if ok:
+                self.completed += size
+            else:
+                self.failed += size
+    
+    def snapshot(self, queue_depth: int) -> dict:
+        """
+        Get the current metrics.
+        
+        Args:
+            queue_depth: Clips waiting right now
+        
+        Returns:
+            Dictionary of counters and averages
+        """
+        with self._lock:
+            clips = sum(size * n for size, n in self.batch_sizes.items())
+            return {
+                "requests": self.requests,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected_busy": self.rejected_busy,
+                "rejected_invalid": self.rejected_invalid,
+                "rejected_unauthorized": self.rejected_unauthorized,
+                "queue_depth": queue_depth,
+                "max_queue_depth": self.max_queue_depth,
+                "batches": self.batches,
+                "avg_batch_size": clips / self.batches if self.batches else None,
+                "batch_sizes": {str(size): n for size, n in sorted(self.batch_sizes.items())},
+                "avg_queue_wait_ms": 1000 * self.queue_wait_total / clips if clips else None,
+                "avg_batch_decode_ms": 1000 * self.decode_total / self.batches if self.batches else None
+            }
+
+
+class _ThreadingServer(socketserver.ThreadingTCPServer):
+    """One thread per connection; threads do not block shutdown."""
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class _Job:
+    """One clip waiting for its batch."""
+    
+    def __init__(self, audio: np.ndarray):
+        self.audio = audio
+        self.enqueued = time.perf_counter()
+        self.done = threading.Event()
+        self.text = None
+        self.error = None
+        self.batch_size = 0
+
+
+class TranscriptionServer:
+    """
+    Serves transcription requests from a batching thread.
+    """
+    
+    def __init__(self, transcribe_batch: Callable[[List[np.ndarray]], List[str]],
+                 host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                 batch_window_ms: float = 25.0, max_batch: int = 8,
+                 max_queue: int = 32, max_clip_seconds: float = 120.0,
+                 request_timeout: float = 300.0, token: Optional[str] = None):
+        """
+        Initialize the server (call start() to listen).
+        
+        Args:
+            transcribe_batch: Transcribes a list of float32 16 kHz clips and
+                              returns their texts in the same order
+            host: Interface to bind (keep it on localhost)
+            port: TCP port (0 picks a free one; see address)
+            batch_window_ms: How long the first clip of a batch waits for
+                             others to join it
+            max_batch: Most clips transcribed in one pass
+            max_queue: Most clips waiting at a time; more are refused as busy
+            max_clip_seconds: Longest clip accepted
+            request_timeout: Seconds a client waits for its result
+            token: Shared token every request must carry (None: no check;
+                   keep such a server on localhost)
+        """
+        self.transcribe_batch = transcribe_batch
+        self.token = token
+        self.batch_window = batch_window_ms / 1000.0
+        self.max_batch = max_batch
+        self.max_clip_seconds = max_clip_seconds
+        self.request_timeout = request_timeout
+        self.metrics = ServerMetrics()
+        
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._threads = []
+        
+        server = self
+        
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                server._handle_connection(self.request)
+        
+        self._tcp = _ThreadingServer((host, port), Handler)
+    
+    @property
+    def address(self):
+        """(host, port) the server is listening on."""
+        return self._tcp.server_address
+    
+    def start(self):
+        """Start accepting connections and transcribing batches."""
+        self._stop.clear()
+        for target in (self._tcp.serve_forever, self._batch_loop):
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        host, port = self.address
+        logger.info(f"🛰️  Transcription server listening on {host}:{port}")
+    
+    def stop(self):
+        """Stop the server and wait for its threads."""
+        self._stop.set()
+        self._tcp.shutdown()
+        self._tcp.server_close()
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
+    
+    def get_metrics(self) -> dict:
+        """Current metrics (see ServerMetrics.snapshot)."""
+        return self.metrics.snapshot(self._queue.qsize())
+    
+    def submit(self, audio: np.ndarray) -> _Job:
+        """
+        Queue a clip for the next batch.
+        
+        Raises:
+            ServerBusy: If the queue is full
+        """
+        job = _Job(audio)
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            raise ServerBusy()
+        self.metrics.record_queue_depth(self._queue.qsize())
+        return job
+    
+    def _batch_loop(self):
+        """Collect clips into batches and transcribe them (batching thread)."""
+        while not self._stop.is_set():
+            try:
+                batch = [self._queue.get(timeout=0.2)]
+            except queue.Empty:
+                continue
+            
+            # Give concurrent clients a moment to join this batch
+            deadline = time.perf_counter() + self.batch_window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            
+            self._run_batch(batch)
+    
+    def _run_batch(self, batch: List[_Job]):
+        """Transcribe one batch and wake its clients."""
+        start = time.perf_counter()
+        queue_wait = sum(start - job.enqueued for job in batch)
+        try:
+            texts = self.transcribe_batch([job.audio for job in batch])
+            if len(texts) != len(batch):
+                raise RuntimeError(f"Got {len(texts)} results for {len(batch)} clips")
+            for job, text in zip(batch, texts):
+                job.text = text
+            ok = True
+        except Exception as e:
+            logger.error(f"Error transcribing batch: {e}")
+            for job in batch:
+                job.error = "failed"
+            ok = False
+        
+        self.metrics.record_batch(len(batch), queue_wait, time.perf_counter() - start, ok)
+        for job in batch:
+            job.batch_size = len(batch)
+            job.done.set()
+    
+    def _handle_connection(self, sock: socket.socket):
+        """Answer requests on one client connection until it closes."""
+        max_payload = int(self.max_clip_seconds * 16000 * 2)
+        while not self._stop.is_set():
+            try:
+                message = recv_message(sock, max_payload)
+            except ProtocolError as e:
+                # The stream is out of sync; report and drop the connection
+                self.metrics.count("rejected_invalid")
+                self._reply(sock, {"ok": False, "error": "bad_request", "detail": str(e)})
+                return
+            except OSError:
+                return
+            if message is None:
+                return
+            
+            header, payload = message
+            response = self._handle_request(header, payload)
+            response["id"] = header.get("id")
+            if not self._reply(sock, response):
+                return
+    
+    def _handle_request(self, header: dict, payload: bytes) -> dict:
+        """
+        Handle one request.
+        
+        Args:
+            header: Request header
+            payload: Request payload
+        
+        Returns:
+            Response header
+        """
+        if self.token is not None and not hmac.compare_digest(
+                str(header.get("token", "")).encode("utf-8"), self.token.encode("utf-8")):
+            self.metrics.count("rejected_unauthorized")
+            return {"ok": False, "error": "unauthorized"}
+        
+        op = header.get("op")
+        if op == "ping":
+            return {"ok": True}
+        if op == "metrics":
+            return {"ok": True, "metrics": self.get_metrics()}
+        if op != "transcribe":
+            self.metrics.count("rejected_invalid")
+            return {"ok": False, "error": "bad_request", "detail": f"Unknown op: {op}"}
+        
+        self.metrics.count("requests")
+        if header.get("sample_rate", 16000) != 16000:
+            self.metrics.count("rejected_invalid")
+            return {"ok": False, "error": "bad_request", "detail": "sample_rate must be 16000"}
+        try:
+            audio = decode_clip(payload)
+        except ProtocolError as e:
+            self.metrics.count("rejected_invalid")
+            return {"ok": False, "error": "bad_request", "detail": str(e)}
+        if len(audio) > self.max_clip_seconds * 16000:
+            self.metrics.count("rejected_invalid")
+            return {"ok": False, "error": "too_long"}
+        
+        try:
+            job = self.submit(audio)
+        except ServerBusy:
+            self.metrics.count("rejected_busy")
+            return {"ok": False, "error": "busy"}
+        
+        if not job.done.wait(self.request_timeout):
+            return {"ok": False, "error": "failed", "detail": "Timed out"}
+        if job.error:
+            return {"ok": False, "error": job.error}
+        return {"ok": True, "text": job.text, "batch_size": job.batch_size}
+    
+    @staticmethod
+    def _reply(sock: socket.socket, header: dict) -> bool:
+        """Send a response; returns False if the client has gone."""
+        try:
+            send_message(sock, header)
+            return True
+        except OSError:
+            return False
+
+
+class TranscriptionClient:
+    """
+    Client for TranscriptionServer. One request at a time per client;
+    use one client per thread for concurrent requests.
+    """
+    
+    def __init__(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, timeout: float = 300.0,
+                 token: Optional[str] = None):
+        """
+        Initialize the client (connects on first use).
+        
+        Args:
+            host: Server host
+            port: Server port
+            timeout: Socket timeout in seconds
+            token: Shared token, if the server requires one
+        """
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.token = token
+        self._sock = None
+        self._next_id = 0
+    
+    def _request(self, header: dict, payload: bytes = b"", timeout: Optional[float] = None) -> dict:
+        """Send a request and wait for its response (timeout defaults to self.timeout)."""
+        if self._sock is None:
+            self._sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._next_id += 1
+        header = dict(header, id=self._next_id)
+        if self.token is not None:
+            header["token"] = self.token
+        try:
+            self._sock.settimeout(timeout if timeout is not None else self.timeout)
+            send_message(self._sock, header, payload)
+            message = recv_message(self._sock, 0)
+        except (OSError, ProtocolError):
+            self.close()
+            raise
+        if message is None:
+            self.close()
+            raise ConnectionError("Server closed the connection")
+        return message[0]
+    
+    def transcribe(self, audio_data: np.ndarray, timeout: Optional[float] = None) -> str:
+        """
+        Transcribe a clip on the server.
+        
+        Args:
+            audio_data: numpy array of audio samples (float32 or int16, 16kHz)
+            timeout: Seconds to wait for this result (default: self.timeout)
+        
+        Returns:
+            Transcribed text string
+        
+        Raises:
+            ServerBusy: If the server's queue is full
+            RuntimeError: If the server rejected or failed the request
+                          (including a missing or wrong token)
+        """
+        response = self._request({"op": "transcribe", "sample_rate": 16000}, encode_clip(audio_data), timeout)
+        if response.get("ok"):
+            return response["text"]
+        if response.get("error") == "busy":
+            raise ServerBusy()
+        raise RuntimeError(f"Server error: {response.get('error')} {response.get('detail', '')}".strip())
+    
+    def metrics(self) -> dict:
+        """Get the server's metrics."""
+        return self._request({"op": "metrics"})["metrics"]
+    
+    def ping(self) -> bool:
+        """Return True if the server answers."""
+        return bool(self._request({"op": "ping"}).get("ok"))
+    
+    def close(self):
+        """Close the connection."""
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            finally:
+                self._sock = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+
+
+def whisper_batch_fn(transcriber) -> Callable[[List[np.ndarray]], List[str]]:
+    """
+    Build the server's batch function around a WhisperTranscriber.
+    
+    Args:
+        transcriber: WhisperTranscriber holding the model to serve
+    
+    Returns:
+        Function transcribing a list of clips with batched passes
+    """
+    def transcribe_batch(clips):
+        if not transcriber.load():
+            raise RuntimeError("Whisper model is not available")
+        return transcriber.transcribe_batch(clips)
+    
+    return transcribe_batch
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a Whisper model to local clients")
+    parser.add_argument("--model", default="base", help="Whisper model name")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="Interface to bind (default: localhost only)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="TCP port")
+    parser.add_argument("--window-ms", type=float, default=25.0, help="Batching window in milliseconds")
+    parser.add_argument("--max-batch", type=int, default=8, help="Most clips per batch")
+    parser.add_argument("--max-queue", type=int, default=32, help="Most waiting clips before refusing as busy")
+    parser.add_argument("--metrics-interval", type=float, default=60.0,
+                        help="Print metrics every N seconds (0 to disable)")
+    args = parser.parse_args()
+    # Console only: the assistant may be writing vokey.log at the same time
+    setup_logging(to_file=False)
+    
+    # Read from the environment so the token stays out of the process list
+    token = os.environ.get(TOKEN_ENV) or None
+    if args.host not in ("127.0.0.1", "localhost", "::1") and token is None:
+        logger.error(f"❌ Set a shared token in {TOKEN_ENV} (on this machine and its clients) "
+                     f"before listening on {args.host}")
+        return 1
+    
+    from core import WhisperTranscriber
+    transcriber = WhisperTranscriber(model_name=args.model)
+    
+    server = TranscriptionServer(
+        whisper_batch_fn(transcriber),
+        host=args.host,
+        port=args.port,
+        batch_window_ms=args.window_ms,
+        max_batch=args.max_batch,
+        max_queue=args.max_queue,
+        token=token
+    )
+    server.start()
+    
+    try:
+        while True:
+            time.sleep(args.metrics_interval or 3600)
+            if args.metrics_interval:
+                logger.info(f"📊 {server.get_metrics()}")
+    except KeyboardInterrupt:
+        logger.info("\n🛑 Shutting down...")
+    finally:
+        server.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,218 @@
+"""
+Transcription Server Check
+===========================
+Exercises the transcription server on localhost without a Whisper model.
+
+The server is started on a free port with a stand-in batch function that
+sleeps like a decode pass and "transcribes" each clip to a label encoded
+in its samples, so every check below is deterministic:
+
+- Concurrent clients each get their own clip's result
+- Concurrent requests are coalesced into batches larger than one
+- A flood of requests against a small queue is refused as "busy"
+  instead of queuing without bound
+- Oversized and malformed requests are rejected
+- A server with a shared token refuses requests without it
+- The metrics op reports the counters
+
+With --model NAME, additionally transcribes a second of silence through a
+server backed by the real model.
+
+Usage:
+    python server_check.py
+    python server_check.py --model tiny
+"""
+
+import sys
+import argparse
+import json
+import socket
+import struct
+import threading
+import time
+import numpy as np
+from protocol import recv_message
+from server import TranscriptionServer, TranscriptionClient, ServerBusy, whisper_batch_fn
+from log import setup_logging
+
+
+DECODE_SECONDS = 0.05
+
+
+def labelled_clip(label: int, seconds: float = 1.0) -> np.ndarray:
+    """A clip whose samples encode an integer label."""
+    clip = np.zeros(int(16000 * seconds), dtype=np.float32)
+    clip[0] = label / 1000.0
+    return clip
+
+
+def fake_batch(clips):
+    """Stand-in decode: sleep, then return each clip's label."""
+    time.sleep(DECODE_SECONDS)
+    return [f"clip {round(float(clip[0]) * 1000)}" for clip in clips]
+
+
+def check(name: str, passed: bool, detail: str = "") -> bool:
+    """Print a check result."""
+    print(f"{'✅' if passed else '❌'} {name}{': ' + detail if detail else ''}")
+    return passed
+
+
+def run_clients(port: int, labels) -> dict:
+    """Send one clip per label from concurrent clients; returns label -> result."""
+    results = {}
+    
+    def worker(label):
+        try:
+            with TranscriptionClient(port=port, timeout=30) as client:
+                results[label] = client.transcribe(labelled_clip(label))
+        except ServerBusy:
+            results[label] = "busy"
+        except Exception as e:
+            results[label] = f"error: {e}"
+    
+    threads = [threading.Thread(target=worker, args=(label,)) for label in labels]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def send_raw_header(port: int, header: dict) -> bool:
+    """Send a header as-is (send_message would fix payload_bytes); True if refused as bad_request."""
+    with socket.create_connection(("127.0.0.1", port), timeout=5) as sock:
+        header_bytes = json.dumps(header).encode("utf-8")
+        sock.sendall(struct.pack(">I", len(header_bytes)) + header_bytes)
+        message = recv_message(sock, 0)
+    return message is not None and message[0].get("error") == "bad_request"
+
+
+def check_batching() -> bool:
+    """Concurrent requests: correct results, coalesced batches, metrics."""
+    server = TranscriptionServer(fake_batch, port=0, batch_window_ms=30, max_batch=8, max_queue=64)
+    server.start()
+    port = server.address[1]
+    ok = True
+    try:
+        labels = range(1, 25)
+        results = run_clients(port, labels)
+        wrong = [label for label in labels if results.get(label) != f"clip {label}"]
+        ok &= check("Concurrent clients get their own results", not wrong,
+                    f"wrong for {wrong}" if wrong else f"{len(results)} clips")
+        
+        with TranscriptionClient(port=port) as client:
+            ok &= check("Ping", client.ping())
+            metrics = client.metrics()
+        ok &= check("Requests coalesced into batches", (metrics["avg_batch_size"] or 0) > 1,
+                    f"{metrics['batches']} batches, sizes {metrics['batch_sizes']}")
+        ok &= check("Metrics count every request",
+                    metrics["requests"] == len(labels) and metrics["completed"] == len(labels),
+                    f"{metrics['requests']} requests, {metrics['completed']} completed")
+        
+        with TranscriptionClient(port=port) as client:
+            try:
+                client.transcribe(np.zeros(16000 * 200, dtype=np.float32))
+                ok &= check("Oversized clip rejected", False)
+            except RuntimeError as e:
+                ok &= check("Oversized clip rejected", "too_long" in str(e) or "bad_request" in str(e))
+            except OSError:
+                # The server stopped reading the oversized payload and dropped the connection
+                ok &= check("Oversized clip rejected", True, "connection dropped")
+        
+        with TranscriptionClient(port=port) as client:
+            response = client._request({"op": "nonsense"})
+            ok &= check("Unknown op rejected", response.get("error") == "bad_request")
+        
+        for value in ("lots", None, [1]):
+            refused = send_raw_header(port, {"op": "ping", "payload_bytes": value})
+            ok &= check(f"payload_bytes {value!r} rejected", refused)
+        with TranscriptionClient(port=port) as client:
+            ok &= check("Server still serving after malformed headers", client.ping())
+    finally:
+        server.stop()
+    return ok
+
+
+def check_backpressure() -> bool:
+    """A flood against a small queue: some requests refused as busy, none lost."""
+    server = TranscriptionServer(fake_batch, port=0, batch_window_ms=5, max_batch=2, max_queue=4)
+    server.start()
+    port = server.address[1]
+    ok = True
+    try:
+        labels = range(1, 41)
+        results = run_clients(port, labels)
+        busy = [label for label in labels if results[label] == "busy"]
+        served = [label for label in labels if results[label] == f"clip {label}"]
+        ok &= check("Flood refused as busy beyond the queue limit", len(busy) > 0,
+                    f"{len(served)} served, {len(busy)} busy")
+        ok &= check("Every request answered", len(busy) + len(served) == len(labels))
+        
+        metrics = server.get_metrics()
+        ok &= check("Queue depth stayed within its limit", metrics["max_queue_depth"] <= 4,
+                    f"max depth {metrics['max_queue_depth']}")
+        ok &= check("Busy rejections counted", metrics["rejected_busy"] == len(busy))
+    finally:
+        server.stop()
+    return ok
+
+
+def check_token() -> bool:
+    """A server with a token: requests without it or with a wrong one refused."""
+    server = TranscriptionServer(fake_batch, port=0, batch_window_ms=5, token="s3cret")
+    server.start()
+    port = server.address[1]
+    ok = True
+    try:
+        for name, token in (("no token", None), ("a wrong token", "guess")):
+            with TranscriptionClient(port=port, token=token) as client:
+                try:
+                    client.transcribe(labelled_clip(1))
+                    refused = False
+                except RuntimeError as e:
+                    refused = "unauthorized" in str(e)
+                ok &= check(f"Request with {name} refused", refused)
+        with TranscriptionClient(port=port, token="s3cret") as client:
+            ok &= check("Request with the token served", client.transcribe(labelled_clip(2)) == "clip 2")
+        ok &= check("Refusals counted", server.get_metrics()["rejected_unauthorized"] == 2)
+    finally:
+        server.stop()
+    return ok
+
+
+def check_model(model_name: str) -> bool:
+    """Transcribe silence through a server backed by a real model."""
+    from core import WhisperTranscriber
+    
+    transcriber = WhisperTranscriber(model_name=model_name)
+    server = TranscriptionServer(whisper_batch_fn(transcriber), port=0)
+    server.start()
+    try:
+        with TranscriptionClient(port=server.address[1]) as client:
+            start = time.perf_counter()
+            text = client.transcribe(np.zeros(16000, dtype=np.float32))
+            return check(f"Model '{model_name}' served a clip", isinstance(text, str),
+                         f"{time.perf_counter() - start:.2f}s, text {text!r}")
+    finally:
+        server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the transcription server on localhost")
+    parser.add_argument("--model", help="Also check a server backed by this Whisper model")
+    args = parser.parse_args()
+    setup_logging(to_file=False)
+    
+    ok = check_batching()
+    ok &= check_backpressure()
+    ok &= check_token()
+    if args.model:
+        ok &= check_model(args.model)
+    
+    print("✅ Server checks passed" if ok else "❌ Server checks failed")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,511 @@
+"""
+Output Sinks
+=============
+Where transcripts go, behind one interface.
+
+The pipeline hands every final transcript to an OutputSink; typing at the
+cursor (TextTyper) is one sink, and files, named pipes and local sockets
+are others that skip the UI-automation cost entirely. FanOut delivers to
+several sinks at once, so a dictation can be typed and logged to a file
+in the same pass.
+
+Sinks other than the typer batch their output: records are buffered and
+written in one go after flush_every records, or flush_interval seconds
+after the first buffered record, whichever comes first (and on close).
+flush_every=1 writes each record as it arrives.
+
+Pipes and sockets are written from a writer thread of their own, so a
+reader that stops reading never holds up the caller: batches wait in a
+bounded outbox, and once it is full new batches are dropped (and
+counted) instead.
+
+Each sink measures its own throughput: records, bytes, batches and the
+time spent in I/O (see OutputSink.stats()).
+
+Record formats: "text" (one line per transcript) or "jsonl" (one JSON
+object per line with the time, the text and any metadata given).
+
+This module contains:
+- OutputSink: Base class (batching, flush policy, statistics)
+- TyperSink: Types transcripts at the cursor, correcting drafts in place
+- FileSink: Appends to a file, or writes to stdout
+- PipeSink: Writes to a named pipe (FIFO, or \\\\.\\pipe\\name on Windows)
+- SocketSink: Sends to a TCP listener on this machine
+- FanOut: Delivers to several sinks
+- open_sink: Builds a sink from a command-line spec
+"""
+
+import os
+import sys
+import json
+import queue
+import socket
+import threading
+import time
+from datetime import datetime
+from typing import List, Optional
+from log import get_logger
+
+
+logger = get_logger(__name__)
+
+
+FORMATS = ("text", "jsonl")
+
+# Metadata copied into jsonl records when given
+RECORD_FIELDS = ("audio_seconds", "model", "engine")
+
+RECONNECT_SECONDS = 5.0  # Wait before retrying a pipe or socket with no reader
+MAX_PENDING_RECORDS = 1024  # Records a pipe or socket holds for a slow reader
+CLOSE_TIMEOUT = 2.0  # Seconds close() waits for a stalled pipe or socket reader
+
+
+class OutputSink:
+    """
+    A destination for transcripts.
+    
+    Subclasses implement _write_batch(); the base class formats records,
+    buffers them per the flush policy and keeps the statistics.
+    """
+    
+    name = "sink"
+    
+    def __init__(self, record_format: str = "text", flush_every: int = 1,
+                 flush_interval: Optional[float] = None):
+        """
+        Initialize the sink.
+        
+        Args:
+            record_format: "text" or "jsonl"
+            flush_every: Write after this many buffered records
+            flush_interval: Also write this many seconds after the first
+                            buffered record (None: only by count and on close)
+        """
+        if record_format not in FORMATS:
+            raise ValueError(f"Unknown record format: {record_format}")
+        self.record_format = record_format
+        self.flush_every = max(1, flush_every)
+        self.flush_interval = flush_interval
+        self.records = 0
+        self.bytes = 0
+        self.batches = 0
+        self.write_seconds = 0.0
+        self.dropped = 0
+        self.errors = 0
+        self._buffer = []
+        self._lock = threading.RLock()
+        self._timer = None
+    
+    def format_record(self, text: str, meta: dict) -> str:
+        """Turn a transcript into one output line."""
+        if self.record_format == "jsonl":
+            record = {"time": datetime.now().isoformat(timespec="seconds"), "text": text}
+            record.update((key, meta[key]) for key in RECORD_FIELDS if meta.get(key) is not None)
+            return json.dumps(record, ensure_ascii=False) + "\n"
+        return text + "\n"
+    
+    def draft(self, text: str, **meta):
+        """
+        Show a draft that a later write() will correct. Only sinks that
+        can edit what they wrote (the typer) show drafts.
+        """
+    
+    def write(self, text: str, draft: Optional[str] = None, **meta):
+        """
+        Deliver a final transcript.
+        
+        Args:
+            text: Transcript
+            draft: Draft shown earlier with draft(), if any
+            **meta: Details for the record (audio_seconds, model, engine)
+                    or for the sink (click_position)
+        """
+        if not text:
+            return
+        with self._lock:
+            self._buffer.append(self.format_record(text, meta))
+            if len(self._buffer) >= self.flush_every:
+                self.flush()
+            elif self.flush_interval is not None and self._timer is None:
+                self._timer = threading.Timer(self.flush_interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+    
+    def flush(self):
+        """Write the buffered records now."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._buffer:
+                return
+            batch, self._buffer = self._buffer, []
+            self._deliver(len(batch), "".join(batch).encode("utf-8"))
+    
+    def _deliver(self, count: int, data: bytes):
+        """Write a batch with _write_batch() and count the outcome."""
+        start = time.perf_counter()
+        try:
+            written = self._write_batch(data)
+        except Exception as e:
+            logger.error(f"Error writing to {self.name}: {e}")
+            with self._lock:
+                self.errors += 1
+            written = False
+        with self._lock:
+            self.write_seconds += time.perf_counter() - start
+            if written:
+                self.records += count
+                self.bytes += len(data)
+                self.batches += 1
+            else:
+                self.dropped += count
+    
+    def _write_batch(self, data: bytes) -> bool:
+        """
+        Write a batch of records.
+        
+        Args:
+            data: UTF-8 encoded records
+        
+        Returns:
+            True if written, False if dropped (e.g. nobody is listening)
+        """
+        raise NotImplementedError
+    
+    def close(self):
+        """Write what is buffered and release the sink."""
+        self.flush()
+    
+    def stats(self) -> dict:
+        """
+        Get the sink's throughput.
+        
+        Returns:
+            Dictionary of counters, plus records and bytes per second of
+            time spent writing
+        """
+        with self._lock:
+            seconds = self.write_seconds
+            return {
+                "sink": self.name,
+                "records": self.records,
+                "bytes": self.bytes,
+                "batches": self.batches,
+                "dropped": self.dropped,
+                "errors": self.errors,
+                "write_seconds": round(seconds, 6),
+                "records_per_second": round(self.records / seconds) if seconds else None,
+                "bytes_per_second": round(self.bytes / seconds) if seconds else None
+            }
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+
+
+class TyperSink(OutputSink):
+    """Types transcripts at the cursor with a TextTyper (never batched)."""
+    
+    name = "typer"
+    
+    def __init__(self, typer):
+        """
+        Initialize the sink.
+        
+        Args:
+            typer: TextTyper to type with
+        """
+        super().__init__()
+        self.typer = typer
+    
+    def draft(self, text: str, **meta):
+        """Type the draft right away; write() corrects it in place."""
+        self._timed(text, lambda: self.typer.type_text(text, click_position=meta.get("click_position")))
+    
+    def write(self, text: str, draft: Optional[str] = None, **meta):
+        """Type the transcript, or correct the typed draft to it."""
+        if not text:
+            return
+        if draft is None:
+            self._timed(text, lambda: self.typer.type_text(text, click_position=meta.get("click_position")))
+        elif text != draft:
+            self._timed(text, lambda: self.typer.replace_text(draft, text))
+    
+    def _timed(self, text: str, action):
+        """Run a typing action and count it."""
+        start = time.perf_counter()
+        action()
+        with self._lock:
+            self.write_seconds += time.perf_counter() - start
+            self.records += 1
+            self.bytes += len(text.encode("utf-8"))
+            self.batches += 1
+
+
+class FileSink(OutputSink):
+    """Appends transcripts to a file, or writes them to stdout ("-")."""
+    
+    def __init__(self, path: str, record_format: Optional[str] = None, flush_every: int = 1,
+                 flush_interval: Optional[float] = None, fsync: bool = False):
+        """
+        Open the file for appending.
+        
+        Args:
+            path: File path, or "-" for stdout
+            record_format: "text" or "jsonl" (default: jsonl for .jsonl files)
+            flush_every: Write after this many records
+            flush_interval: Also write this many seconds after the first record
+            fsync: Force each batch to disk (slower; survives power loss)
+        """
+        if record_format is None:
+            record_format = "jsonl" if str(path).lower().endswith(".jsonl") else "text"
+        super().__init__(record_format, flush_every, flush_interval)
+        self.path = path
+        self.fsync = fsync
+        self.name = "stdout" if path == "-" else f"file:{path}"
+        self._file = sys.stdout.buffer if path == "-" else open(path, "ab")
+    
+    def _write_batch(self, data: bytes) -> bool:
+        self._file.write(data)
+        self._file.flush()
+        if self.fsync and self.path != "-":
+            os.fsync(self._file.fileno())
+        return True
+    
+    def close(self):
+        super().close()
+        if self.path != "-":
+            self._file.close()
+
+
+class _ReconnectingSink(OutputSink):
+    """
+    Base for sinks that write to a reader which may come and go.
+    
+    Batches are handed to a writer thread through an outbox of at most
+    max_pending records; when the reader falls behind and the outbox is
+    full, new batches are dropped (and counted) instead of blocking the
+    caller. The connection is opened on the first batch. While nobody is
+    listening, batches are dropped too, and connecting is retried after
+    RECONNECT_SECONDS.
+    """
+    
+    def __init__(self, record_format: str, flush_every: int, flush_interval: Optional[float],
+                 max_pending: int = MAX_PENDING_RECORDS):
+        super().__init__(record_format, flush_every, flush_interval)
+        self.max_pending = max_pending
+        self._connection = None
+        self._retry_at = 0.0
+        self._outbox = queue.Queue()
+        self._pending = 0  # Records in the outbox
+        self._writer = None
+    
+    def _deliver(self, count: int, data: bytes):
+        """Queue a batch for the writer thread, or drop it if the outbox is full."""
+        with self._lock:
+            if self._pending + count > self.max_pending:
+                self.dropped += count
+                return
+            self._pending += count
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name=f"sink-{self.name}",
+                                                daemon=True)
+                self._writer.start()
+        self._outbox.put((count, data))
+    
+    def _write_loop(self):
+        """Write queued batches in order (writer thread)."""
+        while True:
+            item = self._outbox.get()
+            if item is None:
+                return
+            count, data = item
+            OutputSink._deliver(self, count, data)
+            with self._lock:
+                self._pending -= count
+    
+    def _connect(self):
+        """Open the connection; raise OSError if nobody is listening."""
+        raise NotImplementedError
+    
+    def _send(self, data: bytes):
+        """Write data to the open connection."""
+        raise NotImplementedError
+    
+    def _disconnect(self):
+        """Close the connection."""
+        raise NotImplementedError
+    
+    def _write_batch(self, data: bytes) -> bool:
+        if self._connection is None:
+            if time.monotonic() < self._retry_at:
+                return False
+            try:
+                self._connection = self._connect()
+                logger.info(f"🔌 Writing transcripts to {self.name}")
+            except OSError:
+                self._retry_at = time.monotonic() + RECONNECT_SECONDS
+                return False
+        try:
+            self._send(data)
+            return True
+        except OSError as e:
+            # The reader went away; this batch is lost, the next one reconnects
+            logger.warning(f"⚠️  Lost {self.name}: {e}")
+            self._disconnect()
+            self._connection = None
+            return False
+    
+    def close(self):
+        super().close()
+        # Wakes the writer once the batches before it are written
+        self._outbox.put(None)
+        while self._writer is not None and self._writer.is_alive():
+            pending = self._pending
+            self._writer.join(timeout=CLOSE_TIMEOUT)
+            if self._writer.is_alive() and self._pending >= pending:
+                # Stuck writing to a reader that stopped reading; leave it
+                logger.warning(f"⚠️  {self.name} is not being read; {self._pending} records not delivered")
+                return
+        if self._connection is not None:
+            self._disconnect()
+            self._connection = None
+
+
+class PipeSink(_ReconnectingSink):
+    """Writes transcripts to a named pipe read by another program."""
+    
+    def __init__(self, path: str, record_format: str = "text", flush_every: int = 1,
+                 flush_interval: Optional[float] = None, max_pending: int = MAX_PENDING_RECORDS):
+        """
+        Initialize the sink (the pipe is opened on the first batch).
+        
+        Args:
+            path: FIFO path (mkfifo), or \\\\.\\pipe\\name on Windows
+            record_format: "text" or "jsonl"
+            flush_every: Write after this many records
+            flush_interval: Also write this many seconds after the first record
+            max_pending: Most records waiting for a slow reader before
+                         new ones are dropped
+        """
+        super().__init__(record_format, flush_every, flush_interval, max_pending)
+        self.path = path
+        self.name = f"pipe:{path}"
+    
+    def _connect(self):
+        if sys.platform == "win32":
+            return open(self.path, "ab", buffering=0)
+        # Non-blocking open fails at once (ENXIO) when no reader has the FIFO open.
+        # Writes may block: they run on the writer thread.
+        fd = os.open(self.path, os.O_WRONLY | os.O_NONBLOCK)
+        os.set_blocking(fd, True)
+        return os.fdopen(fd, "wb", buffering=0)
+    
+    def _send(self, data: bytes):
+        self._connection.write(data)
+    
+    def _disconnect(self):
+        try:
+            self._connection.close()
+        except OSError:
+            pass
+
+
+class SocketSink(_ReconnectingSink):
+    """Sends transcripts to a TCP listener on this machine."""
+    
+    def __init__(self, port: int, host: str = "127.0.0.1", record_format: str = "text",
+                 flush_every: int = 1, flush_interval: Optional[float] = None,
+                 max_pending: int = MAX_PENDING_RECORDS):
+        """
+        Initialize the sink (it connects on the first batch).
+        
+        Args:
+            port: Listener port
+            host: Listener host (keep it on localhost)
+            record_format: "text" or "jsonl"
+            flush_every: Write after this many records
+            flush_interval: Also write this many seconds after the first record
+            max_pending: Most records waiting for a slow reader before
+                         new ones are dropped
+        """
+        super().__init__(record_format, flush_every, flush_interval, max_pending)
+        self.host = host
+        self.port = port
+        self.name = f"tcp:{host}:{port}"
+    
+    def _connect(self):
+        return socket.create_connection((self.host, self.port), timeout=2.0)
+    
+    def _send(self, data: bytes):
+        self._connection.sendall(data)
+    
+    def _disconnect(self):
+        self._connection.close()
+
+
+class FanOut(OutputSink):
+    """Delivers every transcript to several sinks; one failing does not stop the others."""
+    
+    name = "fanout"
+    
+    def __init__(self, sinks: List[OutputSink]):
+        """
+        Initialize the fan-out.
+        
+        Args:
+            sinks: Sinks to deliver to, in order
+        """
+        super().__init__()
+        self.sinks = list(sinks)
+    
+    def _each(self, method: str, *args, **kwargs):
+        """Call a method on every sink, logging failures."""
+        for sink in self.sinks:
+            try:
+                getattr(sink, method)(*args, **kwargs)
+            except Exception as e:
+                logger.error(f"Error in output {sink.name}: {e}")
+    
+    def draft(self, text: str, **meta):
+        self._each("draft", text, **meta)
+    
+    def write(self, text: str, draft: Optional[str] = None, **meta):
+        self._each("write", text, draft=draft, **meta)
+    
+    def flush(self):
+        self._each("flush")
+    
+    def close(self):
+        self._each("close")
+    
+    def stats(self) -> List[dict]:
+        """Statistics of every sink."""
+        return [sink.stats() for sink in self.sinks]
+
+
+def open_sink(spec: str, flush_every: int = 1, flush_interval: Optional[float] = None) -> OutputSink:
+    """
+    Build a sink from a command-line spec.
+    
+    Args:
+        spec: '-' (stdout), 'file:PATH' (or just a path), 'pipe:PATH' or
+              'tcp:PORT'. A '.jsonl' path writes JSON lines.
+        flush_every: Write after this many records
+        flush_interval: Also write this many seconds after the first record
+    
+    Returns:
+        OutputSink
+    """
+    if spec.startswith("pipe:"):
+        path = spec[5:]
+        return PipeSink(path, "jsonl" if path.lower().endswith(".jsonl") else "text",
+                        flush_every, flush_interval)
+    if spec.startswith("tcp:"):
+        return SocketSink(int(spec[4:]), flush_every=flush_every, flush_interval=flush_interval)
+    if spec.startswith("file:"):
+        spec = spec[5:]
+    return FileSink(spec, flush_every=flush_every, flush_interval=flush_interval)
@@ -0,0 +1,200 @@
+"""
+Output Sink Check and Benchmark
+================================
+Checks that every sink delivers each transcript exactly once, and
+measures how many it writes per second with and without batching.
+
+For a file, a named pipe (POSIX) and a local socket, writes the same
+transcripts once per record and once in batches, has a reader collect
+what arrived, and compares it with what was sent. Also checks that a
+pipe or socket with nobody listening, or with a reader that stopped
+reading, drops records instead of blocking the caller.
+
+Usage:
+    python sinks_bench.py                  5000 records per run
+    python sinks_bench.py --records 50000
+"""
+
+import os
+import sys
+import argparse
+import socket
+import tempfile
+import threading
+import time
+from pathlib import Path
+from sinks import FileSink, PipeSink, SocketSink, FanOut
+from log import setup_logging
+
+
+BATCH = 64
+TEXT = "The quick brown fox jumps over the lazy dog, again and again."
+
+
+def transcripts(count: int):
+    """Distinct transcripts, so loss and duplication show up."""
+    return [f"{index} {TEXT}" for index in range(count)]
+
+
+def run(sink, texts) -> float:
+    """Write the texts and close the sink; returns wall seconds."""
+    start = time.perf_counter()
+    for text in texts:
+        sink.write(text, audio_seconds=4.0)
+    sink.close()
+    return time.perf_counter() - start
+
+
+def read_all(reader, chunks: list):
+    """Collect everything a reader yields until it ends."""
+    while True:
+        data = reader()
+        if not data:
+            return
+        chunks.append(data)
+
+
+def bench_file(directory: Path, texts, flush_every: int):
+    path = directory / f"out-{flush_every}.txt"
+    sink = FileSink(str(path), flush_every=flush_every)
+    seconds = run(sink, texts)
+    return sink, seconds, path.read_text(encoding="utf-8")
+
+
+def bench_pipe(directory: Path, texts, flush_every: int):
+    path = directory / f"pipe-{flush_every}"
+    os.mkfifo(path)
+    chunks = []
+    done = threading.Event()
+    # Opening the read end first lets the sink connect; non-blocking so the
+    # open does not wait for a writer
+    fd = os.open(path, os.O_RDONLY | os.O_NONBLOCK)
+    
+    def reader():
+        while True:
+            try:
+                data = os.read(fd, 65536)
+            except BlockingIOError:
+                data = None
+            if data:
+                chunks.append(data)
+            elif done.is_set() and data == b"":
+                return
+            else:
+                time.sleep(0.001)
+    
+    thread = threading.Thread(target=reader)
+    thread.start()
+    sink = PipeSink(str(path), flush_every=flush_every, max_pending=len(texts))
+    seconds = run(sink, texts)
+    done.set()
+    thread.join()
+    os.close(fd)
+    return sink, seconds, b"".join(chunks).decode("utf-8")
+
+
+def bench_socket(texts, flush_every: int):
+    server = socket.create_server(("127.0.0.1", 0))
+    chunks = []
+    
+    def reader():
+        connection, _ = server.accept()
+        with connection:
+            read_all(lambda: connection.recv(65536), chunks)
+    
+    thread = threading.Thread(target=reader)
+    thread.start()
+    sink = SocketSink(server.getsockname()[1], flush_every=flush_every, max_pending=len(texts))
+    seconds = run(sink, texts)
+    thread.join()
+    server.close()
+    return sink, seconds, b"".join(chunks).decode("utf-8")
+
+
+def check_no_reader(directory: Path) -> bool:
+    """Pipe and socket with nobody listening: records dropped, nothing blocks."""
+    free = socket.create_server(("127.0.0.1", 0))
+    port = free.getsockname()[1]
+    free.close()
+    sinks = [SocketSink(port)]
+    if hasattr(os, "mkfifo"):
+        path = directory / "unread"
+        os.mkfifo(path)
+        sinks.append(PipeSink(str(path)))
+    
+    output = FanOut(sinks)
+    start = time.perf_counter()
+    for text in transcripts(10):
+        output.write(text)
+    output.close()
+    seconds = time.perf_counter() - start
+    ok = all(stats["dropped"] == 10 and stats["records"] == 0 for stats in output.stats()) and seconds < 1.0
+    print(f"{'✅' if ok else '❌'} No reader: {', '.join(sink.name for sink in sinks)} dropped "
+          f"{[stats['dropped'] for stats in output.stats()]} records in {seconds * 1000:.1f} ms")
+    return ok
+
+
+def check_stalled_reader(directory: Path) -> bool:
+    """Pipe and socket whose reader stopped reading: writes stay fast, records dropped."""
+    server = socket.create_server(("127.0.0.1", 0))
+    sinks = [SocketSink(server.getsockname()[1])]
+    fds = []
+    if hasattr(os, "mkfifo"):
+        path = directory / "stalled"
+        os.mkfifo(path)
+        # Opened for reading, never read
+        fds.append(os.open(path, os.O_RDONLY | os.O_NONBLOCK))
+        sinks.append(PipeSink(str(path)))
+    
+    output = FanOut(sinks)
+    text = "x" * 1000
+    slowest = 0.0
+    for _ in range(3000):
+        start = time.perf_counter()
+        output.write(text)
+        slowest = max(slowest, time.perf_counter() - start)
+    output.close()
+    server.close()
+    for fd in fds:
+        os.close(fd)
+    
+    dropped = [stats["dropped"] for stats in output.stats()]
+    ok = all(dropped) and slowest < 0.05
+    print(f"{'✅' if ok else '❌'} Stalled reader: {', '.join(sink.name for sink in sinks)} dropped "
+          f"{dropped} records, slowest write() {slowest * 1000:.1f} ms")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check and benchmark the output sinks")
+    parser.add_argument("--records", type=int, default=5000, help="Transcripts per run")
+    args = parser.parse_args()
+    setup_logging(to_file=False)
+    
+    texts = transcripts(args.records)
+    expected = "".join(text + "\n" for text in texts)
+    ok = True
+    with tempfile.TemporaryDirectory() as temp:
+        directory = Path(temp)
+        print(f"{'sink':<8} {'batch':>5} {'records/s':>11} {'MB/s':>7} {'batches':>8}  delivered")
+        for flush_every in (1, BATCH):
+            runs = [("file", lambda: bench_file(directory, texts, flush_every)),
+                    ("socket", lambda: bench_socket(texts, flush_every))]
+            if hasattr(os, "mkfifo"):
+                runs.append(("pipe", lambda: bench_pipe(directory, texts, flush_every)))
+            for kind, bench in runs:
+                sink, seconds, received = bench()
+                delivered = received == expected
+                ok &= delivered
+                print(f"{kind:<8} {flush_every:>5} {len(texts) / seconds:>11,.0f} "
+                      f"{len(expected) / seconds / 1e6:>7.1f} {sink.stats()['batches']:>8}  "
+                      f"{'✅ exactly once' if delivered else '❌ lost or changed'}")
+        ok &= check_no_reader(directory)
+        ok &= check_stalled_reader(directory)
+    
+    print("✅ Sink checks passed" if ok else "❌ Sink checks failed")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,336 @@
+"""
+Spill-to-Disk Capture
+======================
+Keeps very long recordings out of RAM.
+
+Once a recording grows past a threshold, AudioRecorder writes it to a raw
+little-endian int16 file instead of holding float32 chunks in memory. The
+finished file is memory-mapped, so transcription reads it without loading
+it into RAM. Each file has a JSON sidecar; a sidecar left behind by a crash
+marks a recording that can still be recovered.
+
+The recording process holds an exclusive lock on a third file (.lock)
+until it has delivered or given up on the recording, so another running
+instance never offers a live recording for recovery. The operating
+system drops the lock if the process dies.
+
+This module contains:
+- SpillFile: Appends audio to a spill file while recording
+- open_spill: Memory-maps a spill file as an int16 array
+- spill_in_use: Tells whether another process still owns a spill file
+- find_spills: Lists spill files left in a folder
+- delete_spill: Removes a spill file and its sidecar
+- recover_spills: Transcribes interrupted recordings into the history
+"""
+
+import os
+import sys
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+import numpy as np
+from audio_codec import to_int16
+from log import get_logger
+from paths import app_cache_dir
+
+
+logger = get_logger(__name__)
+
+
+SPILL_SUFFIX = ".pcm"
+META_SUFFIX = ".json"
+LOCK_SUFFIX = ".lock"
+
+
+def default_spill_dir() -> Path:
+    """Folder for spilled recordings (survives restarts, unlike the temp folder)."""
+    return app_cache_dir("spill")
+
+
+def _try_lock(file) -> bool:
+    """
+    Take an exclusive lock on an open file without waiting.
+    
+    Returns:
+        True if the lock was taken, False if another process holds it
+    """
+    try:
+        if sys.platform == "win32":
+            import msvcrt
+            file.seek(0)
+            msvcrt.locking(file.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except OSError:
+        return False
+
+
+def _unlock(file):
+    """Release a lock taken with _try_lock() and close the file."""
+    try:
+        if sys.platform == "win32":
+            import msvcrt
+            file.seek(0)
+            msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+    except OSError:
+        pass
+    file.close()
+
+
+class SpillFile:
+    """An int16 recording being written to disk."""
+    
+    def __init__(self, directory: Path, sample_rate: int, started: Optional[float] = None):
+        """
+        Create the spill file and its sidecar.
+        
+        Args:
+            directory: Folder to write to (created if missing)
+            sample_rate: Sample rate of the recording in Hz
+            started: Time the recording started (epoch seconds, default: now)
+        """
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        
+        stem = f"recording-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+        self.path = directory / (stem + SPILL_SUFFIX)
+        self.meta_path = directory / (stem + META_SUFFIX)
+        self.lock_path = directory / (stem + LOCK_SUFFIX)
+        self.sample_rate = sample_rate
+        self.frames = 0
+        started = datetime.fromtimestamp(started) if started is not None else datetime.now()
+        self.started = started.strftime("%Y-%m-%d %H:%M:%S")
+        
+        # Locked before the .pcm exists, so find_spills() never sees it unowned
+        self._lock = open(self.lock_path, "wb")
+        _try_lock(self._lock)
+        self._write_meta(complete=False)
+        self._file = open(self.path, "wb")
+    
+    def _write_meta(self, complete: bool):
+        """Write the sidecar describing the file."""
+        meta = {
+            "sample_rate": self.sample_rate,
+            "dtype": "<i2",
+            "started": self.started,
+            "frames": self.frames,
+            "complete": complete
+        }
+        with open(self.meta_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+    
+    def write(self, chunk: np.ndarray):
+        """
+        Append audio to the file.
+        
+        Args:
+            chunk: numpy array of audio samples (float32 or int16)
+        """
+        samples = to_int16(chunk.reshape(-1))
+        self._file.write(samples.astype("<i2", copy=False).tobytes())
+        # Hand the data to the OS so a crash of this process loses nothing
+        self._file.flush()
+        self.frames += len(samples)
+    
+    def finalize(self) -> np.ndarray:
+        """
+        Close the file, mark it complete and map it.
+        
+        Returns:
+            Read-only int16 array backed by the file
+        """
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        self._write_meta(complete=True)
+        return open_spill(self.path)
+    
+    def abandon(self) -> np.ndarray:
+        """
+        Give up on the file after a write failed: read back what was
+        written and delete it.
+        
+        Returns:
+            float32 array of the audio written so far
+        """
+        try:
+            self._file.close()
+        except OSError:
+            # The failed write is still buffered; it is dropped here
+            pass
+        try:
+            written = open_spill(self.path)[:self.frames]
+            audio = written.astype(np.float32) / 32767.0
+            del written
+        finally:
+            # If the read fails the file stays, unlocked, for recovery
+            self.release()
+        delete_spill(self.path)
+        return audio
+    
+    def release(self):
+        """
+        Drop the lock, so the file can be recovered by another process
+        (call once the recording is delivered or given up on).
+        """
+        if self._lock is not None:
+            _unlock(self._lock)
+            self._lock = None
+
+
+def open_spill(path) -> np.ndarray:
+    """
+    Memory-map a spill file.
+    
+    Args:
+        path: Spill file (.pcm)
+    
+    Returns:
+        Read-only int16 array backed by the file (not loaded into RAM)
+    """
+    if os.path.getsize(path) < 2:
+        # numpy cannot map an empty file
+        return np.zeros(0, dtype=np.int16)
+    # A crash can leave half a sample at the end; map whole samples only
+    frames = os.path.getsize(path) // 2
+    return np.memmap(path, dtype="<i2", mode="r", shape=(frames,))
+
+
+def spill_in_use(path) -> bool:
+    """
+    Tell whether a spill file belongs to a recording another running
+    process has not finished with.
+    
+    Args:
+        path: Spill file (.pcm)
+    
+    Returns:
+        True if its lock is held
+    """
+    lock_path = Path(path).with_suffix(LOCK_SUFFIX)
+    try:
+        file = open(lock_path, "ab")
+    except FileNotFoundError:
+        return False
+    except OSError:
+        # Cannot even be opened: assume its owner is still at work
+        return True
+    if not _try_lock(file):
+        file.close()
+        return True
+    _unlock(file)
+    return False
+
+
+def read_spill_meta(path) -> dict:
+    """
+    Read the sidecar of a spill file.
+    
+    Args:
+        path: Spill file (.pcm)
+    
+    Returns:
+        Sidecar dictionary (sample_rate, dtype, started, frames, complete)
+    """
+    meta_path = Path(path).with_suffix(META_SUFFIX)
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        # Sidecar lost or half-written: assume the recorder's default format
+        return {"sample_rate": 16000, "dtype": "<i2", "started": None, "complete": False}
+
+
+def find_spills(directory=None):
+    """
+    List spill files left in a folder, oldest first.
+    
+    A spill file is normally deleted once its transcription is stored, so
+    anything found here belongs to a recording that was interrupted. Files
+    still locked by a running process (see spill_in_use()) are left out.
+    
+    Args:
+        directory: Folder to search (default: default_spill_dir())
+    
+    Returns:
+        List of (path, sidecar dictionary) tuples
+    """
+    directory = Path(directory or default_spill_dir())
+    if not directory.exists():
+        return []
+    # Files named after this process belong to a recording still in progress
+    own = f"-{os.getpid()}{SPILL_SUFFIX}"
+    return [
+        (path, read_spill_meta(path))
+        for path in sorted(directory.glob("*" + SPILL_SUFFIX))
+        if not path.name.endswith(own) and not spill_in_use(path)
+    ]
+
+
+def delete_spill(path):
+    """
+    Remove a spill file, its sidecar and its lock file.
+    
+    Any array mapped from the file must be released first (required on
+    Windows). A file that cannot be removed is logged and left in place.
+    
+    Args:
+        path: Spill file (.pcm)
+    """
+    path = Path(path)
+    for file_path in (path, path.with_suffix(META_SUFFIX), path.with_suffix(LOCK_SUFFIX)):
+        try:
+            file_path.unlink()
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"⚠️  Could not delete {file_path}: {e}")
+
+
+def recover_spills(db, transcriber, directory=None) -> int:
+    """
+    Transcribe interrupted recordings and add them to the history.
+    
+    Each recording is stored with the time it started. A spill file is
+    deleted only after its transcription is stored; files that cannot be
+    transcribed are kept for another attempt.
+    
+    Args:
+        db: DatabaseManager to add the transcriptions to
+        transcriber: WhisperTranscriber to use
+        directory: Spill folder (default: default_spill_dir())
+    
+    Returns:
+        Number of recordings recovered
+    """
+    recovered = 0
+    
+    for path, meta in find_spills(directory):
+        sample_rate = meta.get("sample_rate", 16000)
+        if sample_rate != 16000:
+            logger.warning(f"⚠️  Skipping {path.name}: unsupported sample rate {sample_rate} Hz")
+            continue
+        
+        audio_data = open_spill(path)
+        duration = len(audio_data) / sample_rate
+        logger.info(f"🩹 Recovering {path.name} ({duration / 60:.1f} min)...")
+        text = transcriber.transcribe(audio_data)
+        # Release the mapping before the file is deleted
+        del audio_data
+        
+        if not text:
+            logger.warning(f"⚠️  No text transcribed from {path.name}; keeping it")
+            continue
+        
+        db.import_transcriptions([{
+            "timestamp": meta.get("started") or datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "text": text,
+            "duration": duration
+        }])
+        delete_spill(path)
+        recovered += 1
+    
+    return recovered
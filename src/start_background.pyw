@@ -10,60 +10,65 @@ Usage:
 
 import sys
 import threading
-import logging
-from datetime import datetime
+from log import get_logger, setup_logging
 from main import VoiceAssistant
 from tray_icon import TrayIcon
 
 
-def setup_logging():
-    """Setup file-based logging for background mode."""
-    log_filename = f"vokey_{datetime.now().strftime('%Y%m%d')}.log"
-    
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler(log_filename),
-            logging.StreamHandler(sys.stdout)  # Keep for debugging
-        ]
-    )
-    
-    return log_filename
+logger = get_logger("start_background")
 
 
 def main():
     """Main entry point for background mode."""
     try:
-        # Setup logging
+        # Under pythonw there is no console; everything goes to the log file
         log_file = setup_logging()
-        logging.info("="*60)
-        logging.info("Voice Assistant - Background Mode")
-        logging.info("="*60)
-        logging.info(f"Logging to: {log_file}")
+        logger.info("="*60)
+        logger.info("Voice Assistant - Background Mode")
+        logger.info("="*60)
+        logger.info(f"Logging to: {log_file}")
         
         # Configuration
         HOTKEY = "alt+r"
         WHISPER_MODEL = "base"
+        # Free the model's memory when nobody has dictated for this long;
+        # it is reloaded while the next recording is made. None: never.
+        IDLE_UNLOAD_MINUTES = 30
+        # Transcription servers to offload dictations to (see workers.py),
+        # e.g. ["gpu-box:8765"], token in VOKEY_TOKEN; the model is loaded
+        # only if none answers
+        WORKERS = []
         
-        # Create the voice assistant
-        logging.info("Initializing voice assistant...")
-        assistant = VoiceAssistant(hotkey=HOTKEY, whisper_model=WHISPER_MODEL)
+        # Create the voice assistant. The model is loaded on the assistant
+        # thread so the tray icon appears without waiting for it.
+        logger.info("Initializing voice assistant...")
+        assistant = VoiceAssistant(
+            hotkey=HOTKEY,
+            whisper_model=WHISPER_MODEL,
+            preload_model=False,
+            idle_unload_seconds=IDLE_UNLOAD_MINUTES * 60 if IDLE_UNLOAD_MINUTES else None,
+            workers=WORKERS
+        )
+        
+        def run_assistant():
+            # prefetch() also starts the idle countdown; no recording to hold it for
+            assistant.transcriber.prefetch(hold=False)
+            assistant.start()
         
         # Start the assistant in a separate thread
-        logging.info("Starting voice assistant thread...")
-        assistant_thread = threading.Thread(target=assistant.start, daemon=True)
+        logger.info("Starting voice assistant thread...")
+        assistant_thread = threading.Thread(target=run_assistant, daemon=True)
         assistant_thread.start()
         
         # Create and run the system tray icon (blocking)
-        logging.info("Starting system tray icon...")
+        logger.info("Starting system tray icon...")
         tray = TrayIcon(assistant)
         tray.run()  # This blocks until the user exits from the tray menu
         
     except KeyboardInterrupt:
-        logging.info("\n\n🛑 Shutting down...")
+        logger.info("\n\n🛑 Shutting down...")
     except Exception as e:
-        logging.error(f"Fatal error: {e}", exc_info=True)
+        logger.error(f"Fatal error: {e}", exc_info=True)
         sys.exit(1)
 
 
@@ -0,0 +1,134 @@
+"""
+Startup Import Profile
+======================
+Measures how long each entry point takes to import, per module.
+
+Runs each entry point in a fresh interpreter with `python -X importtime`
+and reports the modules with the largest cumulative import time. With
+--budget-ms, exits with status 1 if any entry point is over budget, so it
+can gate builds.
+
+Usage:
+    python startup_profile.py                  Profile all entry points
+    python startup_profile.py main app         Profile selected entry points
+    python startup_profile.py --budget-ms 800  Fail if an import exceeds 800 ms
+"""
+
+import os
+import sys
+import argparse
+import subprocess
+import time
+from pathlib import Path
+
+
+SRC_DIR = Path(__file__).parent
+
+# Entry point -> Python statement that reproduces its import cost
+ENTRY_POINTS = {
+    "main": "import main",
+    "main --help": "import sys, runpy; sys.argv = ['main.py', '--help']; runpy.run_path('main.py', run_name='__main__')",
+    "app": "import app",
+    "tray_icon": "import tray_icon",
+    "start_background": "import runpy; runpy.run_path('start_background.pyw', run_name='start_background')",
+}
+
+# Default startup budget per entry point, in milliseconds
+DEFAULT_BUDGET_MS = 1500
+
+
+def profile_entry_point(statement: str):
+    """
+    Import an entry point in a fresh interpreter and collect import times.
+    
+    Args:
+        statement: Python code to run with -X importtime
+    
+    Returns:
+        Tuple of (wall time in ms, list of (module, self ms, cumulative ms),
+        process return code)
+    """
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=SRC_DIR,
+        env=env,
+        capture_output=True,
+        text=True
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+    
+    modules = []
+    for line in result.stderr.splitlines():
+        # "import time:   self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|")
+            # One space separates the column; deeper indentation marks nested imports
+            modules.append((name[1:].rstrip(), int(self_us) / 1000, int(cumulative_us) / 1000))
+        except ValueError:
+            continue
+    
+    return wall_ms, modules, result.returncode
+
+
+def print_report(name: str, wall_ms: float, modules, top: int):
+    """
+    Print the import profile of one entry point.
+    
+    Args:
+        name: Entry point name
+        wall_ms: Total process wall time in milliseconds
+        modules: List of (module, self ms, cumulative ms)
+        top: Number of modules to list
+    """
+    top_level = [m for m in modules if not m[0].startswith(" ")]
+    total_ms = sum(m[2] for m in top_level)
+    
+    print("=" * 60)
+    print(f"{name}: {total_ms:.0f} ms importing, {wall_ms:.0f} ms wall time")
+    print("=" * 60)
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for module, self_ms, cumulative_ms in sorted(modules, key=lambda m: m[2], reverse=True)[:top]:
+        print(f"{cumulative_ms:14.1f} {self_ms:9.1f}  {module.strip()}")
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile entry point import time")
+    parser.add_argument("entry_points", nargs="*", help=f"Entry points (default: all of {', '.join(ENTRY_POINTS)})")
+    parser.add_argument("--top", type=int, default=15, help="Modules to list per entry point")
+    parser.add_argument("--budget-ms", type=float, default=None,
+                        help=f"Fail if an entry point takes longer (suggested: {DEFAULT_BUDGET_MS})")
+    args = parser.parse_args()
+    
+    names = args.entry_points or list(ENTRY_POINTS)
+    over_budget = []
+    
+    for name in names:
+        if name not in ENTRY_POINTS:
+            print(f"❌ Unknown entry point: {name}")
+            return 1
+        
+        wall_ms, modules, returncode = profile_entry_point(ENTRY_POINTS[name])
+        print_report(name, wall_ms, modules, args.top)
+        if returncode != 0:
+            print(f"⚠️  {name} exited with status {returncode} (missing dependency?)\n")
+        
+        if args.budget_ms is not None and (returncode != 0 or wall_ms > args.budget_ms):
+            over_budget.append((name, wall_ms))
+    
+    if args.budget_ms is not None:
+        if over_budget:
+            for name, wall_ms in over_budget:
+                print(f"❌ {name}: {wall_ms:.0f} ms, budget {args.budget_ms:.0f} ms (or failed to start)")
+            return 1
+        print(f"✅ All entry points within {args.budget_ms:.0f} ms budget")
+    
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+"""
+Assistant State Bus
+====================
+Single source of truth for what the voice assistant is doing.
+
+The recording pipeline moves the StateBus through
+idle -> recording -> transcribing -> typing -> idle (or error), and the GUI,
+tray icon and CLI subscribe to its change events instead of polling or
+reading each other's attributes.
+"""
+
+import threading
+import time
+from enum import Enum
+from typing import Callable, Optional
+from log import get_logger
+
+
+logger = get_logger(__name__)
+
+
+class AssistantState(Enum):
+    """States of the dictation pipeline."""
+    IDLE = "idle"
+    RECORDING = "recording"
+    TRANSCRIBING = "transcribing"
+    TYPING = "typing"
+    ERROR = "error"
+
+
+class StateEvent:
+    """A state change published by the StateBus."""
+    
+    def __init__(self, state: AssistantState, previous: AssistantState, message: Optional[str] = None):
+        """
+        Initialize the event.
+        
+        Args:
+            state: New state
+            previous: State before the change
+            message: Optional detail, e.g. the reason for an error
+        """
+        self.state = state
+        self.previous = previous
+        self.message = message
+        self.timestamp = time.time()
+    
+    def __repr__(self):
+        return f"StateEvent({self.previous.value} -> {self.state.value}, {self.message!r})"
+
+
+class StateBus:
+    """
+    Holds the current AssistantState and notifies subscribers of changes.
+    
+    Subscribers are called synchronously on the thread that changed the
+    state. Subscribers that own widgets (Tk, tray) must hand the event over
+    to their own thread rather than touching widgets directly.
+    """
+    
+    def __init__(self):
+        """Initialize the bus in the idle state."""
+        self._state = AssistantState.IDLE
+        self._subscribers = []
+        self._lock = threading.Lock()
+    
+    @property
+    def state(self) -> AssistantState:
+        """The current state."""
+        return self._state
+    
+    def subscribe(self, callback: Callable[[StateEvent], None]) -> Callable[[], None]:
+        """
+        Register a callback for state changes.
+        
+        Args:
+            callback: Called with a StateEvent after every change
+        
+        Returns:
+            Function that removes the subscription
+        """
+        with self._lock:
+            self._subscribers.append(callback)
+        
+        def unsubscribe():
+            with self._lock:
+                if callback in self._subscribers:
+                    self._subscribers.remove(callback)
+        
+        return unsubscribe
+    
+    def set_state(self, state: AssistantState, message: Optional[str] = None):
+        """
+        Change the state and notify subscribers.
+        
+        Args:
+            state: New state
+            message: Optional detail passed along with the event
+        """
+        self.transition(tuple(AssistantState), state, message)
+    
+    def transition(self, expected, state: AssistantState, message: Optional[str] = None) -> bool:
+        """
+        Change the state only if the current state is one of the expected ones.
+        
+        The check and the change happen atomically, so two threads racing to
+        start or stop a recording cannot both win.
+        
+        Args:
+            expected: AssistantState or tuple of states the bus must be in
+            state: New state
+            message: Optional detail passed along with the event
+        
+        Returns:
+            True if the state was changed
+        """
+        if isinstance(expected, AssistantState):
+            expected = (expected,)
+        with self._lock:
+            if self._state not in expected:
+                return False
+            previous = self._state
+            self._state = state
+            subscribers = list(self._subscribers)
+        
+        event = StateEvent(state, previous, message)
+        for callback in subscribers:
+            try:
+                callback(event)
+            except Exception as e:
+                logger.error(f"Error in state subscriber: {e}")
+        return True
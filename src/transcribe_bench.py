@@ -0,0 +1,141 @@
+"""
+Transcription Latency Benchmark
+================================
+Compares the short-clip path with the standard 30 s window by clip length.
+
+Cuts clips of several lengths from a speech recording, transcribes each
+with both paths, and reports the median latency, the speed-up, whether
+the short-clip result passed the accuracy guard, and whether both paths
+produced the same text.
+
+With --batch N, also transcribes N clips of the given lengths one at a
+time and with transcribe_batch(), and compares the total time.
+
+Usage:
+    python transcribe_bench.py speech.wav
+    python transcribe_bench.py speech.wav --model small --lengths 2 4 8 15 --runs 5
+    python transcribe_bench.py speech.wav --batch 16
+"""
+
+import sys
+import argparse
+import time
+import wave
+import numpy as np
+from log import setup_logging
+
+
+DEFAULT_LENGTHS = (2, 4, 6, 8, 12, 20)
+
+
+def read_wav(path) -> np.ndarray:
+    """
+    Read a 16 kHz mono 16-bit WAV file.
+    
+    Args:
+        path: WAV file
+    
+    Returns:
+        float32 samples in [-1, 1]
+    """
+    with wave.open(str(path), "rb") as f:
+        if f.getframerate() != 16000 or f.getnchannels() != 1 or f.getsampwidth() != 2:
+            raise ValueError("Expected a 16 kHz mono 16-bit WAV file")
+        frames = f.readframes(f.getnframes())
+    return np.frombuffer(frames, dtype="<i2").astype(np.float32) / 32767.0
+
+
+def median_latency(func, runs: int):
+    """
+    Run func several times.
+    
+    Returns:
+        Tuple of (median seconds, last return value)
+    """
+    times = []
+    result = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return float(np.median(times)), result
+
+
+def normalize(text: str) -> str:
+    """Lower-case words without punctuation, for comparing transcripts."""
+    return " ".join("".join(c for c in text.lower() if c.isalnum() or c.isspace()).split())
+
+
+def compare_batch(transcriber, audio: np.ndarray, lengths, count: int):
+    """
+    Transcribe count clips one at a time and as a batch, and compare.
+    
+    Args:
+        transcriber: Loaded WhisperTranscriber
+        audio: Speech recording
+        lengths: Clip lengths in seconds, cycled through
+        count: Number of clips
+    """
+    clips = []
+    for i in range(count):
+        samples = int(lengths[i % len(lengths)] * 16000)
+        offset = (i * 16000) % max(len(audio) - samples, 1)
+        clips.append(audio[offset:offset + samples])
+    
+    single_s, single = median_latency(lambda: [transcriber.transcribe(clip) for clip in clips], 1)
+    batch_s, batch = median_latency(lambda: transcriber.transcribe_batch(clips), 1)
+    same = sum(normalize(a) == normalize(b) for a, b in zip(single, batch))
+    print(f"{count} clips: one at a time {single_s:.2f}s, batched {batch_s:.2f}s "
+          f"({single_s / batch_s:.1f}x), batches {transcriber.last_batch_sizes}, "
+          f"{same}/{count} identical texts")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Short-clip vs standard transcription latency")
+    parser.add_argument("audio", help="16 kHz mono 16-bit WAV file with speech")
+    parser.add_argument("--model", default="base", help="Whisper model name")
+    parser.add_argument("--lengths", type=float, nargs="+", default=DEFAULT_LENGTHS,
+                        help="Clip lengths in seconds")
+    parser.add_argument("--runs", type=int, default=3, help="Runs per clip and path")
+    parser.add_argument("--batch", type=int, metavar="N",
+                        help="Also compare N clips one at a time against transcribe_batch()")
+    args = parser.parse_args()
+    setup_logging(to_file=False)
+    
+    from core import WhisperTranscriber
+    from whisper_ops import transcribe_short
+    
+    audio = read_wav(args.audio)
+    transcriber = WhisperTranscriber(model_name=args.model)
+    model = transcriber.model
+    
+    # Warm up both paths so the first row is not charged for it
+    transcribe_short(model, audio[:16000 * 2])
+    model.transcribe(audio[:16000 * 2], fp16=False)
+    
+    print(f"{'clip s':>7} {'standard s':>11} {'short s':>8} {'speed-up':>9} {'guard':>6} {'same text':>10}")
+    for seconds in args.lengths:
+        clip = audio[:int(seconds * 16000)]
+        if len(clip) < int(seconds * 16000):
+            print(f"{seconds:7.1f}  (recording too short)")
+            continue
+        
+        standard_s, standard = median_latency(
+            lambda: model.transcribe(clip, fp16=False)["text"].strip(), args.runs
+        )
+        short_s, short = median_latency(lambda: transcribe_short(model, clip), args.runs)
+        
+        passed = short is not None
+        same = passed and normalize(short.text) == normalize(standard)
+        print(f"{seconds:7.1f} {standard_s:11.3f} {short_s:8.3f} {standard_s / short_s:8.1f}x "
+              f"{'pass' if passed else 'fail':>6} {'yes' if same else 'no':>10}")
+    
+    if args.batch:
+        print()
+        compare_batch(transcriber, audio, args.lengths, args.batch)
+    
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
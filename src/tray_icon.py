@@ -5,9 +5,18 @@ Provides system tray icon with menu for background process management.
 """
 
 import sys
+import threading
 from pathlib import Path
+from typing import Optional
 import pystray
-from PIL import Image
+from PIL import Image, ImageDraw
+from core import level_to_fraction
+from diagnostics import DEFAULT_DICTATIONS, resident_memory, format_bytes
+from state import AssistantState
+from log import get_logger
+
+
+logger = get_logger(__name__)
 
 
 class TrayIcon:
@@ -16,6 +25,10 @@ class TrayIcon:
     Provides easy access to status and exit functionality.
     """
     
+    # Input level indicator: number of pre-rendered steps and refresh rate
+    LEVEL_STEPS = 5
+    LEVEL_FPS = 5
+    
     def __init__(self, voice_assistant):
         """
         Initialize the tray icon.
@@ -25,12 +38,84 @@ class TrayIcon:
         """
         self.voice_assistant = voice_assistant
         self.icon = None
+        self.icon_image = None
+        self.level_images = []
+        self._level_stop: Optional[threading.Event] = None
+        self.state = voice_assistant.state_bus.state
+        voice_assistant.state_bus.subscribe(self._on_state_changed)
+        voice_assistant.profiler.on_finished = self._on_profile_finished
+    
+    def _on_state_changed(self, event):
+        """Update the tray title and menu from a state bus event."""
+        self.state = event.state
+        if self.icon is not None:
+            # pystray marshals these updates to its own thread
+            self.icon.title = f"Voice Assistant - {self._state_text()}"
+            self.icon.update_menu()
+        
+        if event.state == AssistantState.RECORDING:
+            self._start_level_indicator()
+        elif self._level_stop is not None:
+            self._level_stop.set()
+            self._level_stop = None
+    
+    def _render_level_images(self, base: Image.Image):
+        """
+        Pre-render the icon with a level bar for each indicator step.
+        
+        Args:
+            base: Normal tray icon image
+        
+        Returns:
+            List of LEVEL_STEPS + 1 images, from silent to full scale
+        """
+        base = base.convert("RGBA").resize((64, 64))
+        images = []
+        for step in range(self.LEVEL_STEPS + 1):
+            image = base.copy()
+            draw = ImageDraw.Draw(image)
+            draw.rectangle((0, 54, 63, 63), fill=(38, 50, 56, 255))
+            width = int(64 * step / self.LEVEL_STEPS)
+            if width:
+                color = (239, 83, 80, 255) if step == self.LEVEL_STEPS else (102, 187, 106, 255)
+                draw.rectangle((0, 54, width - 1, 63), fill=color)
+            images.append(image)
+        return images
+    
+    def _start_level_indicator(self):
+        """Show the input level on the tray icon while recording."""
+        if self._level_stop is not None or self.icon is None or not self.level_images:
+            return
+        self._level_stop = threading.Event()
+        threading.Thread(target=self._run_level_indicator, args=(self._level_stop,), daemon=True).start()
+    
+    def _run_level_indicator(self, stop: threading.Event):
+        """Swap pre-rendered level icons at LEVEL_FPS until recording stops."""
+        recorder = self.voice_assistant.recorder
+        shown = None
+        while not stop.wait(1 / self.LEVEL_FPS):
+            peak = recorder.get_level()[1]
+            step = round(level_to_fraction(peak) * self.LEVEL_STEPS)
+            if step != shown:
+                self.icon.icon = self.level_images[step]
+                shown = step
+        self.icon.icon = self.icon_image
+    
+    def _state_text(self) -> str:
+        """Human-readable current state."""
+        return {
+            AssistantState.IDLE: "Waiting",
+            AssistantState.RECORDING: "Recording",
+            AssistantState.TRANSCRIBING: "Transcribing",
+            AssistantState.TYPING: "Typing",
+            AssistantState.ERROR: "Error",
+        }[self.state]
     
     def _create_menu(self):
         """Create the system tray menu."""
         return pystray.Menu(
             pystray.MenuItem(
-                "🎙️ Voice Assistant - Running",
+                lambda item: f"🎙️ Voice Assistant - {self._state_text()}",
                 lambda: None,
                 enabled=False
             ),
@@ -38,6 +123,20 @@ class TrayIcon:
                 "Show Status",
                 self._show_status
             ),
+            pystray.MenuItem(
+                "Retry Last",
+                pystray.Menu(
+                    pystray.MenuItem("More Carefully (beam search)", self._retry(beam_size=5)),
+                    pystray.MenuItem("Different Wording", self._retry(temperature=0.6)),
+                    pystray.MenuItem("As English", self._retry(language="en"))
+                ),
+                enabled=lambda item: self.voice_assistant.last_clip_id is not None
+            ),
+            pystray.MenuItem(
+                lambda item: ("Stop Profiling" if self.voice_assistant.profiler.active
+                              else f"Profile Next {DEFAULT_DICTATIONS} Dictations"),
+                self._toggle_profiling
+            ),
             pystray.Menu.SEPARATOR,
             pystray.MenuItem(
                 "Exit",
@@ -49,7 +148,13 @@ class TrayIcon:
         """Show status notification."""
         status_msg = "Voice Assistant is running in background.\n"
         status_msg += f"Hotkey: {self.voice_assistant.hotkey.upper()}\n"
-        status_msg += f"Status: {'Recording' if self.voice_assistant.recorder.is_recording else 'Waiting'}"
+        status_msg += f"Status: {self._state_text()}\n"
+        transcriber = self.voice_assistant.transcriber
+        loaded = "loaded" if transcriber.model is not None else "unloaded (reloads on hotkey)"
+        status_msg += f"Model: {transcriber.model_name}, {loaded}, memory {format_bytes(resident_memory())}"
+        if transcriber.workers is not None:
+            up = sum(node.up for node in transcriber.workers.nodes)
+            status_msg += f"\nWorkers: {up} of {len(transcriber.workers.nodes)} reachable"
         
         # Show notification
         icon.notify(
@@ -57,9 +162,42 @@ class TrayIcon:
             title="Voice Assistant Status"
         )
     
+    def _retry(self, **options):
+        """Menu action that retries the last dictation with these decoding options."""
+        def retry(icon):
+            if self.voice_assistant.retry_last(**options):
+                # Focus is on the tray, not the dictation's window, so the
+                # text is not retyped
+                icon.notify("Retried text copied to the clipboard; paste it over the old text.",
+                            title="Voice Assistant")
+        
+        def action(icon, item):
+            # Re-decoding takes a moment; keep it off the tray thread
+            threading.Thread(target=retry, args=(icon,), daemon=True).start()
+        return action
+    
+    def _toggle_profiling(self, icon, item):
+        """Start profiling the next dictations, or stop an active capture."""
+        profiler = self.voice_assistant.profiler
+        if profiler.active:
+            profiler.stop()
+            return
+        profiler.start(DEFAULT_DICTATIONS)
+        icon.update_menu()
+        icon.notify(
+            f"Profiling the next {DEFAULT_DICTATIONS} dictations.",
+            title="Voice Assistant Diagnostics"
+        )
+    
+    def _on_profile_finished(self, bundle):
+        """Tell the user where the profile was saved."""
+        if self.icon is not None:
+            self.icon.update_menu()
+            self.icon.notify(f"Profile saved to {bundle}", title="Voice Assistant Diagnostics")
+    
     def _exit_app(self, icon, item):
         """Exit the application gracefully."""
-        print("\n🛑 Exiting via system tray...")
+        logger.info("\n🛑 Exiting via system tray...")
         
         # Stop the voice assistant
         self.voice_assistant.stop()
@@ -78,12 +216,15 @@ class TrayIcon:
         # Load the icon image from artifacts folder
         icon_path = Path(__file__).parent.parent / "artifacts" / "favicon_io" / "favicon.ico"
         if not icon_path.exists():
-            print(f"Warning: Icon file not found at {icon_path}")
+            logger.warning(f"Warning: Icon file not found at {icon_path}")
             # Create a simple fallback icon
             icon_image = Image.new('RGB', (64, 64), color='blue')
         else:
             icon_image = Image.open(icon_path)
         
+        self.icon_image = icon_image
+        self.level_images = self._render_level_images(icon_image)
+        
         # Create the tray icon
         self.icon = pystray.Icon(
             name="VoiceAssistant",
@@ -93,7 +234,7 @@ class TrayIcon:
         )
         
         # Run the icon (blocking)
-        print("✅ System tray icon started.")
+        logger.info("✅ System tray icon started.")
         self.icon.run()
 
 
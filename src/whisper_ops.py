@@ -0,0 +1,476 @@
+"""
+Short-Clip and Batched Whisper Decoding
+========================================
+Transcribes short clips without padding them to Whisper's 30 s window.
+
+whisper.transcribe() always pads the mel spectrogram to 3000 frames, so a
+4 second dictation costs the encoder as much as 30 seconds of audio. Here
+the encoder runs on a context sized to the clip (plus a margin) by using
+only the first positional embeddings, and decoding reuses Whisper's own
+DecodingTask with the precomputed features.
+
+The encoder was trained on full windows, so results are checked with the
+same thresholds whisper.transcribe uses for its temperature fallback
+(average log-probability and compression ratio) plus a speaking-rate
+limit. transcribe_short() returns None when a result fails the checks,
+and the caller falls back to the standard path.
+
+decode_batch() does the same for several clips at once: they are padded
+to the longest clip, stacked into one encoder pass and decoded together,
+with finished clips removed from the decoder batch as they end.
+plan_batches() groups clips of similar length into batches sized to the
+free memory.
+
+encode_features() and decode_features() run the two halves separately,
+so a clip's features can be kept and decoded again with other options
+(language, prompt, temperature, beam size) without another encoder pass.
+
+Imports whisper and torch at load time; import this module lazily.
+"""
+
+import os
+import sys
+from typing import List, Optional
+import numpy as np
+import torch
+import torch.nn.functional as F
+import whisper
+from whisper.decoding import DecodingOptions, DecodingTask
+
+
+SAMPLE_RATE = 16000
+HOP_LENGTH = 160  # Audio samples per mel frame
+
+# Context is rounded up to whole steps of this many seconds, plus a margin
+# so the last word is not cut off at the edge of the window
+CONTEXT_STEP_SECONDS = 1.0
+CONTEXT_MARGIN_SECONDS = 1.0
+
+# Accuracy guard, matching whisper.transcribe's fallback defaults
+LOGPROB_THRESHOLD = -1.0
+COMPRESSION_RATIO_THRESHOLD = 2.4
+# Faster than any human dictation: a sign of repeated or invented text
+MAX_CHARS_PER_SECOND = 30.0
+
+# Batches may use this share of the free memory on the model's device
+MEMORY_BUDGET_FRACTION = 0.5
+MAX_BATCH = 16
+# A batch's longest clip may be at most this many times its shortest, so
+# short clips are not padded to a much longer context
+MAX_PADDING_RATIO = 2.0
+
+
+def context_frames(num_samples: int, n_audio_ctx: int) -> int:
+    """
+    Choose the mel frame count for a clip.
+    
+    Args:
+        num_samples: Clip length in samples (16 kHz)
+        n_audio_ctx: Encoder context of the model (1500 for 30 s)
+    
+    Returns:
+        Even number of mel frames, at most the full window
+    """
+    seconds = num_samples / SAMPLE_RATE + CONTEXT_MARGIN_SECONDS
+    steps = int(np.ceil(seconds / CONTEXT_STEP_SECONDS))
+    frames = int(steps * CONTEXT_STEP_SECONDS * SAMPLE_RATE / HOP_LENGTH)
+    frames += frames % 2  # conv2 halves the frame count
+    return min(frames, 2 * n_audio_ctx)
+
+
+def encode_truncated(model, mel: torch.Tensor) -> torch.Tensor:
+    """
+    Run the audio encoder on fewer frames than the full window.
+    
+    Mirrors AudioEncoder.forward, but slices the positional embedding to
+    the input length instead of requiring exactly n_audio_ctx positions.
+    
+    Args:
+        model: whisper.model.Whisper instance
+        mel: (n_mels, n_frames) or (batch, n_mels, n_frames) log-mel tensor
+    
+    Returns:
+        Audio features of shape (batch, n_frames // 2, n_audio_state)
+    """
+    encoder = model.encoder
+    if mel.ndim == 2:
+        mel = mel.unsqueeze(0)
+    x = F.gelu(encoder.conv1(mel))
+    x = F.gelu(encoder.conv2(x))
+    x = x.permute(0, 2, 1)
+    x = (x + encoder.positional_embedding[:x.shape[1]]).to(x.dtype)
+    for block in encoder.blocks:
+        x = block(x)
+    return encoder.ln_post(x)
+
+
+class PrecomputedFeaturesTask(DecodingTask):
+    """
+    DecodingTask that takes encoder features of any length.
+    
+    The stock task only accepts full-window features (anything else is
+    run through the encoder again), and its language detection re-encodes
+    too, so both steps are replaced.
+    """
+    
+    def _get_audio_features(self, mel: torch.Tensor) -> torch.Tensor:
+        """Use the features as given."""
+        return mel.half() if self.options.fp16 else mel.float()
+    
+    def _detect_language(self, audio_features: torch.Tensor, tokens: torch.Tensor):
+        """Detect the language from the given features without re-encoding."""
+        languages = [self.options.language] * audio_features.shape[0]
+        lang_probs = None
+        
+        if self.options.language is None or self.options.task == "lang_id":
+            lang_tokens, lang_probs = detect_language_from_features(
+                self.model, audio_features, self.tokenizer
+            )
+            languages = [max(probs, key=probs.get) for probs in lang_probs]
+            if self.options.language is None:
+                tokens[:, self.sot_index + 1] = lang_tokens
+        
+        return languages, lang_probs
+    
+    def _main_loop(self, audio_features: torch.Tensor, tokens: torch.Tensor):
+        """
+        Greedy decoding loop that drops each clip once it reaches end of text.
+        
+        The stock loop keeps running finished rows (padded with EOT) until
+        the longest clip is done. Here finished rows are taken out of the
+        tokens, features and key/value cache, so short clips stop costing
+        decoder steps. Beam search and best-of sampling keep the stock loop.
+        """
+        if self.n_group != 1:
+            return super()._main_loop(audio_features, tokens)
+        
+        eot = self.tokenizer.eot
+        n_batch = tokens.shape[0]
+        sum_logprobs = torch.zeros(n_batch, device=audio_features.device)
+        no_speech_probs = [np.nan] * n_batch
+        active = torch.arange(n_batch, device=tokens.device)
+        finished = {}
+        
+        try:
+            for i in range(self.sample_len):
+                logits = self.inference.logits(tokens, audio_features)
+                
+                if i == 0 and self.tokenizer.no_speech is not None:
+                    probs_at_sot = logits[:, self.sot_index].float().softmax(dim=-1)
+                    no_speech_probs = probs_at_sot[:, self.tokenizer.no_speech].tolist()
+                
+                logits = logits[:, -1]
+                for logit_filter in self.logit_filters:
+                    logit_filter.apply(logits, tokens)
+                
+                live_logprobs = sum_logprobs[active]
+                tokens, completed = self.decoder.update(tokens, logits, live_logprobs)
+                sum_logprobs[active] = live_logprobs
+                
+                if completed or tokens.shape[-1] > self.n_ctx:
+                    break
+                
+                done = tokens[:, -1] == eot
+                if not done.any():
+                    continue
+                for row in done.nonzero().squeeze(1).tolist():
+                    finished[active[row].item()] = tokens[row]
+                
+                # Cross-attention entries are cached per row too, so the
+                # whole cache is narrowed, not just the self-attention keys
+                keep = (~done).nonzero().squeeze(1)
+                tokens = tokens[keep]
+                audio_features = audio_features[keep]
+                active = active[keep]
+                cache = self.inference.kv_cache
+                for module, cached in cache.items():
+                    cache[module] = cached[keep].detach()
+        finally:
+            self.inference.cleanup_caching()
+        
+        output = torch.full((n_batch, tokens.shape[-1]), eot,
+                            dtype=tokens.dtype, device=tokens.device)
+        output[active] = tokens
+        for row, row_tokens in finished.items():
+            output[row, :row_tokens.shape[-1]] = row_tokens
+        
+        return output, sum_logprobs, no_speech_probs
+
+
+@torch.no_grad()
+def detect_language_from_features(model, audio_features: torch.Tensor, tokenizer):
+    """
+    Language detection on precomputed features (whisper.decoding.detect_language
+    without its encoder call).
+    
+    Args:
+        model: whisper.model.Whisper instance
+        audio_features: (batch, n_ctx, n_audio_state) encoder output
+        tokenizer: Multilingual whisper tokenizer
+    
+    Returns:
+        Tuple of (language token tensor, list of {language code: probability})
+    """
+    n_audio = audio_features.shape[0]
+    x = torch.tensor([[tokenizer.sot]] * n_audio).to(audio_features.device)
+    logits = model.logits(x, audio_features)[:, 0]
+    
+    # Only language tokens may win
+    mask = torch.ones(logits.shape[-1], dtype=torch.bool)
+    mask[list(tokenizer.all_language_tokens)] = False
+    logits[:, mask] = -np.inf
+    language_tokens = logits.argmax(dim=-1)
+    probs = logits.softmax(dim=-1).cpu()
+    language_probs = [
+        {
+            code: probs[i, token].item()
+            for token, code in zip(tokenizer.all_language_tokens, tokenizer.all_language_codes)
+        }
+        for i in range(n_audio)
+    ]
+    return language_tokens, language_probs
+
+
+def passes_guard(result, seconds: float) -> bool:
+    """
+    Check a short-clip result against the accuracy guard.
+    
+    Args:
+        result: whisper DecodingResult
+        seconds: Clip length in seconds
+    
+    Returns:
+        True if the result can be used
+    """
+    if result.avg_logprob < LOGPROB_THRESHOLD:
+        return False
+    if result.compression_ratio > COMPRESSION_RATIO_THRESHOLD:
+        return False
+    if len(result.text.strip()) > MAX_CHARS_PER_SECOND * max(seconds, 1.0):
+        return False
+    return True
+
+
+@torch.no_grad()
+def encode_features(model, audio: np.ndarray, truncate: bool = True) -> torch.Tensor:
+    """
+    Run the encoder on one clip.
+    
+    Args:
+        model: whisper.model.Whisper instance
+        audio: float32 samples at 16 kHz, at most 30 s
+        truncate: Size the context to the clip instead of the full 30 s window
+    
+    Returns:
+        Audio features of shape (1, n_ctx, n_audio_state)
+    """
+    n_audio_ctx = model.dims.n_audio_ctx
+    frames = context_frames(len(audio), n_audio_ctx) if truncate else 2 * n_audio_ctx
+    samples = whisper.pad_or_trim(audio, frames * HOP_LENGTH)
+    n_mels = getattr(model.dims, "n_mels", 80)
+    mel = whisper.log_mel_spectrogram(samples, n_mels).to(model.device)
+    return encode_truncated(model, mel)
+
+
+@torch.no_grad()
+def decode_features(model, features: torch.Tensor, language: Optional[str] = None,
+                    prompt: Optional[str] = None, temperature: float = 0.0,
+                    beam_size: Optional[int] = None):
+    """
+    Run the decoder on precomputed features.
+    
+    The decoder is cheap next to the encoder for short clips, so features
+    can be decoded again with other options at little cost.
+    
+    Args:
+        model: whisper.model.Whisper instance
+        features: (1, n_ctx, n_audio_state) output of encode_features()
+        language: Language code, or None to detect it
+        prompt: Text of a previous context, to steer spelling and style
+        temperature: Sampling temperature (0 is greedy)
+        beam_size: Beams for beam search (None is greedy; needs temperature 0)
+    
+    Returns:
+        whisper DecodingResult
+    """
+    options = DecodingOptions(
+        language=language,
+        prompt=prompt,
+        temperature=temperature,
+        beam_size=beam_size if temperature == 0 else None,
+        without_timestamps=True,
+        fp16=False  # Same precision as WhisperTranscriber's standard path
+    )
+    return PrecomputedFeaturesTask(model, options).run(features)[0]
+
+
+def transcribe_short(model, audio: np.ndarray, language: Optional[str] = None,
+                     keep_features: Optional[list] = None):
+    """
+    Transcribe a clip with a context sized to it.
+    
+    Args:
+        model: whisper.model.Whisper instance
+        audio: float32 samples at 16 kHz, at most 30 s
+        language: Language code, or None to detect it
+        keep_features: If given, the encoder features are appended to it
+                       when the result passes the guard
+    
+    Returns:
+        whisper DecodingResult, or None if the result failed the accuracy
+        guard and the standard path should be used
+    """
+    features = encode_features(model, audio)
+    result = decode_features(model, features, language=language)
+    
+    if not passes_guard(result, len(audio) / SAMPLE_RATE):
+        return None
+    if keep_features is not None:
+        keep_features.append(features)
+    return result
+
+
+def available_memory(device) -> Optional[int]:
+    """
+    Bytes of memory free for a batch on the model's device.
+    
+    Args:
+        device: torch.device the model is on
+    
+    Returns:
+        Free bytes, or None if it cannot be determined
+    """
+    try:
+        if device.type == "cuda":
+            return torch.cuda.mem_get_info(device)[0]
+        if sys.platform == "win32":
+            import ctypes
+            
+            class MemoryStatus(ctypes.Structure):
+                _fields_ = [
+                    ("dwLength", ctypes.c_ulong),
+                    ("dwMemoryLoad", ctypes.c_ulong),
+                    ("ullTotalPhys", ctypes.c_ulonglong),
+                    ("ullAvailPhys", ctypes.c_ulonglong),
+                    ("ullTotalPageFile", ctypes.c_ulonglong),
+                    ("ullAvailPageFile", ctypes.c_ulonglong),
+                    ("ullTotalVirtual", ctypes.c_ulonglong),
+                    ("ullAvailVirtual", ctypes.c_ulonglong),
+                    ("ullAvailExtendedVirtual", ctypes.c_ulonglong),
+                ]
+            
+            status = MemoryStatus(dwLength=ctypes.sizeof(MemoryStatus))
+            if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+                return status.ullAvailPhys
+            return None
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (AttributeError, ValueError, OSError, RuntimeError):
+        return None
+
+
+def clip_memory(model, frames: int) -> int:
+    """
+    Rough peak memory one clip adds to a batch, in bytes (float32).
+    
+    Counts the encoder's activations and attention scores for one layer
+    at a time, and the decoder's key/value caches, which grow with the
+    context and are held for the whole decode.
+    
+    Args:
+        model: whisper.model.Whisper instance
+        frames: Mel frames per clip in the batch
+    
+    Returns:
+        Estimated bytes
+    """
+    dims = model.dims
+    n_ctx = frames // 2
+    encoder = n_ctx * dims.n_audio_state * 8 + dims.n_audio_head * n_ctx * n_ctx
+    decoder = 2 * dims.n_text_layer * (n_ctx + dims.n_text_ctx) * dims.n_text_state
+    return 4 * (encoder + decoder)
+
+
+def plan_batches(model, lengths: List[int], max_batch: int = MAX_BATCH,
+                 truncate: bool = True) -> List[List[int]]:
+    """
+    Group clips into batches that fit in memory.
+    
+    Clips are sorted by length so each batch holds clips of similar
+    length and little padding is encoded (at most MAX_PADDING_RATIO
+    between a batch's longest and shortest clip). A batch is as large as
+    the memory budget allows for its longest clip, up to max_batch.
+    
+    Args:
+        model: whisper.model.Whisper instance
+        lengths: Clip lengths in samples (each at most 30 s)
+        max_batch: Largest batch
+        truncate: Whether batches will use a context sized to their longest clip
+    
+    Returns:
+        Lists of clip indices, one per batch
+    """
+    free = available_memory(model.device)
+    budget = free * MEMORY_BUDGET_FRACTION if free is not None else None
+    full = 2 * model.dims.n_audio_ctx
+    
+    batches = []
+    batch = []
+    shortest = 0
+    for index in sorted(range(len(lengths)), key=lambda i: lengths[i]):
+        frames = context_frames(lengths[index], model.dims.n_audio_ctx) if truncate else full
+        limit = max_batch
+        if budget is not None:
+            limit = max(1, min(max_batch, int(budget // clip_memory(model, frames))))
+        # Sorted by length, so this clip is the longest in the batch so far
+        if batch and (len(batch) >= limit or frames > MAX_PADDING_RATIO * shortest):
+            batches.append(batch)
+            batch = []
+        if not batch:
+            shortest = frames
+        batch.append(index)
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+@torch.no_grad()
+def decode_batch(model, clips: List[np.ndarray], language: Optional[str] = None,
+                 truncate: bool = True) -> List:
+    """
+    Transcribe several clips with one batched encoder pass.
+    
+    The clips are padded to a common length and stacked, encoded
+    together, and decoded together. Greedy decoding drops each clip from
+    the batch at its own end of text, so short clips do not run the
+    decoder for as long as the longest one.
+    
+    Args:
+        model: whisper.model.Whisper instance
+        clips: float32 arrays at 16 kHz, each at most 30 s (see plan_batches)
+        language: Language code, or None to detect it per clip
+        truncate: Size the context to the longest clip instead of the full
+                  30 s window
+    
+    Returns:
+        whisper DecodingResult per clip in input order, or None for clips
+        that failed the accuracy guard
+    """
+    n_audio_ctx = model.dims.n_audio_ctx
+    if truncate:
+        frames = context_frames(max(len(clip) for clip in clips), n_audio_ctx)
+    else:
+        frames = 2 * n_audio_ctx
+    n_mels = getattr(model.dims, "n_mels", 80)
+    mel = torch.stack([
+        whisper.log_mel_spectrogram(whisper.pad_or_trim(clip, frames * HOP_LENGTH), n_mels)
+        for clip in clips
+    ]).to(model.device)
+    
+    features = encode_truncated(model, mel)
+    options = DecodingOptions(language=language, without_timestamps=True, fp16=False)
+    results = PrecomputedFeaturesTask(model, options).run(features)
+    
+    return [
+        result if passes_guard(result, len(clip) / SAMPLE_RATE) else None
+        for clip, result in zip(clips, results)
+    ]
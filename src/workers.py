@@ -0,0 +1,320 @@
+"""
+Remote Transcription Workers
+=============================
+Offloads transcription to faster machines on the local network.
+
+A worker is an ordinary transcription server (server.py) started on
+another machine with --host set to its LAN address. Clips are sent as
+int16 over the same protocol (protocol.py), half the size of float32,
+with the shared token from the VOKEY_TOKEN environment variable.
+
+Each clip goes to the worker expected to finish it first: the one with
+the lowest load (clips queued on the worker, as reported by its metrics
+op, plus clips this client has in flight) times its measured latency
+(a moving average of seconds per second of audio). Workers that have not
+been measured yet are tried first. A background thread polls every
+worker's queue depth and brings unreachable workers back once they
+answer again.
+
+A worker that refuses or fails a clip, or cannot be reached, is skipped
+for the next best one; only an unreachable worker is marked down. Each
+clip's timeout is the worker's expected time for a clip that long (twice
+its latency times the clip's length) plus a fixed margin. When a worker
+does not answer in time, or none is available, transcribe() returns None
+and the caller decodes the clip locally.
+
+This module contains:
+- parse_worker: Parses a 'host:port' worker address
+- WorkerNode: One worker's connections and load estimates
+- WorkerPool: Picks a worker for each clip
+"""
+
+import os
+import socket
+import threading
+import time
+from typing import List, Optional, Tuple
+import numpy as np
+from protocol import DEFAULT_PORT, TOKEN_ENV, ProtocolError
+from server import TranscriptionClient, ServerBusy
+from log import get_logger
+
+
+logger = get_logger(__name__)
+
+
+LATENCY_SMOOTHING = 0.3  # Weight of the newest sample in the moving average
+POLL_INTERVAL = 2.0  # Seconds between queue-depth polls
+POLL_TIMEOUT = 2.0
+TIMEOUT_SLACK = 2.0  # Multiple of the expected decode time allowed before a timeout
+UNMEASURED_LATENCY = 1.0  # Assumed seconds per second of audio before the first result
+
+
+def parse_worker(spec: str) -> Tuple[str, int]:
+    """
+    Parse a worker address.
+    
+    Args:
+        spec: 'host:port', or 'host' for the default port
+    
+    Returns:
+        (host, port)
+    """
+    host, _, port = spec.strip().rpartition(":")
+    if not host:
+        return port, DEFAULT_PORT
+    return host, int(port)
+
+
+class WorkerNode:
+    """
+    One worker: a pool of connections plus its latency and load.
+    
+    Counters are updated under the owning WorkerPool's lock.
+    """
+    
+    def __init__(self, host: str, port: int, timeout: float, token: Optional[str] = None):
+        """
+        Initialize the node (connections are opened on first use).
+        
+        Args:
+            host: Worker host
+            port: Worker port
+            timeout: Seconds to wait for a result on top of the time
+                     expected for the clip (see request_timeout())
+            token: Shared token the worker requires
+        """
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.token = token
+        self.up = True
+        self.in_flight = 0  # Clips this client is waiting for
+        self.queue_depth = 0  # Clips waiting on the worker, from its metrics
+        self.latency = None  # Moving average, seconds per second of audio
+        self.completed = 0
+        self.failures = 0
+        self._idle = []  # Connected clients not in use
+        self._idle_lock = threading.Lock()
+        self._poll_client = TranscriptionClient(host, port, timeout=POLL_TIMEOUT, token=token)
+    
+    @property
+    def name(self) -> str:
+        """host:port of the worker."""
+        return f"{self.host}:{self.port}"
+    
+    def expected_cost(self) -> float:
+        """Relative time until a new clip would be done (0 if unmeasured)."""
+        return (self.queue_depth + self.in_flight + 1) * (self.latency or 0.0)
+    
+    def request_timeout(self, audio_seconds: float) -> float:
+        """Seconds to wait for a clip this long: the margin plus its expected decode time."""
+        latency = self.latency if self.latency is not None else UNMEASURED_LATENCY
+        return self.timeout + TIMEOUT_SLACK * latency * max(audio_seconds, 1.0)
+    
+    def record_latency(self, seconds: float, audio_seconds: float):
+        """Fold one round trip into the moving average."""
+        sample = seconds / max(audio_seconds, 1.0)
+        if self.latency is None:
+            self.latency = sample
+        else:
+            self.latency += LATENCY_SMOOTHING * (sample - self.latency)
+    
+    def transcribe(self, audio_data: np.ndarray) -> str:
+        """
+        Transcribe a clip on this worker.
+        
+        Raises:
+            ServerBusy: If the worker's queue is full
+            RuntimeError: If the worker failed this clip
+            socket.timeout: If the worker did not answer in time
+            OSError, ProtocolError: If the worker could not be reached
+        """
+        with self._idle_lock:
+            client = self._idle.pop() if self._idle else None
+        if client is None:
+            client = TranscriptionClient(self.host, self.port, timeout=self.timeout, token=self.token)
+        
+        try:
+            text = client.transcribe(audio_data, timeout=self.request_timeout(len(audio_data) / 16000))
+        except (ServerBusy, RuntimeError):
+            # The worker answered, so the connection is still good
+            with self._idle_lock:
+                self._idle.append(client)
+            raise
+        # A transport error raises before this and its connection is dropped
+        with self._idle_lock:
+            self._idle.append(client)
+        return text
+    
+    def poll(self) -> bool:
+        """
+        Fetch the worker's queue depth.
+        
+        Returns:
+            True if the worker answered
+        """
+        try:
+            self.queue_depth = self._poll_client.metrics()["queue_depth"]
+            return True
+        except (OSError, ProtocolError, KeyError):
+            self._poll_client.close()
+            return False
+    
+    def close(self):
+        """Close all connections."""
+        with self._idle_lock:
+            clients, self._idle = self._idle, []
+        for client in clients:
+            client.close()
+        self._poll_client.close()
+    
+    def stats(self) -> dict:
+        """Counters and estimates of this worker."""
+        return {
+            "worker": self.name,
+            "up": self.up,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "latency": round(self.latency, 4) if self.latency is not None else None,
+            "completed": self.completed,
+            "failures": self.failures
+        }
+
+
+class WorkerPool:
+    """
+    Sends each clip to the worker expected to finish it first.
+    """
+    
+    def __init__(self, workers: List[str], timeout: float = 10.0,
+                 max_clip_seconds: float = 120.0, poll_interval: float = POLL_INTERVAL,
+                 token: Optional[str] = None):
+        """
+        Initialize the pool and start polling the workers.
+        
+        Args:
+            workers: Worker addresses ('host:port')
+            timeout: Seconds to wait for a worker's result, on top of
+                     the time it is expected to take, before the caller
+                     decodes locally
+            max_clip_seconds: Longer clips are not sent (the server refuses
+                              them); match the workers' limit
+            poll_interval: Seconds between queue-depth polls
+            token: Shared token the workers require (default: the
+                   VOKEY_TOKEN environment variable)
+        """
+        token = token if token is not None else os.environ.get(TOKEN_ENV) or None
+        self.nodes = [WorkerNode(*parse_worker(spec), timeout=timeout, token=token) for spec in workers]
+        self.max_clip_seconds = max_clip_seconds
+        self.poll_interval = poll_interval
+        self.local_fallbacks = 0
+        self.last_worker = None  # Worker of the last successful transcribe()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._poller = threading.Thread(target=self._poll_loop, name="worker-poller", daemon=True)
+        self._poller.start()
+    
+    def available(self) -> bool:
+        """Whether any worker is reachable."""
+        return any(node.up for node in self.nodes)
+    
+    def _pick(self, tried: set) -> Optional[WorkerNode]:
+        """Reserve the reachable, untried worker with the lowest expected cost."""
+        with self._lock:
+            candidates = [node for node in self.nodes if node.up and node not in tried]
+            if not candidates:
+                return None
+            node = min(candidates, key=WorkerNode.expected_cost)
+            node.in_flight += 1
+            return node
+    
+    def transcribe(self, audio_data: np.ndarray) -> Optional[str]:
+        """
+        Transcribe a clip on the best available worker.
+        
+        Args:
+            audio_data: numpy array of audio samples (float32 or int16, 16kHz)
+        
+        Returns:
+            Transcribed text, or None if the caller should decode locally
+        """
+        audio_seconds = len(audio_data) / 16000
+        if audio_seconds > self.max_clip_seconds:
+            return None
+        
+        tried = set()
+        while True:
+            node = self._pick(tried)
+            if node is None:
+                break
+            tried.add(node)
+            start = time.perf_counter()
+            try:
+                text = node.transcribe(audio_data)
+            except ServerBusy:
+                logger.info(f"🛰️  Worker {node.name} is busy, trying another")
+                continue
+            except socket.timeout:
+                # Waiting on another worker could cost a second timeout
+                logger.warning(f"⚠️  Worker {node.name} timed out after "
+                               f"{node.request_timeout(audio_seconds):.1f}s")
+                with self._lock:
+                    node.record_latency(time.perf_counter() - start, audio_seconds)
+                    node.failures += 1
+                    node.up = False
+                break
+            except RuntimeError as e:
+                # The worker is fine; only this clip failed there
+                logger.warning(f"⚠️  Worker {node.name} failed the clip: {e}")
+                with self._lock:
+                    node.failures += 1
+                continue
+            except (OSError, ProtocolError) as e:
+                logger.warning(f"⚠️  Worker {node.name} failed: {e}")
+                with self._lock:
+                    node.failures += 1
+                    node.up = False
+                continue
+            finally:
+                with self._lock:
+                    node.in_flight -= 1
+            
+            with self._lock:
+                node.record_latency(time.perf_counter() - start, audio_seconds)
+                node.completed += 1
+            self.last_worker = node.name
+            return text
+        
+        with self._lock:
+            self.local_fallbacks += 1
+        return None
+    
+    def _poll_loop(self):
+        """Refresh queue depths and revive workers that answer again (poller thread)."""
+        while not self._stop.wait(self.poll_interval):
+            for node in self.nodes:
+                answered = node.poll()
+                if answered != node.up:
+                    logger.info(f"🛰️  Worker {node.name} is {'back' if answered else 'unreachable'}")
+                    node.up = answered
+    
+    def stats(self) -> dict:
+        """
+        Get the pool's counters.
+        
+        Returns:
+            Dictionary with local_fallbacks and one entry per worker
+        """
+        with self._lock:
+            return {
+                "local_fallbacks": self.local_fallbacks,
+                "workers": [node.stats() for node in self.nodes]
+            }
+    
+    def close(self):
+        """Stop polling and close all connections."""
+        self._stop.set()
+        self._poller.join(timeout=POLL_TIMEOUT + 1)
+        for node in self.nodes:
+            node.close()
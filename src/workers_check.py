@@ -0,0 +1,197 @@
+"""
+Worker Pool Check
+==================
+Exercises remote transcription workers on localhost without a model.
+
+Starts worker processes (this script with --serve), each a transcription
+server whose stand-in batch function sleeps for a fixed time per batch
+and returns each clip's label (see server_check.py), then checks that the
+pool:
+
+- Returns every clip's own result
+- Sends most clips to the faster worker
+- Keeps working when a worker is killed, and brings it back once a new
+  one listens on its port
+- Waits longer than the fixed margin for a slow worker, since the
+  timeout grows with the expected decode time
+- Gives up on a worker that does not answer within the timeout, so the
+  caller decodes locally
+- Keeps a worker that failed one clip (a server-side error) in use
+- Returns None at once when no worker is reachable
+
+Usage:
+    python workers_check.py
+    python workers_check.py --serve --port 9001 --delay 0.05    (one worker)
+"""
+
+import sys
+import argparse
+import subprocess
+import threading
+import time
+from server import TranscriptionServer
+from server_check import labelled_clip, check
+from workers import WorkerPool
+from log import setup_logging
+
+
+FAILING_LABEL = 999  # Clip label the stand-in worker fails
+
+
+def serve(port: int, delay: float) -> int:
+    """Run a stand-in worker until killed; prints its port first."""
+    def fake_batch(clips):
+        time.sleep(delay)
+        if any(round(float(clip[0]) * 1000) == FAILING_LABEL for clip in clips):
+            raise RuntimeError("stand-in failure")
+        return [f"clip {round(float(clip[0]) * 1000)}" for clip in clips]
+    
+    server = TranscriptionServer(fake_batch, port=port, batch_window_ms=5)
+    server.start()
+    print(server.address[1], flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+    return 0
+
+
+def start_worker(delay: float, port: int = 0):
+    """Start a worker process; returns (process, port)."""
+    process = subprocess.Popen(
+        [sys.executable, __file__, "--serve", "--port", str(port), "--delay", str(delay)],
+        stdout=subprocess.PIPE, text=True
+    )
+    return process, int(process.stdout.readline())
+
+
+def run_clips(pool: WorkerPool, labels, threads: int = 4) -> dict:
+    """Transcribe one clip per label from a few threads; returns label -> result."""
+    results = {}
+    labels = list(labels)
+    
+    def worker(part):
+        for label in part:
+            results[label] = pool.transcribe(labelled_clip(label))
+    
+    workers = [threading.Thread(target=worker, args=(labels[i::threads],)) for i in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return results
+
+
+def check_balancing() -> bool:
+    """A fast and a slow worker: correct results, most clips on the fast one, failover."""
+    fast, fast_port = start_worker(0.02)
+    slow, slow_port = start_worker(0.2)
+    pool = WorkerPool([f"127.0.0.1:{fast_port}", f"127.0.0.1:{slow_port}"], timeout=5, poll_interval=0.2)
+    ok = True
+    try:
+        labels = range(1, 81)
+        results = run_clips(pool, labels)
+        wrong = [label for label in labels if results.get(label) != f"clip {label}"]
+        ok &= check("Every clip gets its own result", not wrong,
+                    f"wrong for {wrong}" if wrong else f"{len(results)} clips")
+        
+        fast_node, slow_node = pool.nodes
+        ok &= check("Most clips go to the faster worker", fast_node.completed > 2 * slow_node.completed,
+                    f"fast {fast_node.completed}, slow {slow_node.completed}")
+        
+        fast.kill()
+        fast.wait()
+        results = run_clips(pool, range(100, 120))
+        ok &= check("A killed worker's clips go to the other one",
+                    all(results[label] == f"clip {label}" for label in range(100, 120)),
+                    f"fallbacks {pool.local_fallbacks}")
+        ok &= check("The killed worker is marked unreachable", not fast_node.up)
+        
+        fast, _ = start_worker(0.02, port=fast_port)
+        time.sleep(1.0)
+        ok &= check("A restarted worker is brought back", fast_node.up)
+    finally:
+        pool.close()
+        for process in (fast, slow):
+            process.kill()
+            process.wait()
+    return ok
+
+
+def check_timeout() -> bool:
+    """Slow and hung workers: results within the scaled timeout, None soon after it."""
+    ok = True
+    slow, port = start_worker(1.2)
+    pool = WorkerPool([f"127.0.0.1:{port}"], timeout=0.5)
+    try:
+        result = pool.transcribe(labelled_clip(1))
+        ok &= check("A slow worker gets more than the fixed margin", result == "clip 1",
+                    f"timeout {pool.nodes[0].request_timeout(1.0):.1f}s")
+    finally:
+        pool.close()
+        slow.kill()
+        slow.wait()
+    
+    hung, port = start_worker(10.0)
+    pool = WorkerPool([f"127.0.0.1:{port}"], timeout=0.5)
+    try:
+        limit = pool.nodes[0].request_timeout(1.0)
+        start = time.perf_counter()
+        result = pool.transcribe(labelled_clip(1))
+        elapsed = time.perf_counter() - start
+        ok &= check("Timed-out worker falls back to local decode", result is None and elapsed < limit + 1.0,
+                    f"{elapsed:.2f}s, timeout {limit:.1f}s")
+        
+        start = time.perf_counter()
+        result = pool.transcribe(labelled_clip(2))
+        elapsed = time.perf_counter() - start
+        ok &= check("No reachable worker returns None at once", result is None and elapsed < 0.1,
+                    f"{elapsed * 1000:.1f}ms, {pool.local_fallbacks} local fallbacks")
+    finally:
+        pool.close()
+        hung.kill()
+        hung.wait()
+    return ok
+
+
+def check_clip_error() -> bool:
+    """A worker that fails one clip stays in use for the next."""
+    worker, port = start_worker(0.02)
+    pool = WorkerPool([f"127.0.0.1:{port}"], timeout=5)
+    ok = True
+    try:
+        result = pool.transcribe(labelled_clip(FAILING_LABEL))
+        ok &= check("A failed clip falls back to local decode", result is None)
+        ok &= check("The worker stays reachable after a clip error", pool.nodes[0].up)
+        result = pool.transcribe(labelled_clip(3))
+        ok &= check("The next clip goes to the same worker", result == "clip 3", str(result))
+    finally:
+        pool.close()
+        worker.kill()
+        worker.wait()
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the remote worker pool on localhost")
+    parser.add_argument("--serve", action="store_true", help="Run one stand-in worker")
+    parser.add_argument("--port", type=int, default=0, help="Worker port (with --serve)")
+    parser.add_argument("--delay", type=float, default=0.05, help="Seconds per batch (with --serve)")
+    args = parser.parse_args()
+    
+    if args.serve:
+        # stdout carries the port; keep the worker's messages off it
+        setup_logging(to_file=False, console_stream=sys.stderr)
+        return serve(args.port, args.delay)
+    
+    setup_logging(to_file=False)
+    ok = check_balancing()
+    ok &= check_timeout()
+    ok &= check_clip_error()
+    print("✅ Worker checks passed" if ok else "❌ Worker checks failed")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())